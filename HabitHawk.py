@@ -1,42 +1,59 @@
+import time
+# 起動時間の計測の基準点 (--startup-benchmark で各段階の所要時間を出力する)
+_startup_marks = [("start", time.perf_counter())]
 import tkinter as tk
 from tkinter import messagebox
-import sqlite3
 import datetime
 import os
 import sys
 import customtkinter as ctk
 from PIL import Image
-import random
-import difflib
-from collections import defaultdict
 import json
-import uuid
+import hashlib
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait
+import database
+import instrument
+import storage
+from timers import TimerStore
+from timer_view import VirtualTimerList
+from live_stats import LiveStats
+from stats_view import STATS_PANEL_WIDTH, StatsPanel
+from canonical import get_canonical_name
+from formatting import format_hms
+from report import get_database, resource_path, due_report_type, run_report_generator, cancel_feedback, REPORT_STAGES
 
-def get_heavy_libs():
-    """遅延インポート: この関数が呼び出されたときに重いライブラリを読み込む"""
-    try:
-        import google.generativeai as genai
-        from reportlab.lib.pagesizes import A4
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        from dotenv import load_dotenv
-        return genai, A4, SimpleDocTemplate, Paragraph, Spacer, getSampleStyleSheet, pdfmetrics, TTFont, load_dotenv
-    except ImportError as e:
-        messagebox.showerror("エラー", f"必要なライブラリが見つかりません: {e}\nPyInstallerで正しくバンドルされているか確認してください。")
-        sys.exit()
+def mark_startup(phase):
+    """起動処理の段階の終了時刻を記録する"""
+    _startup_marks.append((phase, time.perf_counter()))
+    instrument.record_span(f"startup.{phase}", _startup_marks[-2][1], _startup_marks[-1][1])
+
+def startup_breakdown():
+    """段階ごとの所要時間 (ミリ秒) を返す"""
+    return {phase: (end - start) * 1000
+            for (_, start), (phase, end) in zip(_startup_marks, _startup_marks[1:])}
+
+mark_startup("import")
 
-def resource_path(relative_path):
-    """PyInstallerでビルドされた際のリソースパスを取得する"""
+# テーマファイルや縮小済み画像のキャッシュ
+CACHE_DIR = resource_path('cache')
+
+def cached_resized_image(path, size):
+    """LANCZOS で縮小した画像を返す。元画像の mtime をキーにキャッシュし、2回目以降は縮小しない"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    cache_path = os.path.join(CACHE_DIR, f"{stem}_{size[0]}x{size[1]}_{os.stat(path).st_mtime_ns}.png")
+    if os.path.exists(cache_path):
+        return Image.open(cache_path)
+    resized_img = Image.open(path).resize(size, Image.Resampling.LANCZOS)
     try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        resized_img.save(cache_path)
+    except OSError as e:
+        print(f"縮小画像のキャッシュを保存できませんでした: {e}")
+    return resized_img
 
 def set_custom_theme():
-    """テーマをPythonコード内で直接定義し、一時ファイルとして保存して適用する"""
+    """テーマをPythonコード内で直接定義し、内容のハッシュを名前にしたファイルへ1度だけ書き出して適用する"""
     # 完全に定義されたテーマの辞書
     complete_theme = {
         "CTk": {
@@ -113,63 +130,117 @@ def set_custom_theme():
     }
 
     try:
-        # 一時ファイルとして保存
-        temp_filename = f"temp_hawk_theme_{uuid.uuid4().hex}.json"
-        temp_theme_path = os.path.join(os.path.dirname(resource_path("")), temp_filename)
-        
-        # 既存のテーマファイルがあっても、新しいテーマで上書きする
-        merged_theme = complete_theme
-        
-        with open(temp_theme_path, "w", encoding="utf-8") as f:
-            json.dump(merged_theme, f, indent=2)
+        # テーマの内容が変わったときだけ新しいファイルが作られ、それ以外は既存のファイルを再利用する
+        theme_json = json.dumps(complete_theme, indent=2, sort_keys=True)
+        digest = hashlib.sha256(theme_json.encode("utf-8")).hexdigest()[:16]
+        theme_path = os.path.join(CACHE_DIR, f"hawk_theme_{digest}.json")
+        if not os.path.exists(theme_path):
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            partial_path = f"{theme_path}.{os.getpid()}.tmp"
+            with open(partial_path, "w", encoding="utf-8") as f:
+                f.write(theme_json)
+            os.replace(partial_path, theme_path)
 
-        ctk.set_default_color_theme(temp_theme_path)
+        ctk.set_default_color_theme(theme_path)
         ctk.set_appearance_mode("dark")
-        
-        def delete_temp_file():
-            if os.path.exists(temp_theme_path):
-                os.remove(temp_theme_path)
-        return delete_temp_file
-        
     except Exception as e:
         print(f"カスタムテーマの設定中にエラーが発生しました: {e}")
         ctk.set_default_color_theme("blue")
-        return None
-
-# データベースへの接続（軽量なため、ここに残す）
-conn = sqlite3.connect(resource_path('habit_log.db'))
-c = conn.cursor()
-c.execute('''
-    CREATE TABLE IF NOT EXISTS activities (
-        start_time TEXT,
-        end_time TEXT,
-        activity_name TEXT
-    )
-''')
-conn.commit()
+
+# 既存の habit_log.db も含め、スキーマを最新バージョンへ移行する (接続は database が管理する)
+get_database().migrate(get_canonical_name)
+mark_startup("db")
+
+# メインウィンドウの大きさ (統計パネルの表示中はその幅だけ広げる)
+WINDOW_WIDTH = 320
+WINDOW_HEIGHT = 450
+
+class TickScheduler:
+    """すべてのタイマーで共有する1秒ごとの更新ループ
+
+    tick は壁時計の秒の境界に合わせて1つだけ予約される。
+    callback が False を返した (計測中のタイマーが無い) 場合は予約をやめ、
+    ensure_running が呼ばれるまで何もしない。
+    """
+    def __init__(self, widget, callback):
+        self.widget = widget
+        self.callback = callback
+        self._after_id = None
+
+    def ensure_running(self):
+        if self._after_id is None:
+            self._schedule()
+
+    def stop(self):
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _schedule(self):
+        delay = 1000 - int(time.time() * 1000) % 1000
+        self._after_id = self.widget.after(delay, self._tick)
+
+    def _tick(self):
+        self._after_id = None
+        if self.callback():
+            self._schedule()
 
 # --- Appクラス ---
 class App(ctk.CTk):
-    def __init__(self):
+    def __init__(self, show_splash=False):
         super().__init__()
-        
-        self.timers = {}
+
+        # タイマーの状態 (ウィジェットは VirtualTimerList が見えている分だけ持つ)
+        self.timers = TimerStore()
+        # 計測中のタイマーだけを tick で更新する
+        self.active_timers = set()
+        self.tick_scheduler = TickScheduler(self, self.tick_timers)
+        # 記録はライタスレッドがまとめてコミットする (UI スレッドはディスクを待たない)
+        self.session_writer = storage.SessionWriter(get_database(), get_canonical_name)
+        # 統計パネルの今日・今週・今月の合計は起動時に1回だけ読み込み、以降はメモリ上で更新する
+        self.live_stats = LiveStats(datetime.date.today())
+        self.live_stats.seed(get_database().daily_totals(*self.live_stats.seed_range()))
+        self.stats_panel = None
+        self.stats_visible = False
+        # Hawk Eye レポートはワーカースレッドで生成し、進捗と結果はキュー経由で受け取る
+        self.report_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hawk-eye")
+        self.report_jobs = {}
+        self.report_events = queue.Queue()
         self.title("HabitHawk")
-        self.geometry("320x450")
+        self.geometry(f"{WINDOW_WIDTH}x{WINDOW_HEIGHT}")
         self.resizable(width=False, height=False)
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
           # --- 変更箇所: ロゴ画像をインスタンス変数に格納する ---
         self.app_logo_image_ref = None
         self.splash_logo_image_ref = None # スプラッシュスクリーンロゴも念のため
+        if not show_splash:
+            self.load_ui()
+            return
+        # スプラッシュを描画してから UI を構築し、構築が終わった時点で切り替える
+        self.withdraw()
+        splash = SplashScreen(self)
+        splash.update()
         self.load_ui()
+        splash.destroy()
+        self.deiconify()
 
     def on_closing(self):
         """アプリケーション終了時の処理"""
-        for timer_id in list(self.timers.keys()):
-            timer = self.timers[timer_id]
-            if timer['is_tracking']:
-                self.stop_tracking(timer_id)
-        conn.close()
+        for timer in self.timers:
+            if timer.is_tracking:
+                self.stop_tracking(timer.timer_id)
+        self.tick_scheduler.stop()
+        # 開始前のレポートは取り消し、生成中のレポートは Hawk Eye への問い合わせを取り消して終わるのを待つ
+        # (ワーカーが使っている読み取り接続を閉じないため)。取り消した後に問い合わせが始まった場合に備え、
+        # 終わるまで取り消しを繰り返す
+        self.report_executor.shutdown(wait=False, cancel_futures=True)
+        pending = set(self.report_jobs.values())
+        while pending:
+            cancel_feedback()
+            _done, pending = wait(pending, timeout=0.1)
+        # 停止したすべてのタイマーの記録を1つのトランザクションで書き込む
+        self.session_writer.close()
+        database.close_all()
         self.destroy()
         sys.exit()
 
@@ -180,7 +251,8 @@ class App(ctk.CTk):
             logo_path = resource_path('images/HabitHawk.png')
             if os.path.exists(logo_path):
                 # --- 変更箇所: 画像をインスタンス変数に格納する ---
-                self.app_logo_image_ref = ctk.CTkImage(Image.open(logo_path), size=(100, 100))
+                # 高DPI表示でもぼやけないよう2倍の大きさで縮小しておく
+                self.app_logo_image_ref = ctk.CTkImage(cached_resized_image(logo_path, (200, 200)), size=(100, 100))
                 logo_label = ctk.CTkLabel(self, image=self.app_logo_image_ref, text="")
                 # --- 変更ここまで ---
                 logo_label.pack(pady=(10, 0))
@@ -193,301 +265,151 @@ class App(ctk.CTk):
             text_label = ctk.CTkLabel(self, text="HabitHawk", font=("Helvetica", 24))
             text_label.pack(pady=(10, 0))
 
-        self.timer_container = ctk.CTkScrollableFrame(self)
-        self.timer_container.pack(fill="both", expand=True, padx=10, pady=10)
-        self.add_timer_ui()
+        self.timer_list = VirtualTimerList(self, self)
+        self.timer_list.pack(fill="both", expand=True, padx=10, pady=10)
+        self.add_timer()
+        stats_button = ctk.CTkButton(self, text="Stats", command=self.toggle_stats_panel)
+        stats_button.pack(pady=(0, 5))
+        # 統計パネルは Stats ボタンで表示するまで配置しない
+        self.stats_panel = StatsPanel(self)
+
+        if due_report_type(datetime.date.today()):
+            self.hawk_eye_button = ctk.CTkButton(self, text="Hawk Eye", command=self.start_report)
+            self.hawk_eye_button.pack(pady=(10, 0))
+            self.report_status_label = ctk.CTkLabel(self, text="", font=("Helvetica", 11))
+            self.report_status_label.pack()
+            self.report_progress_bar = ctk.CTkProgressBar(self, width=200)
+            self.report_progress_bar.set(0)
+
+    def start_report(self):
+        """今日が対象日のレポート生成をワーカースレッドに投入する"""
+        report_type = due_report_type(datetime.date.today())
+        if report_type is None or report_type in self.report_jobs:
+            # 同じレポートの生成が進行中なら二重に開始しない
+            return
+        self.hawk_eye_button.configure(state=tk.DISABLED)
+        self.report_progress_bar.set(0)
+        self.report_progress_bar.pack(pady=(0, 10))
 
-        today = datetime.date.today()
-        is_sunday = today.isoweekday() == 7
-        last_day_of_month = (today + datetime.timedelta(days=1)).replace(day=1) - datetime.timedelta(days=1)
-        is_last_day = today == last_day_of_month
+        def progress(step, message):
+            self.report_events.put((report_type, step, message))
 
-        if is_sunday or is_last_day:
-            hawk_eye_button = ctk.CTkButton(self, text="Hawk Eye", command=generate_pdf_report)
-            hawk_eye_button.pack(pady=10)
+        self.report_jobs[report_type] = self.report_executor.submit(self.run_report, report_type, progress)
+        self.after(100, self.poll_report_jobs)
+
+    def run_report(self, report_type, progress):
+        """ワーカースレッドで実行される。未書き込みの記録を反映してからレポートを生成する"""
+        self.session_writer.flush()
+        run_report_generator(report_type, progress)
+
+    def poll_report_jobs(self):
+        """ワーカーからの進捗と結果をメインスレッドで反映する"""
+        while True:
+            try:
+                report_type, step, message = self.report_events.get_nowait()
+            except queue.Empty:
+                break
+            self.report_status_label.configure(text=message)
+            self.report_progress_bar.set(step / len(REPORT_STAGES))
+        for report_type, future in list(self.report_jobs.items()):
+            if not future.done():
+                continue
+            del self.report_jobs[report_type]
+            try:
+                future.result()
+            except Exception as e:
+                self.report_status_label.configure(text="")
+                messagebox.showerror("Error", f"Report generation failed: {e}")
+            else:
+                self.report_status_label.configure(text="")
+                messagebox.showinfo("Success", f"Hawk Eye {report_type.capitalize()} Report ready.")
+        if self.report_jobs:
+            self.after(100, self.poll_report_jobs)
+        else:
+            self.report_progress_bar.pack_forget()
+            self.hawk_eye_button.configure(state=tk.NORMAL)
     
-    def add_timer_ui(self):
-        timer_id = f"timer_{len(self.timers)}"
-        frame = ctk.CTkFrame(self.timer_container, fg_color="transparent")
-        frame.pack(pady=5, fill="x")
-        entry = ctk.CTkEntry(frame, width=280, font=("Helvetica", 12))
-        entry.pack(pady=(0, 5))
-        timer_label = ctk.CTkLabel(frame, text="00:00:00", font=("Helvetica", 24))
-        timer_label.pack(pady=5)
-        button_frame = ctk.CTkFrame(frame, fg_color="transparent")
-        button_frame.pack(pady=(5, 0))
-        start_button = ctk.CTkButton(button_frame, text="START", command=lambda: self.start_tracking(timer_id))
-        start_button.pack(side=tk.LEFT, expand=True, padx=5, pady=0)
-        stop_button = ctk.CTkButton(button_frame, text="STOP", command=lambda: self.stop_tracking(timer_id), state=tk.DISABLED)
-        stop_button.pack(side=tk.RIGHT, expand=True, padx=5, pady=0)
-        control_frame = ctk.CTkFrame(frame, fg_color="transparent")
-        control_frame.pack(pady=(5, 0))
-        add_button = ctk.CTkButton(control_frame, text="+", command=self.add_timer_ui)
-        add_button.pack(side=tk.LEFT, padx=5)
-        remove_button = ctk.CTkButton(control_frame, text="-", command=lambda: self.remove_timer_ui(timer_id))
-        remove_button.pack(side=tk.LEFT, padx=5)
-        self.timers[timer_id] = {
-            'is_tracking': False,
-            'start_time': None,
-            'current_activity': "",
-            'tracking_duration': 0,
-            'frame': frame,
-            'entry': entry,
-            'timer_label': timer_label,
-            'start_button': start_button,
-            'stop_button': stop_button
-        }
+    def toggle_stats_panel(self):
+        """統計パネルをウィンドウの右側に表示する (表示中なら隠す)
+
+        ウィンドウは大きさを変えられないため、パネルの幅だけウィンドウを広げる・戻す。
+        """
+        if self.stats_visible:
+            self.stats_panel.pack_forget()
+            self.geometry(f"{WINDOW_WIDTH}x{WINDOW_HEIGHT}")
+            self.stats_visible = False
+            return
+        # 最初に配置したウィジェットより前に詰めて、右側の高さ全体をパネルに割り当てる
+        self.stats_panel.pack(side=tk.RIGHT, fill="y", padx=(0, 10), pady=10, before=self.pack_slaves()[0])
+        self.geometry(f"{WINDOW_WIDTH + STATS_PANEL_WIDTH + 10}x{WINDOW_HEIGHT}")
+        self.stats_visible = True
+        self.refresh_stats()
+
+    def refresh_stats(self):
+        """計測中のタイマーの経過時間を含めて統計パネルを更新する (SQLite には問い合わせない)"""
+        if not self.stats_visible:
+            return
+        running = [(get_canonical_name(self.timers[timer_id].current_activity),
+                    storage.to_epoch(self.timers[timer_id].start_time)) for timer_id in self.active_timers]
+        self.stats_panel.show(self.live_stats.totals(storage.to_epoch(datetime.datetime.now()), running))
 
-    def remove_timer_ui(self, timer_id):
+    def add_timer(self):
+        state = self.timers.add()
+        self.timer_list.refresh()
+        self.timer_list.scroll_to_timer(state.timer_id)
+
+    def remove_timer(self, timer_id):
         if len(self.timers) > 1:
-            timer_to_remove = self.timers[timer_id]
-            if timer_to_remove['is_tracking']:
+            if self.timers[timer_id].is_tracking:
                 self.stop_tracking(timer_id)
-            timer_to_remove['frame'].destroy()
-            del self.timers[timer_id]
+            self.timers.remove(timer_id)
+            self.timer_list.refresh()
         else:
             messagebox.showwarning("Warning", "At least one timer must remain.")
 
     def start_tracking(self, timer_id):
+        self.timer_list.sync_entry(timer_id)
         timer = self.timers[timer_id]
-        activity_name = timer['entry'].get().strip()
-        if activity_name and not timer['is_tracking']:
-            timer['is_tracking'] = True
-            timer['start_time'] = datetime.datetime.now()
-            timer['current_activity'] = activity_name
-            timer['tracking_duration'] = 0
-            timer['start_button'].configure(state=tk.DISABLED)
-            timer['stop_button'].configure(state=tk.NORMAL)
-            self.update_timer(timer_id)
+        activity_name = timer.entry_text.strip()
+        if activity_name and not timer.is_tracking:
+            timer.is_tracking = True
+            timer.start_time = datetime.datetime.now()
+            # 表示する経過時間は時計の変更に影響されない単調時計で測る
+            timer.start_monotonic = time.monotonic()
+            timer.current_activity = activity_name
+            timer.tracking_duration = 0
+            self.timer_list.update_timer(timer_id)
+            self.active_timers.add(timer_id)
+            self.tick_scheduler.ensure_running()
 
     def stop_tracking(self, timer_id):
         timer = self.timers[timer_id]
-        if timer['is_tracking']:
-            timer['is_tracking'] = False
+        if timer.is_tracking:
+            timer.is_tracking = False
+            self.active_timers.discard(timer_id)
             end_time = datetime.datetime.now()
-            c.execute("INSERT INTO activities VALUES (?, ?, ?)",
-                      (timer['start_time'].strftime("%Y-%m-%d %H:%M:%S"),
-                       end_time.strftime("%Y-%m-%d %H:%M:%S"),
-                       timer['current_activity']))
-            conn.commit()
-            timer['start_button'].configure(state=tk.NORMAL)
-            timer['stop_button'].configure(state=tk.DISABLED)
-            timer['timer_label'].configure(text="00:00:00")
-            timer['entry'].delete(0, tk.END)
-
-    def update_timer(self, timer_id):
-        timer = self.timers[timer_id]
-        if timer['is_tracking']:
-            timer['tracking_duration'] = (datetime.datetime.now() - timer['start_time']).total_seconds()
-            hours, remainder = divmod(timer['tracking_duration'], 3600)
-            minutes, seconds = divmod(remainder, 60)
-            timer['timer_label'].configure(text=f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}")
-            self.after(1000, lambda: self.update_timer(timer_id))
-
-# --- Report Generator ---
-SYNONYM_MAPPING = {
-    '入浴': ['風呂', 'お風呂', 'シャワー', '温泉', 'bath'],
-    '音楽活動': ['ギター', '作曲', '楽器練習', 'music'],
-    '運動': ['散歩', 'ジョギング', '筋トレ', 'ランニング', 'walking', 'running'],
-    '配信業務': ['配信', 'ライブ配信', 'OBS設定', '配信準備', 'stream'],
-    'コンテンツ消費': ['youtube', 'netflix', 'hulu', '映画鑑賞', 'movie'],
-}
-def get_canonical_name(activity_name):
-    lower_name = activity_name.lower()
-    for canonical, synonyms in SYNONYM_MAPPING.items():
-        if lower_name in [s.lower() for s in synonyms]:
-            return canonical
-        for s in synonyms:
-            if difflib.SequenceMatcher(None, lower_name, s.lower()).ratio() > 0.8:
-                 return canonical
-    return activity_name.capitalize()
-
-def get_activity_data(start_date, end_date):
-    conn = sqlite3.connect(resource_path('habit_log.db'))
-    c = conn.cursor()
-    c.execute("SELECT start_time, end_time, activity_name FROM activities")
-    all_data = c.fetchall()
-    period_data = [
-        row for row in all_data
-        if start_date.strftime("%Y-%m-%d %H:%M:%S") <= row[0] <= end_date.strftime("%Y-%m-%d %H:%M:%S")
-    ]
-    conn.close()
-    return period_data, all_data
-
-def format_data_for_ai(raw_data):
-    aggregated_data = defaultdict(lambda: {'duration': 0, 'count': 0})
-    for row in raw_data:
-        start = datetime.datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S")
-        end = datetime.datetime.strptime(row[1], "%Y-%m-%d %H:%M:%S")
-        duration_seconds = (end - start).total_seconds()
-        canonical_name = get_canonical_name(row[2].strip())
-        aggregated_data[canonical_name]['duration'] += duration_seconds
-        aggregated_data[canonical_name]['count'] += 1
-    formatted_string = "### Activities Log\n"
-    for activity, data in sorted(aggregated_data.items()):
-        formatted_string += f"- {activity}: {data['duration']:.2f} seconds ({data['count']} times)\n"
-    return formatted_string, aggregated_data
-
-def get_ai_feedback(formatted_data, aggregated_data, all_data, report_type):
-    genai, _, _, _, _, _, _, _, load_dotenv = get_heavy_libs()
-    load_dotenv()
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-    if not GEMINI_API_KEY:
-        return "警告: .envファイルにGEMINI_API_KEYが設定されていません。"
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-1.5-pro')
-
-    is_praise_mode = random.random() < 0.05
-    all_activities = defaultdict(datetime.datetime)
-    for row in all_data:
-        end_time = datetime.datetime.strptime(row[1], "%Y-%m-%d %H:%M:%S")
-        canonical_name = get_canonical_name(row[2].strip())
-        all_activities[canonical_name] = max(all_activities[canonical_name], end_time)
-    long_absent_activities = []
-    for activity, last_date in all_activities.items():
-        if (datetime.datetime.now() - last_date).days > 30 and activity not in aggregated_data:
-            long_absent_activities.append(activity)
-    recorded_clusters = {get_canonical_name(row[2].strip()) for row in all_data}
-    missing_clusters = [cluster for cluster in SYNONYM_MAPPING if cluster not in recorded_clusters]
-    prompt = ""
-    if is_praise_mode:
-        prompt = f"""
-        あなたはAI「Hawk Eye」です。ごくまれに、あなたはユーザーを褒めるモードに入ります。
-        このデータに基づき、ユーザーの努力を客観的に褒めてください。
-        感情的な表現は避け、「Hawkは〜と分析しています」のような三人称の視点で記述してください。
-        データ:
-        {formatted_data}
-        """
-    else:
-        time_of_day_breakdown = defaultdict(float)
-        for row in all_data:
-            start_time = datetime.datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S")
-            end_time = datetime.datetime.strptime(row[1], "%Y-%m-%d %H:%M:%S")
-            duration_seconds = (end_time - start_time).total_seconds()
-            hour = start_time.hour
-            if 0 <= hour < 6:
-                time_of_day_breakdown['深夜 (0時〜6時)'] += duration_seconds
-            elif 6 <= hour < 12:
-                time_of_day_breakdown['朝 (6時〜12時)'] += duration_seconds
-            elif 12 <= hour < 18:
-                time_of_day_breakdown['昼 (12時〜18時)'] += duration_seconds
-            else:
-                time_of_day_breakdown['夜 (18時〜0時)'] += duration_seconds
-        time_of_day_prompt = "### 時間帯別活動時間\n"
-        for time_range, duration in time_of_day_breakdown.items():
-            time_of_day_prompt += f"- {time_range}: {duration:.2f} 秒\n"
-
-        prompt = f"""
-        あなたはAI「Hawk Eye」です。以下のデータはユーザーの活動記録です。
-        データに基づき、Hawkが以下の点を厳格かつ感情を持たない三人称の口調で指摘してください。
-        1. 今期の生産性スコアを100点満点で評価してください。
-        2. 時間が減った、または完全に停止した活動について指摘。
-        3. 活動時間の急増、偏重など、バランスの悪さを指摘。
-        4. もし以下の活動が30日以上記録されていなければ、そのことを指摘してください。: {', '.join(long_absent_activities)}
-        5. もし以下のクラスタに記録がなければ、そのことを指摘してください。: {', '.join(missing_clusters)}
-        6. 時間帯別の活動時間データから、生活リズムの偏りや改善点を指摘してください。
-        
-        データ:
-        {formatted_data}
-        {time_of_day_prompt}
-        """
-    try:
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"Gemini APIからフィードバックを取得できませんでした: {e}"
-
-def generate_pdf_report():
-    genai, A4, SimpleDocTemplate, Paragraph, Spacer, getSampleStyleSheet, pdfmetrics, TTFont, load_dotenv = get_heavy_libs()[0:9]
-
-    try:
-        if not os.path.exists(resource_path("reports/weekly")):
-            os.makedirs(resource_path("reports/weekly"))
-        if not os.path.exists(resource_path("reports/monthly")):
-            os.makedirs(resource_path("reports/monthly"))
-            
-        today = datetime.date.today()
-        is_sunday = today.isoweekday() == 7
-        last_day_of_month = (today + datetime.timedelta(days=1)).replace(day=1) - datetime.timedelta(days=1)
-        is_last_day = today == last_day_of_month
-
-        if is_last_day:
-            run_report_generator('monthly')
-            messagebox.showinfo("Success", "Hawk Eye Monthly Report ready.")
-        elif is_sunday:
-            run_report_generator('weekly')
-            messagebox.showinfo("Success", "Hawk Eye Weekly Report ready.")
-    except Exception as e:
-        messagebox.showerror("Error", f"Report generation failed: {e}")
-
-def run_report_generator(report_type):
-    today = datetime.date.today()
-    if report_type == 'weekly':
-        start_date = today - datetime.timedelta(days=7)
-        end_date = today
-        period_data, all_data = get_activity_data(start_date, end_date)
-        formatted_data, aggregated_data = format_data_for_ai(period_data)
-        ai_feedback = get_ai_feedback(formatted_data, aggregated_data, all_data, "weekly")
-        report_data = {
-            'title': f"Hawk Eye Report {start_date.strftime('%Y%m%d')}~{end_date.strftime('%Y%m%d')}",
-            'feedback': ai_feedback,
-            'aggregated_data': aggregated_data
-        }
-        filename = f"reports/weekly/weekly_report_{end_date.strftime('%Y%m%d')}.pdf"
-        generate_pdf_report_file(report_data, filename)
-        
-    elif report_type == 'monthly':
-        start_date = today.replace(day=1)
-        end_date = today
-        period_data, all_data = get_activity_data(start_date, end_date)
-        formatted_data, aggregated_data = format_data_for_ai(period_data)
-        ai_feedback = get_ai_feedback(formatted_data, aggregated_data, all_data, "monthly")
-        report_data = {
-            'title': f"Hawk Eye Report {start_date.strftime('%Y%m%d')}~{end_date.strftime('%Y%m%d')}",
-            'feedback': ai_feedback,
-            'aggregated_data': aggregated_data
-        }
-        filename = f"reports/monthly/monthly_report_{end_date.strftime('%Y%m%d')}.pdf"
-        generate_pdf_report_file(report_data, filename)
+            self.session_writer.submit(timer.start_time, end_time, timer.current_activity)
+            self.live_stats.add(storage.to_epoch(timer.start_time), storage.to_epoch(end_time),
+                                get_canonical_name(timer.current_activity))
+            self.refresh_stats()
+            timer.label_text = "00:00:00"
+            timer.entry_text = ""
+            self.timer_list.update_timer(timer_id)
 
-def generate_pdf_report_file(report_data, filename):
-    A4, SimpleDocTemplate, Paragraph, Spacer, getSampleStyleSheet, pdfmetrics, TTFont = get_heavy_libs()[1:8]
-    try:
-        font_path = resource_path('ZenAntique-Regular.ttf')
-        pdfmetrics.registerFont(TTFont('ZenAntique', font_path))
-    except Exception as e:
-        messagebox.showerror("エラー", f"フォントファイルが見つかりません: {e}")
-        return
-    if not os.path.exists(os.path.dirname(filename)):
-        os.makedirs(os.path.dirname(filename))
-    doc = SimpleDocTemplate(resource_path(filename), pagesize=A4)
-    styles = getSampleStyleSheet()
-    styles['Normal'].fontName = 'ZenAntique'
-    styles['Heading1'].fontName = 'ZenAntique'
-    styles['Title'].fontName = 'ZenAntique'
-    styles['Normal'].leading = 14
-    story = []
-    log_text = "## Hawk's Time Log\n"
-    for activity, data in sorted(report_data['aggregated_data'].items()):
-        seconds = int(data['duration'])
-        hours, remainder = divmod(seconds, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        time_str = f"{hours:02}:{minutes:02}:{seconds:02}"
-        log_text += f"* {activity}: {time_str} ({data['count']} times)\n"
-    story.append(Paragraph(log_text, styles['Normal']))
-    story.append(Spacer(1, 12))
-    for paragraph in report_data['feedback'].split('\n'):
-        paragraph = paragraph.strip()
-        if not paragraph:
-            continue
-        if paragraph.startswith('### '):
-            story.append(Paragraph(paragraph.replace('### ', ''), styles['Heading1']))
-        elif paragraph.startswith('## '):
-            story.append(Paragraph(paragraph.replace('## ', ''), styles['Heading1']))
-        else:
-            story.append(Paragraph(paragraph, styles['Normal']))
-            story.append(Spacer(1, 6))
-    doc.build(story)
+    def tick_timers(self):
+        """計測中のタイマーの経過時間を更新する。ラベルに触れるのは見えている行だけ"""
+        now = time.monotonic()
+        for timer_id in self.active_timers:
+            timer = self.timers[timer_id]
+            timer.tracking_duration = now - timer.start_monotonic
+            text = format_hms(timer.tracking_duration)
+            if text != timer.label_text:
+                timer.label_text = text
+                row = self.timer_list.row_for(timer_id)
+                if row is not None:
+                    row.show_label(text)
+        self.refresh_stats()
+        return bool(self.active_timers)
 
 # --- スプラッシュスクリーンクラス ---
 class SplashScreen(ctk.CTkToplevel):
@@ -506,14 +428,13 @@ class SplashScreen(ctk.CTkToplevel):
         try:
             splash_logo_path = resource_path('images/HabitHawk_SplashScreen.png')
             if os.path.exists(splash_logo_path):
-                img = Image.open(splash_logo_path)
-                
-                img_width, img_height = img.size
+                # Image.open はヘッダだけを読むため、元のサイズの取得は軽い
+                img_width, img_height = Image.open(splash_logo_path).size
                 max_dim = min(splash_width, splash_height) * 0.8
                 ratio = min(max_dim / img_width, max_dim / img_height)
                 new_width = int(img_width * ratio)
                 new_height = int(img_height * ratio)
-                resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                resized_img = cached_resized_image(splash_logo_path, (new_width, new_height))
                 
                 self.splash_logo_image_ref = ctk.CTkImage(resized_img, size=(new_width, new_height))
                 logo_label = ctk.CTkLabel(self, image=self.splash_logo_image_ref, text="", fg_color="transparent")
@@ -530,28 +451,42 @@ class SplashScreen(ctk.CTkToplevel):
 
 # --- 修正後の新しいメインの起動ロジック ---
 if __name__ == "__main__":
-    # テーマを設定し、一時ファイルを削除する関数を取得
-    temp_file_deleter = set_custom_theme()
-    
-    # アプリケーションのメインウィンドウを作成
-    app = App()
-    app.withdraw()  # 初期状態では非表示にする
-    
-    # スプラッシュスクリーンを作成（メインウィンドウの子として）
-    splash = SplashScreen(app)
-    
-    # 2秒後にスプラッシュスクリーンを非表示にし、メインウィンドウを表示する
-    def start_main_app():
-        splash.destroy()
-        app.deiconify()
-    
-    app.after(2000, start_main_app)
-    
-    # アプリケーション終了時に一時ファイルを削除する設定
-    if temp_file_deleter:
-        app.protocol("WM_DELETE_WINDOW", lambda: (temp_file_deleter(), app.destroy()))
-    else:
-        app.protocol("WM_DELETE_WINDOW", app.destroy)
+    import argparse
+    parser = argparse.ArgumentParser(description="HabitHawk")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="活動名の正規化をやり直し、activities の全記録から集計テーブルを再生成して終了する")
+    parser.add_argument("--startup-benchmark", action="store_true",
+                        help="UI の構築完了までの段階ごとの所要時間 (ms) をJSONで出力して終了する")
+    parser.add_argument("--profile", metavar="TRACE_JSON",
+                        help="起動とレポート生成の各段階を計測し、終了時にトレースをJSONで書き出す")
+    parser.add_argument("--cprofile", metavar="PSTATS",
+                        help="--profile と合わせて cProfile の結果も書き出す")
+    args = parser.parse_args()
+    if args.profile:
+        import atexit
+        instrument.start_profile(args.profile, args.cprofile)
+        # on_closing は sys.exit で終了するため、書き出しは atexit で行う
+        atexit.register(instrument.stop_profile)
+        # 計測を有効にする前に終わった起動段階もトレースに含める
+        for (_, start), (phase, end) in zip(_startup_marks, _startup_marks[1:]):
+            instrument.record_span(f"startup.{phase}", start, end)
+    if args.rebuild_rollups:
+        get_database().rebuild_rollups(get_canonical_name)
+        database.close_all()
+        print("ロールアップを再生成しました。")
+        sys.exit()
+
+    # テーマを設定 (初回のみファイルに書き出される)
+    set_custom_theme()
+    mark_startup("theme")
+
+    # スプラッシュスクリーンを表示している間にメインウィンドウを構築し、完了したら切り替える
+    app = App(show_splash=True)
+    mark_startup("ui")
+
+    if args.startup_benchmark:
+        print(json.dumps(startup_breakdown()))
+        app.on_closing()
 
     # アプリケーションのメインループを開始
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,334 @@
+from collections import defaultdict, namedtuple
+
+import storage
+from intervals import Timeline, add_hour_of_day_seconds
+
+# NumPy はオプションで、起動を遅くしないよう初めて必要になったときに読み込む
+_NOT_LOADED = object()
+np = _NOT_LOADED
+
+def load_numpy():
+    """NumPy を読み込んで返す。インストールされていなければ None"""
+    global np
+    if np is _NOT_LOADED:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+    return np
+
+# 期間内の記録がこの件数以上なら NumPy のベクトル化集計に切り替える
+NUMPY_ROW_THRESHOLD = 50_000
+
+# 1件のセッション (時刻はエポック秒、duration は秒)
+Session = namedtuple('Session', ['start_ts', 'end_ts', 'duration', 'canonical_name'])
+
+TIME_OF_DAY_RANGES = [
+    (0, 6, '深夜 (0時〜6時)'),
+    (6, 12, '朝 (6時〜12時)'),
+    (12, 18, '昼 (12時〜18時)'),
+    (18, 24, '夜 (18時〜0時)'),
+]
+
+def parse_sessions(rows, canonicalize):
+    """カーソルの行 (start_ts, end_ts, duration, canonical_name, activity_name) を Session に変換する
+
+    時刻は保存済みの整数をそのまま使うため strptime は行わない。
+    canonical_name が未解決の行だけ canonicalize を呼ぶ。
+    """
+    for start_ts, end_ts, duration, canonical_name, activity_name in rows:
+        if canonical_name is None:
+            canonical_name = canonicalize(activity_name.strip())
+        yield Session(start_ts, end_ts, duration, canonical_name)
+
+def _empty_entry():
+    return {'duration': 0, 'count': 0}
+
+class ReportStats:
+    """レポートのプロンプトに必要な統計を1回の走査で集計する
+
+    全履歴について保持するのは活動名ごとと時(0-23)ごとの値だけなので、
+    メモリ使用量は履歴の長さに依存しない (重なりの集計のため、期間内の記録だけは保持する)。
+    """
+    def __init__(self, start_ts, end_ts):
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.aggregated_data = defaultdict(_empty_entry)
+        self.hourly = defaultdict(int)
+        self.last_seen = {}
+        self.rows = 0
+        # 期間内の記録 (重なりの集計に使う)
+        self.sessions = []
+        self._timeline = None
+
+    def add(self, session):
+        self.rows += 1
+        if self.start_ts <= session.start_ts < self.end_ts:
+            self.add_to_period(session)
+        self.add_to_history(session)
+
+    def add_to_period(self, session):
+        entry = self.aggregated_data[session.canonical_name]
+        entry['duration'] += session.duration
+        entry['count'] += 1
+        self.sessions.append(session)
+
+    def add_to_history(self, session):
+        add_hour_of_day_seconds(self.hourly, session.start_ts, session.end_ts)
+        previous = self.last_seen.get(session.canonical_name)
+        if previous is None or session.end_ts > previous:
+            self.last_seen[session.canonical_name] = session.end_ts
+
+    def long_absent_activities(self, now, days=30):
+        """days 日より長く記録がなく、今期にも現れない活動"""
+        return [activity for activity, end_ts in self.last_seen.items()
+                if (now - storage.from_epoch(end_ts)).days > days and activity not in self.aggregated_data]
+
+    def missing_clusters(self, clusters):
+        """一度も記録されていないクラスタ"""
+        return [cluster for cluster in clusters if cluster not in self.last_seen]
+
+    def timeline(self):
+        """期間内の記録の intervals.Timeline"""
+        if self._timeline is None or len(self._timeline) != len(self.sessions):
+            self._timeline = Timeline((session.start_ts, session.end_ts, session.canonical_name)
+                                      for session in self.sessions)
+        return self._timeline
+
+    def overlap_summary(self):
+        """(記録のあった実時間の秒数, 同時に記録されていた分を等分した活動ごとの秒数)
+
+        重なりが無ければ活動ごとの秒数は aggregated_data の合計と同じになる。
+        """
+        attributed = self.timeline().attributed_seconds()
+        # 等分した秒数の合計は実時間と一致する (端数は浮動小数点の誤差だけ)
+        return round(sum(attributed.values())), attributed
+
+    def time_of_day_breakdown(self):
+        """時間帯ラベルごとの合計秒数 (記録のある時間帯のみ)"""
+        breakdown = {}
+        for first_hour, last_hour, label in TIME_OF_DAY_RANGES:
+            hours = [hour for hour in range(first_hour, last_hour) if hour in self.hourly]
+            if hours:
+                breakdown[label] = sum(self.hourly[hour] for hour in hours)
+        return breakdown
+
+def collect(sessions, start_ts, end_ts):
+    """Session のストリームを1回だけ消費して ReportStats を作る"""
+    stats = ReportStats(start_ts, end_ts)
+    for session in sessions:
+        stats.add(session)
+    return stats
+
+def collect_periods(sessions, periods):
+    """複数の期間の ReportStats を、Session ストリームの1回の走査でまとめて作る
+
+    periods は {key: (start_ts, end_ts)}、sessions は start_ts の昇順であること。
+    各期間の時間帯別合計と最終記録日時は、その期間の終了時点までの履歴から求めるため、
+    過去の日付のレポートもその日に生成した場合と同じ値になる。
+    """
+    history = ReportStats(0, 0)
+    results = {key: ReportStats(start_ts, end_ts) for key, (start_ts, end_ts) in periods.items()}
+    by_start = sorted(periods, key=lambda key: periods[key][0])
+    by_end = sorted(periods, key=lambda key: periods[key][1])
+    next_start = next_end = 0
+    active = set()
+
+    def finish(key):
+        results[key].hourly = defaultdict(int, history.hourly)
+        results[key].last_seen = dict(history.last_seen)
+
+    for session in sessions:
+        while next_end < len(by_end) and periods[by_end[next_end]][1] <= session.start_ts:
+            finish(by_end[next_end])
+            active.discard(by_end[next_end])
+            next_end += 1
+        while next_start < len(by_start) and periods[by_start[next_start]][0] <= session.start_ts:
+            if periods[by_start[next_start]][1] > session.start_ts:
+                active.add(by_start[next_start])
+            next_start += 1
+        history.add_to_history(session)
+        for key in active:
+            results[key].rows += 1
+            results[key].add_to_period(session)
+    for key in by_end[next_end:]:
+        finish(key)
+    return results
+
+def _hourly_seconds(start_seconds, end_seconds, chunk_size=65_536):
+    """時 (0-23) ごとの秒数の配列 (時をまたぐ記録は境界で分割する)
+
+    時刻 x までに時 h に含まれる秒数 (x // 1日) * 1時間 + clip(x % 1日 - h時間, 0, 1時間) の
+    終了時刻と開始時刻での差を、24 の時について (24, 件数) の配列でまとめて求める。
+    """
+    offsets = np.arange(24, dtype=np.int64)[:, None] * storage.SECONDS_PER_HOUR
+    totals = np.zeros(24, dtype=np.int64)
+    for first in range(0, len(start_seconds), chunk_size):
+        starts = start_seconds[first:first + chunk_size]
+        ends = np.maximum(end_seconds[first:first + chunk_size], starts)
+        days = (ends // storage.SECONDS_PER_DAY - starts // storage.SECONDS_PER_DAY).sum()
+        totals += days * storage.SECONDS_PER_HOUR
+        totals += np.clip(ends % storage.SECONDS_PER_DAY - offsets, 0, storage.SECONDS_PER_HOUR).sum(axis=1)
+        totals -= np.clip(starts % storage.SECONDS_PER_DAY - offsets, 0, storage.SECONDS_PER_HOUR).sum(axis=1)
+    return totals
+
+def collect_arrays(rows, start_ts, end_ts, canonicalize):
+    """collect と同じ ReportStats を NumPy のベクトル演算で作る
+
+    rows は parse_sessions と同じ列の行。読み込み時に正規名を整数IDに符号化し、
+    開始/終了時刻は datetime64 の配列として保持する。
+    """
+    if load_numpy() is None:
+        raise RuntimeError("NumPy がインストールされていません。")
+    activity_ids = {}
+    starts, ends, codes = [], [], []
+    for start, end, _duration, canonical_name, activity_name in rows:
+        if canonical_name is None:
+            canonical_name = canonicalize(activity_name.strip())
+        starts.append(start)
+        ends.append(end)
+        codes.append(activity_ids.setdefault(canonical_name, len(activity_ids)))
+    stats = ReportStats(start_ts, end_ts)
+    stats.rows = len(codes)
+    if not codes:
+        return stats
+    names = list(activity_ids)
+    starts = np.array(starts, dtype=np.int64).astype('datetime64[s]')
+    ends = np.array(ends, dtype=np.int64).astype('datetime64[s]')
+    codes = np.array(codes, dtype=np.intp)
+    durations = (ends - starts).astype(np.int64)
+
+    # 期間内の活動ごとの合計と回数 (重みは秒数なので float64 でも誤差なく表せる)
+    in_period = (starts >= np.datetime64(start_ts, 's')) & (starts < np.datetime64(end_ts, 's'))
+    sums = np.bincount(codes[in_period], weights=durations[in_period], minlength=len(names))
+    counts = np.bincount(codes[in_period], minlength=len(names))
+    for code in np.flatnonzero(counts):
+        stats.aggregated_data[names[code]] = {'duration': int(sums[code]), 'count': int(counts[code])}
+
+    stats.sessions = [Session(start, end, end - start, names[code]) for start, end, code in zip(
+        starts[in_period].astype(np.int64).tolist(), ends[in_period].astype(np.int64).tolist(),
+        codes[in_period].tolist())]
+
+    # 時 (0-23) ごとの秒数
+    for hour, seconds in enumerate(_hourly_seconds(starts.astype(np.int64), ends.astype(np.int64)).tolist()):
+        if seconds:
+            stats.hourly[hour] = seconds
+
+    # 活動IDで並べ替え、区間ごとの最大終了時刻を reduceat で求める
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    boundaries = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    latest = np.maximum.reduceat(ends[order].astype(np.int64), boundaries)
+    for code, end in zip(sorted_codes[boundaries], latest):
+        stats.last_seen[names[code]] = int(end)
+    return stats
+
+def _archive_codes(columns, names, canonicalize):
+    """ブロックの各行の正規名の番号 (names での位置)。正規名が未解決の行は活動名から解決して names に加える"""
+    codes = columns['canonical_id'].astype(np.intp)
+    missing = codes < 0
+    if missing.any():
+        name_ids = np.unique(columns['name_id'][missing])
+        lookup = np.zeros(len(names), dtype=np.intp)
+        positions = {name: position for position, name in enumerate(names)}
+        for name_id in name_ids.tolist():
+            canonical_name = canonicalize(names[name_id].strip())
+            if canonical_name not in positions:
+                positions[canonical_name] = len(names)
+                names.append(canonical_name)
+            lookup[name_id] = positions[canonical_name]
+        codes[missing] = lookup[columns['name_id'][missing]]
+    return codes
+
+def collect_archive_periods(history, periods, canonicalize):
+    """アーカイブ (archive.ColumnArchive) の記録だけについて、collect_periods と同じ ReportStats を作る
+
+    NumPy が使える場合は mmap したブロックの列をコピーせずに配列として読み、
+    期間の範囲を二分探索で切り出して集計する。行ごとのオブジェクトは期間内の記録の Session だけ作る。
+    NumPy が無ければ records() を collect_periods で走査する。
+    """
+    if load_numpy() is None:
+        last_end = max((end_ts for _start_ts, end_ts in periods.values()), default=None)
+        return collect_periods(parse_sessions(history.records(end_ts=last_end), canonicalize), periods)
+    results = {key: ReportStats(start_ts, end_ts) for key, (start_ts, end_ts) in periods.items()}
+    by_end = sorted(periods, key=lambda key: periods[key][1])
+    names = list(history.names)
+    for block in history.blocks:
+        if not block.rows:
+            continue
+        columns = block.arrays(np, history.buffer)
+        starts, ends = columns['start_ts'], columns['end_ts']
+        codes = _archive_codes(columns, names, canonicalize)
+        # 週次と月次の両方に入る記録は同じ Session を共有する
+        sessions = None
+        for key, (start_ts, end_ts) in periods.items():
+            lo, hi = np.searchsorted(starts, (start_ts, end_ts)).tolist()
+            if lo >= hi:
+                continue
+            stats = results[key]
+            stats.rows += hi - lo
+            period_codes = codes[lo:hi]
+            sums = np.bincount(period_codes, weights=columns['duration'][lo:hi], minlength=len(names))
+            counts = np.bincount(period_codes, minlength=len(names))
+            for code in np.flatnonzero(counts).tolist():
+                entry = stats.aggregated_data[names[code]]
+                entry['duration'] += int(sums[code])
+                entry['count'] += int(counts[code])
+            if sessions is None:
+                sessions = [Session(start, end, duration, names[code]) for start, end, duration, code in zip(
+                    starts.tolist(), ends.tolist(), columns['duration'].tolist(), codes.tolist())]
+            stats.sessions.extend(sessions[lo:hi])
+
+        # 時間帯別合計と最終記録日時は、期間の終わりの順に前の期間からの差分だけを加える
+        hourly = np.zeros(24, dtype=np.int64)
+        latest = np.full(len(names), -1, dtype=np.int64)
+        previous = 0
+        for key in by_end:
+            stop = int(np.searchsorted(starts, periods[key][1]))
+            if stop > previous:
+                hourly += _hourly_seconds(starts[previous:stop], ends[previous:stop])
+                np.maximum.at(latest, codes[previous:stop], ends[previous:stop])
+                previous = stop
+            stats = results[key]
+            for hour, seconds in enumerate(hourly.tolist()):
+                if seconds:
+                    stats.hourly[hour] += seconds
+            for code in np.flatnonzero(latest >= 0).tolist():
+                end = int(latest[code])
+                if end > stats.last_seen.get(names[code], -1):
+                    stats.last_seen[names[code]] = end
+    return results
+
+def merge_stats(first, second):
+    """同じ期間について別々の記録から作った ReportStats を1つにまとめる (first を更新して返す)"""
+    first.rows += second.rows
+    for activity, entry in second.aggregated_data.items():
+        merged = first.aggregated_data[activity]
+        merged['duration'] += entry['duration']
+        merged['count'] += entry['count']
+    for hour, seconds in second.hourly.items():
+        first.hourly[hour] += seconds
+    for activity, end_ts in second.last_seen.items():
+        if end_ts > first.last_seen.get(activity, end_ts - 1):
+            first.last_seen[activity] = end_ts
+    first.sessions.extend(second.sessions)
+    return first
+
+def collect_report_stats(db, start_date, end_date, canonicalize):
+    """期間 [start_date, end_date) のレポート用統計を database.Database から作る
+
+    期間内の記録はインデックス範囲検索のカーソルを1回だけ流して集計する。
+    件数が NUMPY_ROW_THRESHOLD 以上で NumPy が使える場合は collect_arrays を使う。
+    全履歴にわたる時間帯別合計と最終記録日時は、生の記録を走査せず
+    ロールアップから読み出す (期間内の記録もロールアップに含まれている)。
+    """
+    start_ts, end_ts = storage.to_epoch(start_date), storage.to_epoch(end_date)
+    rows = db.sessions(start_date, end_date)
+    if db.count_sessions(start_date, end_date) >= NUMPY_ROW_THRESHOLD and load_numpy() is not None:
+        stats = collect_arrays(rows, start_ts, end_ts, canonicalize)
+    else:
+        stats = collect(parse_sessions(rows, canonicalize), start_ts, end_ts)
+    stats.hourly = defaultdict(int, db.hourly_breakdown())
+    stats.last_seen = db.last_seen()
+    return stats
@@ -0,0 +1,219 @@
+"""古い記録を保存する追記専用の列指向アーカイブ
+
+ファイルはマジック (8バイト) に続くブロックの並びで、ブロックは1回の圧縮 (storage.archive_sessions) で
+移した記録を開始時刻の昇順で持つ。
+
+    ブロックヘッダ  <8sQQQ: マジック, 件数, 辞書のバイト数, ブロック全体のバイト数
+    辞書           このブロックで新しく現れた名前の JSON 配列 (名前の番号は全ブロックの通し番号)
+    列             start_ts, end_ts, duration (int64)、name_id, canonical_id (int32, 正規名が無ければ -1)
+
+各部分は8バイト境界に揃えてあるため、mmap したファイルの上にそのまま memoryview や
+NumPy の配列を重ねられる (行ごとのオブジェクトを作らずに全件を順に読める)。
+書き込みが途中で止まった場合に備え、有効な長さはデータベース (archive_state) に記録し、
+それより後ろは読まずに次の追記で切り詰める。
+"""
+import array
+import bisect
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+from itertools import chain
+from operator import itemgetter
+
+FILE_MAGIC = b'HAWKARC1'
+BLOCK_MAGIC = b'HAWKBLK1'
+_BLOCK_HEADER = struct.Struct('<8sQQQ')
+_INT64_COLUMNS = ('start_ts', 'end_ts', 'duration')
+_INT32_COLUMNS = ('name_id', 'canonical_id')
+COLUMNS = _INT64_COLUMNS + _INT32_COLUMNS
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+def _padding(size):
+    return -size % 8
+
+def _column_view(buffer, typecode):
+    """リトルエンディアンの列を、この環境の整数の列として読む (リトルエンディアンならコピーしない)"""
+    if _LITTLE_ENDIAN:
+        return buffer.cast(typecode)
+    column = array.array(typecode, buffer.tobytes())
+    column.byteswap()
+    return memoryview(column)
+
+class ArchiveBlock:
+    """1つのブロックの列 (mmap の上の memoryview) とファイル内の位置"""
+    __slots__ = ('rows', 'offsets') + COLUMNS
+
+    def first_start(self):
+        return self.start_ts[0]
+
+    def last_start(self):
+        return self.start_ts[-1]
+
+    def arrays(self, np, buffer):
+        """NumPy の配列として列を返す (buffer は mmap。コピーしない)"""
+        dtypes = {'start_ts': '<i8', 'end_ts': '<i8', 'duration': '<i8', 'name_id': '<i4', 'canonical_id': '<i4'}
+        return {column: np.frombuffer(buffer, dtype=dtypes[column], count=self.rows, offset=self.offsets[column])
+                for column in COLUMNS}
+
+class ColumnArchive:
+    """アーカイブを読み取り専用で mmap したもの。length バイトまでを有効なデータとして扱う"""
+    def __init__(self, path, length):
+        self.path = path
+        self.names = []
+        self.blocks = []
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), length, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if self._view[:len(FILE_MAGIC)] != FILE_MAGIC:
+            self.close()
+            raise ValueError(f"アーカイブの形式が正しくありません: {path}")
+        position = len(FILE_MAGIC)
+        while position < length:
+            position = self._read_block(position)
+
+    def _read_block(self, position):
+        magic, rows, names_bytes, block_bytes = _BLOCK_HEADER.unpack_from(self._mmap, position)
+        if magic != BLOCK_MAGIC:
+            raise ValueError(f"アーカイブのブロックが壊れています: {self.path} ({position} バイト目)")
+        offset = position + _BLOCK_HEADER.size
+        self.names.extend(json.loads(self._view[offset:offset + names_bytes].tobytes()))
+        offset += names_bytes + _padding(names_bytes)
+        block = ArchiveBlock()
+        block.rows = rows
+        block.offsets = {}
+        for column in COLUMNS:
+            width = 8 if column in _INT64_COLUMNS else 4
+            block.offsets[column] = offset
+            setattr(block, column, _column_view(self._view[offset:offset + rows * width], 'q' if width == 8 else 'i'))
+            offset += rows * width + _padding(rows * width)
+        self.blocks.append(block)
+        return position + block_bytes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def close(self):
+        """列の memoryview を解放してから mmap を閉じる
+
+        読み終えていない records() や NumPy の配列が残っている場合、mmap はそれらが
+        解放されたときに閉じられる。
+        """
+        for block in self.blocks:
+            for column in COLUMNS:
+                getattr(block, column).release()
+        self.blocks = []
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    @property
+    def rows(self):
+        return sum(block.rows for block in self.blocks)
+
+    @property
+    def buffer(self):
+        return self._mmap
+
+    def first_start_ts(self):
+        """最も早い開始時刻 (記録が無ければ None)"""
+        return min((block.first_start() for block in self.blocks if block.rows), default=None)
+
+    def _block_range(self, block, start_ts, end_ts):
+        lo = 0 if start_ts is None else bisect.bisect_left(block.start_ts, start_ts)
+        hi = block.rows if end_ts is None else bisect.bisect_left(block.start_ts, end_ts)
+        return lo, hi
+
+    def count(self, start_ts=None, end_ts=None):
+        """start_ts が [start_ts, end_ts) に入る記録の件数 (二分探索だけで数える)"""
+        total = 0
+        for block in self.blocks:
+            lo, hi = self._block_range(block, start_ts, end_ts)
+            total += max(0, hi - lo)
+        return total
+
+    def _block_records(self, block, start_ts, end_ts):
+        lo, hi = self._block_range(block, start_ts, end_ts)
+        names = self.names
+        for start, end, duration, name_id, canonical_id in zip(
+                block.start_ts[lo:hi], block.end_ts[lo:hi], block.duration[lo:hi],
+                block.name_id[lo:hi], block.canonical_id[lo:hi]):
+            yield start, end, duration, names[canonical_id] if canonical_id >= 0 else None, names[name_id]
+
+    def records(self, start_ts=None, end_ts=None):
+        """(start_ts, end_ts, duration, canonical_name, activity_name) を開始時刻の昇順で返す
+
+        storage.iter_session_records と同じ列。ブロックの期間が重ならなければ順に連結し、
+        重なる場合 (古い記録を後から取り込んで圧縮した場合) は開始時刻で併合する。
+        """
+        streams = [self._block_records(block, start_ts, end_ts) for block in self.blocks]
+        ordered = all(previous.last_start() <= block.first_start()
+                      for previous, block in zip(self.blocks, self.blocks[1:]) if previous.rows and block.rows)
+        if ordered:
+            return chain.from_iterable(streams)
+        return heapq.merge(*streams, key=itemgetter(0))
+
+def append_block(path, committed_length, names, records):
+    """records (start_ts, end_ts, duration, activity_name, canonical_name) を開始時刻の昇順で1ブロックとして追記する
+
+    names は既存の辞書 (ColumnArchive.names)。ファイルを committed_length に切り詰めてから書き、
+    fsync した後の有効な長さと件数を返す。コミット済みの長さの記録は呼び出し側で行う。
+    """
+    name_ids = {name: name_id for name_id, name in enumerate(names)}
+    new_names = []
+
+    def name_id(name):
+        if name is None:
+            return -1
+        found = name_ids.get(name)
+        if found is None:
+            found = name_ids[name] = len(names) + len(new_names)
+            new_names.append(name)
+        return found
+
+    columns = {column: array.array('q') for column in _INT64_COLUMNS}
+    columns.update({column: array.array('i') for column in _INT32_COLUMNS})
+    previous_start = None
+    for start_ts, end_ts, duration, activity_name, canonical_name in records:
+        if previous_start is not None and start_ts < previous_start:
+            raise ValueError("アーカイブに追記する記録は開始時刻の昇順である必要があります")
+        previous_start = start_ts
+        columns['start_ts'].append(start_ts)
+        columns['end_ts'].append(end_ts)
+        columns['duration'].append(duration)
+        columns['name_id'].append(name_id(activity_name if activity_name is not None else ''))
+        columns['canonical_id'].append(name_id(canonical_name))
+    rows = len(columns['start_ts'])
+    if not rows:
+        return committed_length, 0
+
+    names_json = json.dumps(new_names, ensure_ascii=False).encode('utf-8')
+    parts = [names_json, b'\0' * _padding(len(names_json))]
+    for column in COLUMNS:
+        if not _LITTLE_ENDIAN:
+            columns[column].byteswap()
+        data = columns[column].tobytes()
+        parts.extend([data, b'\0' * _padding(len(data))])
+    body = b''.join(parts)
+    block_bytes = _BLOCK_HEADER.size + len(body)
+
+    mode = 'r+b' if os.path.exists(path) else 'w+b'
+    with open(path, mode) as f:
+        f.truncate(committed_length)
+        f.seek(committed_length)
+        if committed_length == 0:
+            f.write(FILE_MAGIC)
+        f.write(_BLOCK_HEADER.pack(BLOCK_MAGIC, rows, len(names_json), block_bytes))
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell(), rows
@@ -0,0 +1,63 @@
+"""純Pythonの集計 (analytics.collect) と NumPy 版 (analytics.collect_arrays) のベンチマーク
+
+合成した記録行をメモリ上で両方の経路に流し、結果が一致することを確認したうえで時間を比較する。
+
+使い方: python benchmarks/bench_analytics.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import analytics
+import storage
+from canonical import Canonicalizer
+
+ACTIVITY_NAMES = ['風呂', 'ギター', '散歩', '配信', 'youtube', '読書', '勉強', '掃除']
+
+def synthetic_rows(rows, seed=0):
+    """iter_session_records と同じ列の行を作る (正規名は一部だけ未解決にする)"""
+    rng = random.Random(seed)
+    canonicalizer = Canonicalizer()
+    current = storage.to_epoch(storage.from_epoch(0).replace(year=2015))
+    result = []
+    for _ in range(rows):
+        current += rng.randint(60, 600)
+        duration = rng.randint(60, 7200)
+        name = rng.choice(ACTIVITY_NAMES)
+        canonical_name = canonicalizer.canonicalize(name) if rng.random() < 0.9 else None
+        result.append((current, current + duration, duration, canonical_name, name))
+    return result
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    if analytics.load_numpy() is None:
+        sys.exit("NumPy がインストールされていません。")
+
+    rows = synthetic_rows(args.rows)
+    start_ts = rows[len(rows) // 4][0]
+    end_ts = rows[len(rows) * 3 // 4][0]
+    canonicalize = Canonicalizer().canonicalize
+
+    python_stats, python_time = timed(
+        lambda: analytics.collect(analytics.parse_sessions(rows, canonicalize), start_ts, end_ts))
+    numpy_stats, numpy_time = timed(analytics.collect_arrays, rows, start_ts, end_ts, canonicalize)
+    assert dict(python_stats.aggregated_data) == dict(numpy_stats.aggregated_data)
+    assert dict(python_stats.hourly) == dict(numpy_stats.hourly)
+    assert python_stats.last_seen == numpy_stats.last_seen
+
+    print(f"rows: {args.rows:,}")
+    print(f"pure Python: {python_time * 1000:8.1f} ms")
+    print(f"NumPy:       {numpy_time * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
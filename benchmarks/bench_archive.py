@@ -0,0 +1,80 @@
+"""古い記録のアーカイブ (archive.py / hawk_cli.py compact) のベンチマーク
+
+synthetic.py の合成履歴を一時ディレクトリの DB に作り、
+- 全履歴の走査 (iter_session_records を最後まで読む)
+- バックフィルの統計 (すべての週次・月次の期間の hawk_cli.collect_job_stats)
+を SQLite だけの場合と、直近 --keep-days 日を残してアーカイブに移した後とで比較する。
+移した後の統計・書き出し・件数が移す前と一致することも確かめる。
+
+使い方: python benchmarks/bench_archive.py --rows 100000 1000000 --keep-days 90
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import hawk_cli
+import history_io
+import storage
+from synthetic import build_history_db
+
+END_DATE = datetime.date(2025, 6, 29)
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+def scan(conn):
+    return sum(1 for _row in storage.iter_session_records(conn))
+
+def comparable(job_stats):
+    return {job: (dict(stats.aggregated_data), dict(stats.hourly), stats.last_seen, stats.rows, sorted(stats.sessions))
+            for job, stats in job_stats.items()}
+
+def measure(conn, jobs):
+    rows, scan_time = timed(lambda: scan(conn))
+    job_stats, stats_time = timed(lambda: hawk_cli.collect_job_stats(conn, jobs))
+    return rows, scan_time, comparable(job_stats), stats_time
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--keep-days', type=int, default=hawk_cli.DEFAULT_KEEP_DAYS)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'archived':>10} {'db MB':>13} {'archive MB':>11} {'compact s':>10} "
+          f"{'scan s':>15} {'backfill s':>15}")
+    for count in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'habit_log.db')
+            build_history_db(db_path, count, END_DATE).close()
+            conn = sqlite3.connect(db_path)
+            first_date = storage.first_session_date(conn)
+            jobs = hawk_cli.plan_reports(hawk_cli.REPORT_TYPES, first_date, END_DATE)
+            rows, sqlite_scan, expected, sqlite_stats = measure(conn, jobs)
+            export_range = (END_DATE - datetime.timedelta(days=args.keep_days * 2), END_DATE)
+            exported = list(history_io.export_sessions(conn, *export_range))
+            db_before = os.path.getsize(db_path)
+
+            def compact():
+                moved = storage.archive_sessions(conn, END_DATE - datetime.timedelta(days=args.keep_days))
+                conn.execute("VACUUM")
+                return moved
+            moved, compact_time = timed(compact)
+            archived_rows, archive_scan, actual, archive_stats = measure(conn, jobs)
+            assert archived_rows == rows, "走査した件数が一致しません"
+            assert actual == expected, "アーカイブ後の統計が一致しません"
+            assert list(history_io.export_sessions(conn, *export_range)) == exported, "書き出しが一致しません"
+            archive_bytes = os.path.getsize(storage.archive_path(conn))
+            conn.close()
+            print(f"{count:10,} {moved:10,} {db_before / 1e6:6.1f} → {os.path.getsize(db_path) / 1e6:4.1f} "
+                  f"{archive_bytes / 1e6:11.1f} {compact_time:10.2f} {sqlite_scan:6.2f} → {archive_scan:6.2f} "
+                  f"{sqlite_stats:6.2f} → {archive_stats:6.2f}")
+
+if __name__ == "__main__":
+    main()
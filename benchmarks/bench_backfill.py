@@ -0,0 +1,59 @@
+"""ヘッドレスのバックフィル (hawk_cli) のスループットのベンチマーク
+
+数年分の合成履歴を一時ディレクトリのDBに作り、すべての週次・月次レポートを
+ワーカー数を変えて生成し、reports/sec を比較する。
+フィードバックはネットワークを使わない LocalBackend で生成する。
+
+使い方: python benchmarks/bench_backfill.py --rows 300000 --workers 1 4 --font path/to/font.ttf
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import hawk_cli
+import report
+import storage
+from bench_storage import build_legacy_db
+from canonical import get_canonical_name
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count()])
+    parser.add_argument('--font', default=report.FONT_PATH)
+    args = parser.parse_args()
+    font_path = os.path.abspath(args.font)
+    if not os.path.exists(font_path):
+        sys.exit(f"フォントファイルが見つかりません: {font_path}")
+    os.environ['HAWK_FEEDBACK_BACKEND'] = 'local'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'habit_log.db')
+        last_date = build_legacy_db(db_path, args.rows)
+        conn = sqlite3.connect(db_path)
+        storage.migrate(conn, get_canonical_name)
+        first_date = storage.first_session_date(conn)
+        conn.close()
+        jobs = hawk_cli.plan_reports(hawk_cli.REPORT_TYPES, first_date, last_date + datetime.timedelta(days=1))
+        print(f"rows: {args.rows:,}  history: {first_date} - {last_date}  reports: {len(jobs)}")
+
+        os.chdir(tmp)
+        results = []
+        for workers in args.workers:
+            # 毎回フィードバックのキャッシュを空にして同じ条件で計測する
+            conn = sqlite3.connect(db_path)
+            with conn:
+                conn.execute("DELETE FROM feedback_cache")
+            conn.close()
+            generated, failed, elapsed = hawk_cli.generate_reports(db_path, font_path, jobs, workers, verbose=False)
+            results.append((workers, generated, failed, elapsed))
+        for workers, generated, failed, elapsed in results:
+            print(f"workers={workers:3}: {generated} reports, {failed} failed, "
+                  f"{elapsed:7.2f} s, {generated / elapsed:7.2f} reports/sec")
+
+if __name__ == "__main__":
+    main()
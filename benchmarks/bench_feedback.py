@@ -0,0 +1,75 @@
+"""非同期フィードバッククライアント (feedback.AsyncFeedbackClient) のベンチマーク
+
+feedback_server.py の代替サーバーを起動し、requests 件の問い合わせを
+1件ずつ順に行った場合と、同時実行数 concurrency で同時に行った場合の経過時間・再試行回数・
+失敗件数・サーバー側の最大同時処理数を比較する。応答しない要求を混ぜて
+タイムアウトを、途中で cancel() を呼んで取り消しの速さも確認する。
+
+使い方: python benchmarks/bench_feedback.py --requests 20 --latency 1 --error-rate 0.2 --concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import feedback
+from feedback_server import start_server
+
+def run_client(server, prompts, args, concurrency):
+    """prompts を問い合わせ、(経過秒, 再試行回数, 失敗件数, サーバーの最大同時処理数) を返す"""
+    server.counts.update(requests=0, errors=0, hangs=0, max_in_flight=0)
+    client = feedback.AsyncFeedbackClient(feedback.HttpBackend(server.url), timeout=args.timeout,
+                                          attempts=args.attempts, base_delay=args.base_delay,
+                                          max_concurrency=concurrency)
+    started = time.perf_counter()
+    results = asyncio.run(client.generate_many([(prompt, 'strict') for prompt in prompts]))
+    elapsed = time.perf_counter() - started
+    failures = sum(isinstance(result, BaseException) for result in results)
+    return elapsed, client.retries, failures, server.counts['max_in_flight']
+
+def measure_cancel(server, prompts, args):
+    """別スレッドから cancel() を呼んでから、すべての要求が終わるまでの秒数"""
+    client = feedback.AsyncFeedbackClient(feedback.HttpBackend(server.url), timeout=args.timeout,
+                                          max_concurrency=args.concurrency)
+    cancelled_at = []
+
+    def cancel_later():
+        time.sleep(args.latency / 2)
+        cancelled_at.append(time.perf_counter())
+        client.cancel()
+    threading.Thread(target=cancel_later).start()
+    results = asyncio.run(client.generate_many([(prompt, 'strict') for prompt in prompts]))
+    cancelled = sum(isinstance(result, asyncio.CancelledError) for result in results)
+    return time.perf_counter() - cancelled_at[0], cancelled
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=1.0, help="サーバーの応答までの秒数")
+    parser.add_argument('--error-rate', type=float, default=0.2, help="サーバーが 503 を返す割合")
+    parser.add_argument('--hang-rate', type=float, default=0.05, help="サーバーが応答しない割合")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=3.0)
+    parser.add_argument('--attempts', type=int, default=3)
+    parser.add_argument('--base-delay', type=float, default=0.5)
+    args = parser.parse_args()
+
+    server = start_server(latency=args.latency, jitter=args.latency * 0.2, error_rate=args.error_rate,
+                          hang_rate=args.hang_rate, hang=args.timeout * 2)
+    prompts = [f"- activity {index}: 1h00m (1回)" for index in range(args.requests)]
+    print(f"requests: {args.requests}  latency: {args.latency}s  error rate: {args.error_rate}  "
+          f"hang rate: {args.hang_rate}  timeout: {args.timeout}s")
+    print(f"{'':12} {'elapsed s':>10} {'retries':>8} {'failed':>7} {'max in flight':>14}")
+    for label, concurrency in (("serial", 1), (f"concurrent {args.concurrency}", args.concurrency)):
+        elapsed, retries, failures, in_flight = run_client(server, prompts, args, concurrency)
+        print(f"{label:12} {elapsed:10.2f} {retries:8} {failures:7} {in_flight:14}")
+    server.error_rate = server.hang_rate = 0.0
+    elapsed, cancelled = measure_cancel(server, prompts, args)
+    print(f"cancel: {cancelled} 件を {elapsed * 1000:.1f} ms で取り消しました")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""活動履歴の一括取り込み・書き出し (history_io) のベンチマーク
+
+合成した CSV を一時ディレクトリに作り、チャンクサイズごとに空のDBへ取り込んだあと、
+CSV と JSONL に書き出して rows/sec とプロセスの最大常駐メモリを表示する。
+
+使い方: python benchmarks/bench_history_io.py --rows 5000000 --chunk-sizes 1000 10000 100000
+"""
+import argparse
+import csv
+import datetime
+import os
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import history_io
+import storage
+from canonical import get_canonical_name
+
+ACTIVITY_NAMES = ['風呂', 'ギター', '散歩', '配信', 'youtube', '読書', '勉強', '掃除']
+
+def write_synthetic_csv(path, rows, seed=0):
+    rng = random.Random(seed)
+    current = datetime.datetime(2010, 1, 1)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(history_io.IMPORT_COLUMNS)
+        for _ in range(rows):
+            current += datetime.timedelta(seconds=rng.randint(60, 600))
+            end = current + datetime.timedelta(seconds=rng.randint(60, 7200))
+            writer.writerow((current.strftime(storage.TIME_FORMAT), end.strftime(storage.TIME_FORMAT),
+                             rng.choice(ACTIVITY_NAMES)))
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[history_io.DEFAULT_CHUNK_SIZE])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'source.csv')
+        write_synthetic_csv(source, args.rows)
+        print(f"rows: {args.rows:,}  source: {os.path.getsize(source) / 1e6:.0f} MB  max RSS: {max_rss_mb():.0f} MB")
+        for chunk_size in args.chunk_sizes:
+            db_path = os.path.join(tmp, f'import_{chunk_size}.db')
+            conn = sqlite3.connect(db_path)
+            started = time.perf_counter()
+            result = history_io.import_sessions(conn, history_io.read_records(source, 'csv'),
+                                                get_canonical_name, chunk_size)
+            elapsed = time.perf_counter() - started
+            print(f"import  chunk={chunk_size:>7}: {result.imported / elapsed:>10,.0f} rows/sec "
+                  f"({elapsed:6.1f} s, max RSS {max_rss_mb():.0f} MB)")
+            for file_format in history_io.FORMATS:
+                target = os.path.join(tmp, f'export.{file_format}')
+                started = time.perf_counter()
+                count = history_io.write_records(target, file_format,
+                                                 history_io.export_sessions(conn, chunk_size=chunk_size))
+                elapsed = time.perf_counter() - started
+                print(f"export  {file_format:5} chunk={chunk_size:>7}: {count / elapsed:>10,.0f} rows/sec "
+                      f"({elapsed:6.1f} s, max RSS {max_rss_mb():.0f} MB)")
+            conn.close()
+
+if __name__ == "__main__":
+    main()
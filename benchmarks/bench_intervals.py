@@ -0,0 +1,65 @@
+"""重なりを扱うスイープライン (intervals.Timeline) のベンチマーク
+
+同時に動くタイマーを模して、期間内に一様に始まり対数正規分布の長さを持つ記録を件数ごとに作り、
+構築 (整列)・実時間の集計・重なりを等分した活動ごとの集計・日ごとの分割・
+時刻 t に記録中だった活動の問い合わせの時間を計測する。
+件数あたりの時間が log n 程度の伸びに収まっていれば O(n log n) で動いている。
+
+使い方: python benchmarks/bench_intervals.py --sessions 100000 1000000 5000000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from intervals import SECONDS_PER_DAY, Timeline
+
+ACTIVITY_NAMES = ['入浴', '音楽活動', '運動', '配信業務', 'コンテンツ消費', '読書', '勉強', '掃除']
+
+def synthetic_sessions(count, seed=0):
+    """1日あたり平均6件、平均約30分の記録 (1日の中での重なりが生じる)"""
+    rng = random.Random(seed)
+    days = max(1, count // 6)
+    start = 20_000 * SECONDS_PER_DAY
+    sessions = []
+    for _ in range(count):
+        begin = start + rng.randrange(days * SECONDS_PER_DAY)
+        sessions.append((begin, begin + int(rng.lognormvariate(7.2, 0.8)), rng.choice(ACTIVITY_NAMES)))
+    return sessions
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--queries', type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"{'sessions':>10} {'build s':>8} {'union s':>8} {'attrib s':>9} {'by day s':>9} "
+          f"{'query µs':>9} {'µs/(n log n)':>13} {'overlap %':>10}")
+    for count in args.sessions:
+        sessions = synthetic_sessions(count)
+        timeline, build_time = timed(lambda: Timeline(sessions))
+        union, union_time = timed(timeline.union_seconds)
+        attributed, attributed_time = timed(timeline.attributed_seconds)
+        _by_day, by_day_time = timed(lambda: timeline.union_by(SECONDS_PER_DAY))
+        timeline.active_at(sessions[0][0])  # チェックポイントの構築は問い合わせの時間に含めない
+        rng = random.Random(1)
+        first, last = timeline.bounds()
+        times = [rng.randrange(first, last) for _ in range(args.queries)]
+        _, query_time = timed(lambda: [timeline.active_at(t) for t in times])
+        assert abs(sum(attributed.values()) - union) < 1e-3 * count
+        recorded = sum(end - begin for begin, end, _name in sessions)
+        total = build_time + union_time + attributed_time
+        print(f"{count:10,} {build_time:8.2f} {union_time:8.2f} {attributed_time:9.2f} {by_day_time:9.2f} "
+              f"{query_time / args.queries * 1e6:9.1f} {total / (count * math.log2(count)) * 1e6:13.3f} "
+              f"{(recorded - union) / recorded * 100:10.1f}")
+
+if __name__ == "__main__":
+    main()
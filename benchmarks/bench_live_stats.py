@@ -0,0 +1,81 @@
+"""統計パネル (live_stats.LiveStats) の更新時間のベンチマーク
+
+synthetic.py で数年分の合成履歴を一時ディレクトリの DB に作り、日次ロールアップからの初期化と、
+計測中のタイマーを --timers 個含めた1回の更新 (期間ごとの合計 + 表示用の文字列) の時間を計測する。
+比較として、同じ合計を更新のたびに日次ロールアップへ問い合わせた場合の時間も示す。
+初期化直後の合計が日次ロールアップの集計と一致することも確かめる。
+
+使い方: python benchmarks/bench_live_stats.py --rows 1000000 --timers 50
+"""
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+import storage
+from canonical import get_canonical_name
+from live_stats import PERIODS, LiveStats, format_totals, period_starts
+from synthetic import activity_names, build_history_db
+
+# 月の途中の水曜日 (今日・今週・今月の期間がすべて異なる)
+TODAY = datetime.date(2025, 6, 18)
+
+def percentile(samples, fraction):
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--timers', type=int, default=50)
+    parser.add_argument('--refreshes', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'habit_log.db')
+        build_history_db(db_path, args.rows, TODAY + datetime.timedelta(days=1)).close()
+        db = database.open_database(db_path)
+        stats = LiveStats(TODAY)
+        started = time.perf_counter()
+        stats.seed(db.daily_totals(*stats.seed_range()))
+        seed_time = time.perf_counter() - started
+
+        now_ts = storage.to_epoch(datetime.datetime.combine(TODAY, datetime.time(21)))
+        end_date = TODAY + datetime.timedelta(days=1)
+        idle = stats.totals(now_ts)
+        for period, start_date in period_starts(TODAY).items():
+            expected = {row.activity: row.duration for row in db.period_totals(start_date, end_date)}
+            assert idle[period] == expected, f"{period} の合計が日次ロールアップと一致しません"
+
+        # 計測中のタイマーは数時間前から動いている (一部は日付をまたいで前日から)
+        names = activity_names()
+        running = [(get_canonical_name(names[index % len(names)].strip()), now_ts - 600 * (index + 1) * 7)
+                   for index in range(args.timers)]
+        samples = []
+        for step in range(args.refreshes):
+            started = time.perf_counter()
+            totals = stats.totals(now_ts + step, running)
+            texts = [format_totals(totals[period]) for period, _label in PERIODS]
+            samples.append(time.perf_counter() - started)
+        sql_samples = []
+        for _ in range(min(args.refreshes, 200)):
+            started = time.perf_counter()
+            for start_date in period_starts(TODAY).values():
+                db.period_totals(start_date, end_date)
+            sql_samples.append(time.perf_counter() - started)
+        database.close_all()
+
+    print(f"rows: {args.rows:,}  running timers: {args.timers}  activities today: {len(totals['today'])}")
+    print(f"seed from daily_totals: {seed_time * 1000:8.2f} ms")
+    print(f"refresh (in memory):    median {statistics.median(samples) * 1e6:7.1f} µs  "
+          f"p99 {percentile(samples, 0.99) * 1e6:7.1f} µs")
+    print(f"query daily_totals:     median {statistics.median(sql_samples) * 1e6:7.1f} µs  "
+          f"p99 {percentile(sql_samples, 0.99) * 1e6:7.1f} µs")
+    assert texts and percentile(samples, 0.99) < 1e-3, "更新が 1 ms を超えました"
+
+if __name__ == "__main__":
+    main()
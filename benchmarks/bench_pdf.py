@@ -0,0 +1,98 @@
+"""PDF 描画のベンチマーク (レポートごとの準備 vs PdfRenderer の再利用)
+
+合成したレポートの内容を、以下の3通りで 1 件と N 件描画し、1件あたりの時間を比較する。
+  - 旧実装: レポートごとにフォント登録とスタイルシートの作成を行い、タイムログを1つの Paragraph に連結する
+  - report.PdfRenderer: 準備は1回だけで、レポートごとに別の PDF に描画する
+  - report.PdfRenderer.render_combined: N 件を1つの PDF にまとめて描画する
+
+使い方: python benchmarks/bench_pdf.py --reports 100 --font path/to/font.ttf
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import report
+from feedback import LocalBackend
+
+ACTIVITY_NAMES = ['入浴', '音楽活動', '運動', '配信業務', 'コンテンツ消費', '読書', '勉強', '掃除', '料理', '睡眠']
+
+def synthetic_reports(count, seed=0):
+    rng = random.Random(seed)
+    backend = LocalBackend()
+    reports = []
+    for index in range(count):
+        aggregated_data = {name: {'duration': rng.randint(600, 200_000), 'count': rng.randint(1, 40)}
+                           for name in rng.sample(ACTIVITY_NAMES, rng.randint(3, len(ACTIVITY_NAMES)))}
+        prompt = ''.join(f"- {name}: {data['duration']} seconds\n" for name, data in aggregated_data.items())
+        reports.append({'title': f"Hawk Eye Report {index}", 'feedback': backend.generate(prompt),
+                        'aggregated_data': aggregated_data})
+    return reports
+
+def legacy_render(report_data, filename):
+    """PdfRenderer 導入前の generate_pdf_report_file と同じ処理"""
+    A4, SimpleDocTemplate, Paragraph, Spacer, getSampleStyleSheet, pdfmetrics, TTFont = report.get_heavy_libs()[1:8]
+    pdfmetrics.registerFont(TTFont('ZenAntique', report.FONT_PATH))
+    doc = SimpleDocTemplate(filename, pagesize=A4)
+    styles = getSampleStyleSheet()
+    styles['Normal'].fontName = 'ZenAntique'
+    styles['Heading1'].fontName = 'ZenAntique'
+    styles['Title'].fontName = 'ZenAntique'
+    styles['Normal'].leading = 14
+    story = []
+    log_text = "## Hawk's Time Log\n"
+    for activity, data in sorted(report_data['aggregated_data'].items()):
+        log_text += f"* {activity}: {report.format_hms(data['duration'])} ({data['count']} times)\n"
+    story.append(Paragraph(log_text, styles['Normal']))
+    story.append(Spacer(1, 12))
+    for paragraph in report_data['feedback'].split('\n'):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if paragraph.startswith('### '):
+            story.append(Paragraph(paragraph.replace('### ', ''), styles['Heading1']))
+        else:
+            story.append(Paragraph(paragraph, styles['Normal']))
+            story.append(Spacer(1, 6))
+    doc.build(story)
+
+def run_legacy(reports, directory):
+    for index, report_data in enumerate(reports):
+        legacy_render(report_data, os.path.join(directory, f"legacy_{index}.pdf"))
+
+def run_renderer(reports, directory):
+    renderer = report.PdfRenderer()
+    for index, report_data in enumerate(reports):
+        renderer.render(report_data, os.path.join(directory, f"renderer_{index}.pdf"))
+
+def run_combined(reports, directory):
+    report.PdfRenderer().render_combined(reports, os.path.join(directory, "combined.pdf"))
+
+def per_report_ms(func, reports, directory):
+    started = time.perf_counter()
+    func(reports, directory)
+    return (time.perf_counter() - started) * 1000 / len(reports)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=100)
+    parser.add_argument('--font', default=report.FONT_PATH)
+    args = parser.parse_args()
+    report.FONT_PATH = os.path.abspath(args.font)
+    if not os.path.exists(report.FONT_PATH):
+        sys.exit(f"フォントファイルが見つかりません: {report.FONT_PATH}")
+    report.get_heavy_libs()
+    reports = synthetic_reports(args.reports)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'':10} {'1 report':>12} {f'{args.reports} reports':>14}  (ms/report)")
+        for label, func in (("legacy", run_legacy), ("renderer", run_renderer), ("combined", run_combined)):
+            single = per_report_ms(func, reports[:1], tmp)
+            many = per_report_ms(func, reports, tmp)
+            print(f"{label:10} {single:12.2f} {many:14.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""プロンプトの圧縮 (prompt_budget) のベンチマーク
+
+活動の種類数ごとに合成した ReportStats から、圧縮なしのプロンプトと
+トークン数の上限に収めたプロンプトを作り、推定トークン数・バイト数・作成時間と、
+トークン数に比例して待つ LocalBackend での応答時間を比較する。
+
+使い方: python benchmarks/bench_prompt.py --activities 10 100 1000 --budget 1500 --latency-per-token 0.0005
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import analytics
+import feedback
+import prompt_budget
+import report
+import storage
+from canonical import SYNONYM_MAPPING
+
+NOW = datetime.datetime(2025, 6, 29)
+
+def synthetic_stats(activities, seed=0):
+    """activities 種類の活動のうち約8割が今期に記録され、残りは長期間記録の無い ReportStats"""
+    rng = random.Random(seed)
+    start = NOW - datetime.timedelta(days=30)
+    stats = analytics.ReportStats(storage.to_epoch(start), storage.to_epoch(NOW))
+    names = list(SYNONYM_MAPPING) + [f"activity {index}" for index in range(max(0, activities - len(SYNONYM_MAPPING)))]
+    for name in names[:activities]:
+        if rng.random() < 0.8:
+            stats.aggregated_data[name]['duration'] = rng.lognormvariate(9, 1.2)
+            stats.aggregated_data[name]['count'] = rng.randint(1, 60)
+            stats.last_seen[name] = storage.to_epoch(NOW) - rng.randrange(86400 * 30)
+        else:
+            stats.last_seen[name] = storage.to_epoch(start) - rng.randrange(86400 * 30, 86400 * 365)
+    for hour in range(24):
+        stats.hourly[hour] = rng.randrange(3600 * 100)
+    return stats
+
+def timed(build, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = build()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--activities', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--budget', type=int, default=prompt_budget.DEFAULT_MAX_TOKENS)
+    parser.add_argument('--latency-per-token', type=float, default=0.0005,
+                        help="LocalBackend が1トークンあたりに待つ秒数")
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    budget = prompt_budget.PromptBudget(args.budget)
+    backend = feedback.LocalBackend(latency_per_token=args.latency_per_token)
+
+    print(f"{'activities':>10} {'':8} {'tokens':>8} {'bytes':>8} {'build ms':>9} {'backend ms':>11}")
+    for activities in args.activities:
+        stats = synthetic_stats(activities)
+
+        def full():
+            formatted_data, _aggregated = report.format_data_for_ai(stats)
+            return report.build_prompt(formatted_data, stats, NOW, False)
+
+        def compact():
+            return report.build_compact_prompt(stats, NOW, False, budget)
+
+        for label, build in (("full", full), ("compact", compact)):
+            prompt, build_ms = timed(build, args.repeats)
+            _response, backend_ms = timed(lambda: backend.generate(prompt), args.repeats)
+            print(f"{activities:10} {label:8} {prompt_budget.estimate_tokens(prompt):8} "
+                  f"{len(prompt.encode('utf-8')):8} {build_ms:9.2f} {backend_ms:11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""起動時間のベンチマーク
+
+HabitHawk.py --startup-benchmark を一時ディレクトリで繰り返し起動し、
+import / db / theme / ui の各段階の所要時間 (ms) を表示する。
+1回目はキャッシュ (テーマファイル・縮小済み画像) が無い状態、2回目以降はキャッシュが効いた状態になる。
+UI の構築にはディスプレイが必要。
+
+使い方: python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ['import', 'db', 'theme', 'ui']
+
+def run_once(workdir):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'HabitHawk.py'), '--startup-benchmark'],
+                            cwd=workdir, capture_output=True, text=True, check=True)
+    wall = (time.perf_counter() - started) * 1000
+    breakdown = json.loads(result.stdout.strip().splitlines()[-1])
+    breakdown['process'] = wall
+    return breakdown
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # resource_path はカレントディレクトリ基準のため、画像だけを作業ディレクトリに用意する
+        shutil.copytree(os.path.join(ROOT, 'images'), os.path.join(workdir, 'images'))
+        cold = run_once(workdir)
+        warm = [run_once(workdir) for _ in range(args.runs)]
+
+    print(f"{'phase':<8} {'cold ms':>9} {'warm ms (median)':>17}")
+    for phase in PHASES + ['process']:
+        print(f"{phase:<8} {cold[phase]:9.1f} {statistics.median(run[phase] for run in warm):17.1f}")
+
+if __name__ == "__main__":
+    main()
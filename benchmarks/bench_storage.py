@@ -0,0 +1,86 @@
+"""activities テーブルのマイグレーションと期間検索のベンチマーク
+
+旧スキーマ (TEXT列のみ) のDBを合成データで作成し、以下を計測する。
+  - storage.migrate による既存DBの移行時間
+  - 旧実装 (全件 fetchall + Python側の文字列比較) による週次期間の抽出
+  - 新実装 (start_ts インデックスの範囲検索 + ストリーミング) による週次期間の抽出
+
+使い方: python benchmarks/bench_storage.py --rows 1000000
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+import storage
+
+ACTIVITY_NAMES = ['風呂', 'ギター', '散歩', '配信', 'youtube', '読書', '勉強', '掃除']
+
+def build_legacy_db(path, rows, seed=0):
+    """旧スキーマのDBに rows 件のセッションを書き込む"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE activities (start_time TEXT, end_time TEXT, activity_name TEXT)")
+    start = datetime.datetime(2015, 1, 1)
+    def generate():
+        current = start
+        for _ in range(rows):
+            current += datetime.timedelta(seconds=rng.randint(60, 600))
+            end = current + datetime.timedelta(seconds=rng.randint(60, 7200))
+            yield (current.strftime(storage.TIME_FORMAT), end.strftime(storage.TIME_FORMAT),
+                   rng.choice(ACTIVITY_NAMES))
+    conn.executemany("INSERT INTO activities VALUES (?, ?, ?)", generate())
+    conn.commit()
+    last = conn.execute("SELECT MAX(start_time) FROM activities").fetchone()[0]
+    conn.close()
+    return datetime.datetime.strptime(last, storage.TIME_FORMAT).date()
+
+def legacy_period(path, start_date, end_date):
+    conn = sqlite3.connect(path)
+    all_data = conn.execute("SELECT start_time, end_time, activity_name FROM activities").fetchall()
+    period_data = [
+        row for row in all_data
+        if start_date.strftime("%Y-%m-%d %H:%M:%S") <= row[0] < end_date.strftime("%Y-%m-%d %H:%M:%S")
+    ]
+    conn.close()
+    return len(period_data)
+
+def indexed_period(path, start_date, end_date):
+    return sum(1 for _ in database.open_database(path).sessions(start_date, end_date))
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        last_date = build_legacy_db(path, args.rows)
+        start_date = last_date - datetime.timedelta(days=7)
+
+        legacy_count, legacy_time = timed(legacy_period, path, start_date, last_date)
+        conn = sqlite3.connect(path)
+        _, migrate_time = timed(storage.migrate, conn)
+        conn.close()
+        indexed_count, indexed_time = timed(indexed_period, path, start_date, last_date)
+        assert legacy_count == indexed_count, (legacy_count, indexed_count)
+        database.close_all()
+
+        print(f"rows: {args.rows:,}  period rows: {indexed_count:,}")
+        print(f"migration:            {migrate_time:8.3f} s")
+        print(f"legacy full scan:     {legacy_time * 1000:8.1f} ms")
+        print(f"indexed range query:  {indexed_time * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
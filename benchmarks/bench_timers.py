@@ -0,0 +1,161 @@
+"""多数のタイマーでのメモリ使用量とスクロールの遅延のベンチマーク
+
+- タイマーの状態: 旧実装の dict と timers.TimerState (__slots__) を tracemalloc で比較する
+- ウィジェット: 旧実装 (タイマーごとに9個) と VirtualTimerList (見えている行の分だけ) の数を比較する
+- ディスプレイがある場合は実際にウィンドウを作り、旧実装の CTkScrollableFrame と
+  VirtualTimerList のそれぞれについて構築時間・RSS の増加・スクロール1回の遅延を計測する
+
+使い方: python benchmarks/bench_timers.py --timers 500
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from timers import TimerStore
+
+LEGACY_WIDGETS_PER_TIMER = 9
+
+def legacy_state():
+    """旧実装の self.timers の値 (ウィジェットの参照を除く)"""
+    return {
+        'is_tracking': False,
+        'start_time': None,
+        'current_activity': "",
+        'tracking_duration': 0,
+        'start_monotonic': None,
+        'label_text': "00:00:00",
+        'frame': None,
+        'entry': None,
+        'timer_label': None,
+        'start_button': None,
+        'stop_button': None,
+    }
+
+def traced_bytes(build):
+    tracemalloc.start()
+    objects = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return size
+
+def rss_mb():
+    """現在の常駐メモリ (Linux では /proc、それ以外では最大値で代用)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def latency_ms(root, scroll, positions):
+    samples = []
+    for position in positions:
+        started = time.perf_counter()
+        scroll(position)
+        root.update_idletasks()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95)]
+
+def build_legacy_rows(ctk, tk, container, count):
+    """旧実装の add_timer_ui と同じ構成の行を count 個作る"""
+    for _ in range(count):
+        frame = ctk.CTkFrame(container, fg_color="transparent")
+        frame.pack(pady=5, fill="x")
+        ctk.CTkEntry(frame, width=280, font=("Helvetica", 12)).pack(pady=(0, 5))
+        ctk.CTkLabel(frame, text="00:00:00", font=("Helvetica", 24)).pack(pady=5)
+        button_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        button_frame.pack(pady=(5, 0))
+        ctk.CTkButton(button_frame, text="START").pack(side=tk.LEFT, expand=True, padx=5)
+        ctk.CTkButton(button_frame, text="STOP", state=tk.DISABLED).pack(side=tk.RIGHT, expand=True, padx=5)
+        control_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        control_frame.pack(pady=(5, 0))
+        ctk.CTkButton(control_frame, text="+").pack(side=tk.LEFT, padx=5)
+        ctk.CTkButton(control_frame, text="-").pack(side=tk.LEFT, padx=5)
+
+class Controller:
+    """VirtualTimerList が呼び出す App のメソッドの代わり"""
+    def __init__(self, count):
+        self.timers = TimerStore()
+        for index in range(count):
+            self.timers.add().entry_text = f"activity {index}"
+
+    def start_tracking(self, timer_id):
+        pass
+
+    def stop_tracking(self, timer_id):
+        pass
+
+    def add_timer(self):
+        pass
+
+    def remove_timer(self, timer_id):
+        pass
+
+def bench_widgets(count, scrolls):
+    import tkinter as tk
+    try:
+        import customtkinter as ctk
+        root = ctk.CTk()
+    except (ImportError, tk.TclError) as e:
+        print(f"ウィンドウを作成できないため、ウィジェットの計測は省略します: {e}")
+        return
+    import timer_view
+    root.geometry("320x450")
+    rng = random.Random(0)
+    results = []
+
+    before = rss_mb()
+    started = time.perf_counter()
+    controller = Controller(count)
+    timer_list = timer_view.VirtualTimerList(root, controller)
+    timer_list.pack(fill="both", expand=True, padx=10, pady=10)
+    root.update()
+    build_time = time.perf_counter() - started
+    limit = count * timer_view.TIMER_ROW_HEIGHT
+    latency = latency_ms(root, timer_list.scroll_to, [rng.randrange(limit) for _ in range(scrolls)])
+    widgets = len(timer_list.rows) * LEGACY_WIDGETS_PER_TIMER
+    results.append(("virtual", widgets, build_time, rss_mb() - before, latency))
+    timer_list.destroy()
+
+    before = rss_mb()
+    started = time.perf_counter()
+    container = ctk.CTkScrollableFrame(root)
+    container.pack(fill="both", expand=True, padx=10, pady=10)
+    build_legacy_rows(ctk, tk, container, count)
+    root.update()
+    build_time = time.perf_counter() - started
+    latency = latency_ms(root, container._parent_canvas.yview_moveto, [rng.random() for _ in range(scrolls)])
+    results.append(("legacy", count * LEGACY_WIDGETS_PER_TIMER, build_time, rss_mb() - before, latency))
+    root.destroy()
+
+    print(f"{'':8} {'widgets':>8} {'build s':>8} {'RSS MB':>8} {'scroll p50 ms':>14} {'p95 ms':>8}")
+    for label, widgets, build_time, rss, (p50, p95) in results:
+        print(f"{label:8} {widgets:8} {build_time:8.2f} {rss:8.1f} {p50:14.2f} {p95:8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--timers', type=int, default=500)
+    parser.add_argument('--scrolls', type=int, default=200)
+    args = parser.parse_args()
+
+    legacy = traced_bytes(lambda: {f"timer_{index}": legacy_state() for index in range(args.timers)})
+
+    def build_store():
+        store = TimerStore()
+        for _ in range(args.timers):
+            store.add()
+        return store
+    slotted = traced_bytes(build_store)
+    print(f"timers: {args.timers}")
+    print(f"state  dict: {legacy / 1024:8.1f} KiB   TimerState: {slotted / 1024:8.1f} KiB")
+    bench_widgets(args.timers, args.scrolls)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""同じプロセスで Hawk Eye の問い合わせを2回 (2つのレポート分) 行えることの確認
+
+report.request_feedback はレポートごとに asyncio.run で新しいイベントループを作る。
+Gemini の非同期クライアント (gRPC aio) は最初に使ったループに結び付くため、
+同じ GeminiBackend を2回目のレポートで使うと "Event loop is closed" で失敗していた。
+既定では、最初のループに結び付いてループが変わると同じエラーを出す代わりのモデルで
+GeminiBackend の非同期の呼び出しを確かめる (ネットワークも API キーも使わない)。
+--live を付けると GEMINI_API_KEY の実際の API に問い合わせる。
+
+使い方: python benchmarks/check_feedback_loops.py [--live]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+import feedback
+import report
+import storage
+
+class LoopBoundModel:
+    """最初に呼ばれたイベントループでしか使えない generate_content_async を持つモデル"""
+    def __init__(self):
+        self.loop = None
+        self.calls = 0
+
+    async def generate_content_async(self, prompt):
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+        elif self.loop is not loop:
+            raise RuntimeError("Event loop is closed")
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return type('Response', (), {'text': feedback.LocalBackend.reply(prompt)})()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--live', action='store_true', help="GEMINI_API_KEY で実際の API に問い合わせる")
+    args = parser.parse_args()
+    if args.live and not os.getenv("GEMINI_API_KEY"):
+        sys.exit("--live には GEMINI_API_KEY が必要です。")
+    os.environ['HAWK_FEEDBACK_BACKEND'] = 'gemini'
+    os.environ.setdefault('GEMINI_API_KEY', 'offline-check')
+    os.environ['HAWK_FEEDBACK_ATTEMPTS'] = '1'
+    os.environ.setdefault('HAWK_FEEDBACK_TIMEOUT', '10')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'habit_log.db')
+        conn = database.connect(db_path)
+        storage.migrate(conn)
+        conn.close()
+        report.configure(db_path, report.FONT_PATH)
+        # request_feedback と同じ設定で作られ、共有されるバックエンド
+        backend = report.get_feedback_client(report.get_database()).backend
+        model = None
+        if not args.live:
+            model = backend._model = LoopBoundModel()
+        try:
+            # 2つのレポート (キャッシュに当たらないよう別のプロンプト) をそれぞれ別の asyncio.run で問い合わせる
+            for index in range(2):
+                response = report.request_feedback([(f"- check {index}: 1h00m (1回)", 'strict')])[0]
+                if isinstance(response, BaseException):
+                    sys.exit(f"{index + 1} 回目のレポートの問い合わせに失敗しました: {response!r}")
+                print(f"{index + 1} 回目: OK ({response.splitlines()[0]})")
+        finally:
+            database.close_all()
+    if model is not None:
+        print(f"代わりのモデルへの呼び出し: {model.calls} 回 (すべて同じイベントループ)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""フィードバック API の代替 HTTP サーバー (遅延とエラーを注入できる)
+
+POST された {"prompt", "model"} に LocalBackend と同じ決定的な応答を {"text"} で返す。
+応答の前に latency 秒 (± jitter) 待ち、error_rate の割合で 503 を返し、
+hang_rate の割合で応答せずに hang 秒待つ (クライアントのタイムアウトの確認用)。
+
+使い方:
+    python benchmarks/feedback_server.py --port 8765 --latency 2 --error-rate 0.2
+    HAWK_FEEDBACK_BACKEND=http HAWK_FEEDBACK_URL=http://127.0.0.1:8765/generate python hawk_cli.py backfill
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from feedback import LocalBackend
+
+class FeedbackServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0, hang_rate=0.0, hang=30.0, seed=0):
+        super().__init__(address, FeedbackHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang = hang
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'errors': 0, 'hangs': 0, 'in_flight': 0, 'max_in_flight': 0}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/generate"
+
+    def draw(self):
+        """この要求の (待ち秒数, 結果) を決める。結果は 'ok' / 'error' / 'hang'"""
+        with self.lock:
+            self.counts['requests'] += 1
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            roll = self.rng.random()
+        if roll < self.hang_rate:
+            return self.hang, 'hang'
+        if roll < self.hang_rate + self.error_rate:
+            return delay, 'error'
+        return delay, 'ok'
+
+    def handle_error(self, request, client_address):
+        # タイムアウトや取り消しでクライアントが先に切断するのは想定どおり
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    def count(self, name, delta=1):
+        with self.lock:
+            self.counts[name] += delta
+            self.counts['max_in_flight'] = max(self.counts['max_in_flight'], self.counts['in_flight'])
+
+class FeedbackHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        delay, outcome = self.server.draw()
+        self.server.count('in_flight')
+        try:
+            time.sleep(delay)
+        finally:
+            self.server.count('in_flight', -1)
+        if outcome == 'hang':
+            self.server.count('hangs')
+            self.close_connection = True
+            return
+        if outcome == 'error':
+            self.server.count('errors')
+            self.send_error(503, "injected error")
+            return
+        try:
+            prompt = json.loads(body)['prompt']
+        except (ValueError, KeyError):
+            self.send_error(400, "prompt is required")
+            return
+        payload = json.dumps({'text': LocalBackend.reply(prompt)}, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(host='127.0.0.1', port=0, **options):
+    """バックグラウンドのスレッドでサーバーを起動する (port=0 で空いているポートを使う)"""
+    server = FeedbackServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=1.0, help="応答までの秒数")
+    parser.add_argument('--jitter', type=float, default=0.0, help="latency に加える揺らぎの幅 (秒)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="503 を返す割合")
+    parser.add_argument('--hang-rate', type=float, default=0.0, help="応答しない割合")
+    parser.add_argument('--hang', type=float, default=30.0, help="応答しない場合に接続を保つ秒数")
+    args = parser.parse_args()
+    server = FeedbackServer((args.host, args.port), args.latency, args.jitter, args.error_rate,
+                            args.hang_rate, args.hang)
+    print(f"{server.url} で待ち受けています (Ctrl+C で終了)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(server.counts)
+
+if __name__ == "__main__":
+    main()
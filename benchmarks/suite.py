@@ -0,0 +1,125 @@
+"""レポート生成の段階別ベンチマークと性能劣化の検出
+
+synthetic.py で指定件数の合成履歴を作り、週次・月次レポートを end-to-end で生成して
+instrument のスパンから段階ごとの所要時間 (中央値, ms) を求め、JSON で出力する。
+AI の呼び出しはネットワークを使わない LocalBackend に置き換え、毎回キャッシュを空にする。
+
+--baseline を指定すると保存済みの結果と比較し、いずれかの段階が
+許容率 (--tolerance) と最小差 (--min-delta-ms) の両方を超えて遅くなっていれば終了コード 1 で終わる。
+ベースラインは計測したマシンに依存するため、比較は同じマシンの結果同士で行うこと。
+
+使い方:
+    python benchmarks/suite.py --sizes 10000 100000 --font path/to/font.ttf --baseline benchmarks/baseline.json
+    python benchmarks/suite.py --sizes 10000 100000 --font path/to/font.ttf --update-baseline benchmarks/baseline.json
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+import instrument
+import report
+from synthetic import build_history_db
+
+STAGES = ['get_activity_data', 'format_data_for_ai', 'build_prompt', 'get_ai_feedback',
+          'generate_pdf_report_file', 'generate_report']
+REPORT_TYPES = ['weekly', 'monthly']
+# 日曜日なので週次・月次 (6/1-6/29) のどちらも意味のある期間になる
+REPORT_DATE = datetime.date(2025, 6, 29)
+
+def run_size(size, repeats, seed=0):
+    """size 件の履歴で各レポートを repeats 回生成し、{レポートの種類: {段階: 中央値 ms}} を返す"""
+    started = time.perf_counter()
+    conn = build_history_db(report.DB_PATH, size, REPORT_DATE, seed)
+    print(f"{size:,} 件の履歴を作成しました ({time.perf_counter() - started:.1f} 秒)", file=sys.stderr)
+    results = {}
+    for report_type in REPORT_TYPES:
+        samples = {stage: [] for stage in STAGES}
+        for _ in range(repeats):
+            with conn:
+                conn.execute("DELETE FROM feedback_cache")
+            random.seed(seed)
+            instrument.drain()
+            report.generate_report(report_type, REPORT_DATE)
+            events, _totals = instrument.drain()
+            for event in events:
+                if event['name'] in samples:
+                    samples[event['name']].append(event['dur'] / 1000)
+        results[report_type] = {stage: round(statistics.median(times), 3)
+                                for stage, times in samples.items() if times}
+    conn.close()
+    # レポートが使い回している接続を閉じてから、次の件数のために作り直す
+    database.close_all()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(report.DB_PATH + suffix):
+            os.remove(report.DB_PATH + suffix)
+    return results
+
+def find_regressions(results, baseline, tolerance, min_delta_ms):
+    """baseline より tolerance の割合と min_delta_ms の両方を超えて遅くなった段階を返す"""
+    regressions = []
+    for size, by_type in results.items():
+        for report_type, stages in by_type.items():
+            for stage, current in stages.items():
+                previous = baseline.get(size, {}).get(report_type, {}).get(stage)
+                if previous is None:
+                    continue
+                if current > previous * (1 + tolerance) and current - previous > min_delta_ms:
+                    regressions.append((size, report_type, stage, previous, current))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000],
+                        help="合成履歴の件数 (10000 から 10000000 程度)")
+    parser.add_argument('--repeats', type=int, default=9)
+    parser.add_argument('--font', default=report.FONT_PATH)
+    parser.add_argument('--output', help="結果の JSON の書き出し先 (省略時は標準出力)")
+    parser.add_argument('--baseline', help="比較するベースラインの JSON")
+    parser.add_argument('--update-baseline', metavar='PATH', help="結果をベースラインとして保存する")
+    parser.add_argument('--tolerance', type=float, default=0.3, help="許容する遅くなりの割合")
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help="これ未満の差は誤差として無視する")
+    args = parser.parse_args()
+    font_path = os.path.abspath(args.font)
+    if not os.path.exists(font_path):
+        sys.exit(f"フォントファイルが見つかりません: {font_path}")
+    os.environ['HAWK_FEEDBACK_BACKEND'] = 'local'
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    update_path = os.path.abspath(args.update_baseline) if args.update_baseline else None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        report.init_worker(os.path.join(tmp, 'habit_log.db'), font_path, profile=True)
+        results = {str(size): run_size(size, args.repeats) for size in args.sizes}
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if update_path:
+        with open(update_path, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"ベースラインを更新しました: {update_path}", file=sys.stderr)
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.tolerance, args.min_delta_ms)
+        for size, report_type, stage, previous, current in regressions:
+            print(f"性能劣化: {size} 件 {report_type} {stage}: {previous:.2f} ms -> {current:.2f} ms",
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("ベースラインからの性能劣化はありません。", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
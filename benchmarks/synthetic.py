@@ -0,0 +1,79 @@
+"""ベンチマーク用の合成 activities 履歴
+
+実際の記録に近づけるため、活動名には SYNONYM_MAPPING の正規名と同義語に加えて
+大文字小文字や末尾の空白、1文字の脱字といった表記ゆれと、どのクラスタにも属さない活動を混ぜる。
+名前の出現頻度は Zipf 分布に、開始時刻は日中に偏らせる。
+"""
+import datetime
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+from canonical import SYNONYM_MAPPING, get_canonical_name
+
+OTHER_ACTIVITIES = ['読書', '勉強', '掃除', '料理', '洗濯', '買い物', '昼寝', 'プログラミング', '日記', '瞑想']
+# 時 (0-23) ごとの開始のしやすさ
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 6, 6, 6, 6, 6, 8, 6, 6, 6, 6, 6, 8, 10, 10, 8, 6, 3]
+
+def activity_names(seed=0):
+    """表記ゆれを含む活動名の一覧 (出現しやすい順)"""
+    rng = random.Random(seed)
+    names = []
+    for canonical, synonyms in SYNONYM_MAPPING.items():
+        names.append(canonical)
+        for synonym in synonyms:
+            names.extend([synonym, synonym.upper(), synonym.capitalize(), f"{synonym} "])
+            if len(synonym) > 3:
+                drop = rng.randrange(len(synonym))
+                names.append(synonym[:drop] + synonym[drop + 1:])
+    names.extend(OTHER_ACTIVITIES)
+    rng.shuffle(names)
+    return list(dict.fromkeys(names))
+
+def generate_sessions(sessions, end_date, seed=0, max_years=10):
+    """end_date の前日までに始まる sessions 件の (start_time, end_time, activity_name) を古い順に返す
+
+    1日あたり平均6件として必要な日数だけ遡る。ただし max_years 年を超える場合は
+    期間を max_years 年に収め、1日あたりの件数を増やす (大きな件数では期間内の記録も多くなる)。
+    """
+    rng = random.Random(seed)
+    names = activity_names(seed)
+    name_weights = [1 / rank for rank in range(1, len(names) + 1)]
+    days = max(1, min(sessions // 6, max_years * 365))
+    first_day = end_date - datetime.timedelta(days=days)
+    per_day = [0] * days
+    for day in rng.choices(range(days), k=sessions):
+        per_day[day] += 1
+    for day, count in enumerate(per_day):
+        date = datetime.datetime.combine(first_day + datetime.timedelta(days=day), datetime.time())
+        hours = sorted(rng.choices(range(24), weights=HOUR_WEIGHTS, k=count))
+        for hour, name in zip(hours, rng.choices(names, weights=name_weights, k=count)):
+            start = date + datetime.timedelta(hours=hour, seconds=rng.randrange(3600))
+            end = start + datetime.timedelta(seconds=int(rng.lognormvariate(7.5, 0.8)))
+            yield start, end, name
+
+def build_history_db(path, sessions, end_date, seed=0, chunk_size=50_000):
+    """path に最新スキーマの DB を作り、合成履歴を書き込んでロールアップまで構築する
+
+    アプリと同じく記録時に正規名を解決する。インデックスは書き込みの後で作る。
+    """
+    conn = sqlite3.connect(path)
+    storage.migrate(conn)
+    storage.drop_indexes(conn)
+    chunk = []
+    for start, end, name in generate_sessions(sessions, end_date, seed):
+        start_ts, end_ts = storage.to_epoch(start), storage.to_epoch(end)
+        chunk.append((start.strftime(storage.TIME_FORMAT), end.strftime(storage.TIME_FORMAT), name,
+                      start_ts, end_ts, end_ts - start_ts, get_canonical_name(name.strip())))
+        if len(chunk) >= chunk_size:
+            with conn:
+                storage.insert_session_rows(conn, chunk)
+            chunk = []
+    with conn:
+        storage.insert_session_rows(conn, chunk)
+    storage.create_indexes(conn)
+    storage.rebuild_rollups(conn)
+    return conn
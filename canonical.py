@@ -0,0 +1,76 @@
+import difflib
+import functools
+
+SYNONYM_MAPPING = {
+    '入浴': ['風呂', 'お風呂', 'シャワー', '温泉', 'bath'],
+    '音楽活動': ['ギター', '作曲', '楽器練習', 'music'],
+    '運動': ['散歩', 'ジョギング', '筋トレ', 'ランニング', 'walking', 'running'],
+    '配信業務': ['配信', 'ライブ配信', 'OBS設定', '配信準備', 'stream'],
+    'コンテンツ消費': ['youtube', 'netflix', 'hulu', '映画鑑賞', 'movie'],
+}
+
+def _ngrams(text, n):
+    """前後に境界記号を付けた文字 n-gram の集合"""
+    padded = f"\x02{text}\x03"
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+class Canonicalizer:
+    """活動名を SYNONYM_MAPPING の正規名に寄せる
+
+    - 同義語の完全一致はハッシュ索引で1回の辞書参照
+    - あいまい一致は n-gram の転置索引で候補を絞り込み、長さと quick_ratio の
+      上限で足切りしてから SequenceMatcher.ratio() を計算する
+    - 結果は上限付きの LRU キャッシュに保持する
+    """
+    def __init__(self, mapping=SYNONYM_MAPPING, threshold=0.8, ngram_size=2, cache_size=4096):
+        self.threshold = threshold
+        self.ngram_size = ngram_size
+        self._exact = {}
+        self._synonyms = []  # (小文字の同義語, 正規名, 定義順)
+        self._ngram_index = {}
+        for order, (canonical, synonyms) in enumerate(mapping.items()):
+            for synonym in synonyms:
+                lower = synonym.lower()
+                self._exact.setdefault(lower, canonical)
+                synonym_id = len(self._synonyms)
+                self._synonyms.append((lower, canonical, order))
+                for gram in _ngrams(lower, ngram_size):
+                    self._ngram_index.setdefault(gram, []).append(synonym_id)
+        self.canonicalize = functools.lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _candidates(self, lower_name):
+        """n-gram を1つ以上共有する同義語のIDを返す"""
+        ids = set()
+        for gram in _ngrams(lower_name, self.ngram_size):
+            ids.update(self._ngram_index.get(gram, ()))
+        return ids
+
+    def _resolve(self, activity_name):
+        lower_name = activity_name.lower()
+        canonical = self._exact.get(lower_name)
+        if canonical is not None:
+            return canonical
+        # ratio = 2M / (la + lb) かつ M <= min(la, lb) なので、長さの差だけで不一致が確定する候補は除外する
+        length = len(lower_name)
+        best = None
+        for synonym_id in sorted(self._candidates(lower_name)):
+            synonym, canonical, order = self._synonyms[synonym_id]
+            if best is not None and order >= best[0]:
+                continue
+            if 2 * min(length, len(synonym)) <= self.threshold * (length + len(synonym)):
+                continue
+            matcher = difflib.SequenceMatcher(None, lower_name, synonym)
+            if matcher.quick_ratio() > self.threshold and matcher.ratio() > self.threshold:
+                best = (order, canonical)
+        if best is not None:
+            return best[1]
+        return activity_name.capitalize()
+
+    def cache_info(self):
+        return self.canonicalize.cache_info()
+
+# アプリ全体で共有する正規化器 (プロセス内では LRU キャッシュ、履歴では canonical_name 列に保存される)
+default_canonicalizer = Canonicalizer()
+
+def get_canonical_name(activity_name):
+    return default_canonicalizer.canonicalize(activity_name)
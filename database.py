@@ -0,0 +1,154 @@
+"""データベースへの接続を1か所で管理するデータアクセス層
+
+書き込みは1本のライタ接続だけで行い (ロックで直列化する)、読み取りはスレッドごとに1本ずつ開いて
+使い回す読み取り専用の接続で行う。データベースは WAL モードにするため、書き込み中も読み取りは妨げられない。
+接続は開くたびに PRAGMA を設定し直す必要があるため、同じパスの Database は open_database で共有する。
+同じ接続で繰り返す SQL は sqlite3 の文キャッシュ (cached_statements) で準備済みの文が再利用される。
+"""
+import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+import storage
+
+# ページキャッシュ (KiB。負の値で指定する)・mmap で読む大きさ (バイト)・一時テーブルの置き場所
+CACHE_SIZE_KIB = 16 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+PRAGMAS = (
+    f"PRAGMA cache_size = -{CACHE_SIZE_KIB}",
+    f"PRAGMA mmap_size = {MMAP_SIZE}",
+    "PRAGMA temp_store = MEMORY",
+)
+# 接続ごとに保持する準備済みの文の数
+STATEMENT_CACHE_SIZE = 256
+# 他の接続が書き込み中のときに待つ秒数
+BUSY_TIMEOUT = 10.0
+
+# 期間内の活動ごとの合計 (duration は秒、count は期間内に開始した記録の件数)
+PeriodTotal = namedtuple('PeriodTotal', ['activity', 'duration', 'count'])
+# 1日の活動ごとの合計 (day は datetime.date)
+DailyTotal = namedtuple('DailyTotal', ['day', 'activity', 'duration', 'count'])
+# 1件の記録 (時刻はエポック秒)。canonical_name は未解決なら None
+SessionRecord = namedtuple('SessionRecord', ['start_ts', 'end_ts', 'duration', 'canonical_name', 'activity_name'])
+
+def connect(path, readonly=False):
+    """PRAGMA を設定した接続を開く
+
+    どのスレッドからでも閉じられるよう check_same_thread は無効にする
+    (読み取りの接続を使うのは開いたスレッドだけ、ライタはロックの中だけで使う)。
+    """
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+class Database:
+    """1本のライタ接続とスレッドごとの読み取り接続"""
+    def __init__(self, path):
+        self.path = path
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+
+    def writer(self):
+        """ライタ接続 (初回に開いて WAL モードにする)。他のスレッドと同時に使わないよう、書き込みは transaction() の中で行うこと"""
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = connect(self.path)
+                self._writer.execute("PRAGMA journal_mode=WAL")
+            return self._writer
+
+    @contextmanager
+    def transaction(self):
+        """ライタ接続のトランザクション。ブロックを抜けるとコミットし、例外ならロールバックする"""
+        with self._write_lock:
+            conn = self.writer()
+            with conn:
+                yield conn
+
+    def reader(self):
+        """呼び出したスレッドの読み取り専用の接続 (スレッドごとに初回だけ開く)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path, readonly=True)
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def migrate(self, canonicalize=None):
+        """スキーマを最新にする (storage.migrate をライタ接続で行う)"""
+        with self._write_lock:
+            storage.migrate(self.writer(), canonicalize)
+
+    def rebuild_rollups(self, canonicalize=None):
+        """storage.rebuild_rollups をライタ接続で行う"""
+        with self._write_lock:
+            storage.rebuild_rollups(self.writer(), canonicalize)
+
+    def close(self):
+        """すべての接続を閉じる (他のスレッドが読み取り中でないときに呼ぶこと)"""
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+        self._local = threading.local()
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    # --- 型付きの問い合わせ (呼び出したスレッドの読み取り接続を使う) ---
+
+    def period_totals(self, start, end):
+        """[start, end) の日の [PeriodTotal] (日次ロールアップから求める)"""
+        return [PeriodTotal(*row) for row in storage.period_totals(self.reader(), start, end)]
+
+    def daily_totals(self, start, end):
+        """[start, end) の日の [DailyTotal] (日次ロールアップから求める)"""
+        return [DailyTotal(storage.from_epoch(day * storage.SECONDS_PER_DAY).date(), activity, duration, count)
+                for day, activity, duration, count in storage.daily_totals(self.reader(), start, end)]
+
+    def hourly_breakdown(self):
+        """全履歴の {時 (0-23): 秒数}"""
+        return storage.hourly_breakdown(self.reader())
+
+    def last_seen(self):
+        """{正規化済み活動名: 最終終了時刻 (エポック秒)}"""
+        return storage.last_seen(self.reader())
+
+    def sessions(self, start=None, end=None):
+        """start_ts が [start, end) に入る SessionRecord を逐次返す (アーカイブを含む。範囲を指定した場合は開始時刻の昇順)"""
+        return map(SessionRecord._make, storage.iter_session_records(self.reader(), start, end))
+
+    def count_sessions(self, start, end):
+        """start_ts が [start, end) に入る記録の件数"""
+        return storage.count_sessions(self.reader(), start, end)
+
+    def first_session_date(self):
+        """最も古い記録の開始日 (記録が無ければ None)"""
+        return storage.first_session_date(self.reader())
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+def open_database(path):
+    """path の Database を返す (同じパスなら同じオブジェクトを共有する)"""
+    with _databases_lock:
+        db = _databases.get(path)
+        if db is None:
+            db = _databases[path] = Database(path)
+        return db
+
+def close_all():
+    """open_database で開いたすべての Database を閉じる"""
+    with _databases_lock:
+        databases = list(_databases.values())
+        _databases.clear()
+    for db in databases:
+        db.close()
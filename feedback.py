@@ -0,0 +1,321 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from abc import ABC, abstractmethod
+
+from prompt_budget import estimate_tokens
+
+DEFAULT_MODEL = 'gemini-1.5-pro'
+# 再試行すれば成功しうる HTTP ステータス
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+class FeedbackError(Exception):
+    """フィードバックを取得できなかった (再試行を使い切った場合を含む)"""
+
+class TransientFeedbackError(FeedbackError):
+    """一時的な失敗 (過負荷・サーバーエラーなど)。再試行の対象になる"""
+
+def is_retryable(error):
+    """タイムアウト・接続エラー・一時的なステータスの失敗なら True"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, TransientFeedbackError)):
+        return True
+    # google.api_core の例外は HTTP ステータスを code に持つ
+    return getattr(error, 'code', None) in RETRYABLE_STATUSES
+
+class FeedbackBackend(ABC):
+    """プロンプトからフィードバック文を生成するバックエンドの共通インターフェース"""
+    name = 'base'
+
+    def __init__(self, model=DEFAULT_MODEL):
+        self.model = model
+
+    @abstractmethod
+    def generate(self, prompt):
+        """プロンプトからフィードバック文を同期的に生成する"""
+
+    async def agenerate(self, prompt):
+        """非同期版 (既定では generate を別スレッドで実行する)"""
+        return await asyncio.to_thread(self.generate, prompt)
+
+class GeminiBackend(FeedbackBackend):
+    """Gemini API を呼び出すバックエンド (GenerativeModel はインスタンスごとに1回だけ作る)
+
+    google.generativeai の非同期クライアント (gRPC aio) は最初に使ったイベントループに結び付き、
+    そのループが閉じた後は使えない。report.request_feedback はレポートごとに asyncio.run で
+    新しいループを作るため、非同期の呼び出しはすべてこのバックエンド専用のスレッドで
+    動かし続ける1つのループに投入する。
+    """
+    name = 'gemini'
+
+    def __init__(self, api_key, model=DEFAULT_MODEL):
+        super().__init__(model)
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self._model = genai.GenerativeModel(model)
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def generate(self, prompt):
+        return self._model.generate_content(prompt).text
+
+    def _client_loop(self):
+        """非同期クライアント用のイベントループ (初回にデーモンスレッドで起動する)"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="gemini-client", daemon=True).start()
+            return self._loop
+
+    async def agenerate(self, prompt):
+        # 呼び出し側のタイムアウトや取り消しは wrap_future を通じて専用ループのタスクにも伝わる
+        future = asyncio.run_coroutine_threadsafe(self._model.generate_content_async(prompt), self._client_loop())
+        return (await asyncio.wrap_future(future)).text
+
+class LocalBackend(FeedbackBackend):
+    """ネットワークもAPIキーも使わない決定的な代替バックエンド
+
+    同じプロンプトには常に同じ文を返すため、オフラインでのレポート生成や
+    ベンチマーク、キャッシュの動作確認に使える。
+    latency_per_token (秒) を指定すると、推定トークン数に比例した待ち時間で API の遅延を模擬する。
+    """
+    name = 'local'
+
+    def __init__(self, model='local-hawk', latency_per_token=0.0):
+        super().__init__(model)
+        self.latency_per_token = latency_per_token
+
+    def generate(self, prompt):
+        if self.latency_per_token:
+            time.sleep(estimate_tokens(prompt) * self.latency_per_token)
+        return self.reply(prompt)
+
+    async def agenerate(self, prompt):
+        if self.latency_per_token:
+            await asyncio.sleep(estimate_tokens(prompt) * self.latency_per_token)
+        return self.reply(prompt)
+
+    @staticmethod
+    def reply(prompt):
+        """プロンプトに対する決定的な応答文"""
+        digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+        score = 40 + digest[0] % 61
+        activities = re.findall(r'^\s*- (.+?): ', prompt, flags=re.MULTILINE)
+        lines = [
+            "### Hawk Eye の評価 (オフライン)",
+            f"生産性スコア: {score} / 100",
+            f"Hawkは{len(activities)}項目の記録を確認しました。",
+        ]
+        lines.extend(f"- {activity}" for activity in activities)
+        return '\n'.join(lines)
+
+class HttpBackend(FeedbackBackend):
+    """{"prompt", "model"} を JSON で POST し、応答の "text" を返す HTTP バックエンド
+
+    開発用の代替サーバー (benchmarks/feedback_server.py) など、http:// の URL だけに対応する。
+    非同期版は asyncio のストリームで直接通信するため、タイムアウトやキャンセルで即座に接続を閉じる。
+    """
+    name = 'http'
+
+    def __init__(self, url, model='local-hawk'):
+        super().__init__(model)
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise ValueError(f"HTTP バックエンドの URL は http://host:port/path の形で指定してください: {url}")
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path or '/'
+
+    def generate(self, prompt):
+        return asyncio.run(self.agenerate(prompt))
+
+    async def agenerate(self, prompt):
+        body = json.dumps({'prompt': prompt, 'model': self.model}, ensure_ascii=False).encode('utf-8')
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write((f"POST {self.path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                          "Connection: close\r\n\r\n").encode('ascii') + body)
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        head, _, payload = response.partition(b'\r\n\r\n')
+        try:
+            status = int(head.split(b' ', 2)[1])
+        except (IndexError, ValueError):
+            raise TransientFeedbackError(f"不正な HTTP 応答です: {head[:80]!r}") from None
+        if status in RETRYABLE_STATUSES:
+            raise TransientFeedbackError(f"HTTP {status}")
+        if status != 200:
+            raise FeedbackError(f"HTTP {status}: {payload[:200].decode('utf-8', 'replace')}")
+        return json.loads(payload)['text']
+
+_backends = {}
+
+def get_backend(name, api_key=None, model=DEFAULT_MODEL, url=None):
+    """バックエンドを作成する (同じ設定なら同じインスタンスを再利用する)"""
+    key = (name, api_key, model, url)
+    if key not in _backends:
+        if name == 'local':
+            _backends[key] = LocalBackend()
+        elif name == 'gemini':
+            _backends[key] = GeminiBackend(api_key, model)
+        elif name == 'http':
+            _backends[key] = HttpBackend(url)
+        else:
+            raise ValueError(f"不明なフィードバックバックエンドです: {name}")
+    return _backends[key]
+
+def cache_key(prompt, model, mode):
+    """プロンプト・モデル・モードから内容アドレスのキーを作る"""
+    return hashlib.sha256('\0'.join((model, mode, prompt)).encode('utf-8')).hexdigest()
+
+class FeedbackCache:
+    """feedback_cache テーブルに応答を保存するキャッシュ
+
+    ttl 秒を過ぎた応答は使わず、件数か合計サイズ (バイト) が上限を超えたら
+    最後に使われた時刻が古いものから削除する。
+    transaction は書き込みに使う接続のトランザクションを返す関数 (例: database.Database.transaction)。
+    省略時は conn で書き込む。
+    """
+    def __init__(self, conn, ttl=7 * 24 * 3600, max_entries=256, max_bytes=4 * 1024 * 1024, transaction=None):
+        self.conn = conn
+        self.transaction = transaction or (lambda: conn)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, now=None):
+        now = time.time() if now is None else now
+        row = self.conn.execute("SELECT response FROM feedback_cache WHERE key = ? AND created_at > ?",
+                                (key, now - self.ttl)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.transaction() as conn:
+            conn.execute("UPDATE feedback_cache SET last_used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key, model, mode, response, now=None):
+        now = time.time() if now is None else now
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO feedback_cache (key, model, mode, response, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, mode, response, len(response.encode('utf-8')), now, now))
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM feedback_cache WHERE created_at <= ?", (now - self.ttl,))
+        # 新しく使われた順に件数とサイズを累積し、上限を超えた分を削除する
+        conn.execute('''
+            DELETE FROM feedback_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key,
+                           ROW_NUMBER() OVER recent AS position,
+                           SUM(size) OVER recent AS running_size
+                    FROM feedback_cache
+                    WINDOW recent AS (ORDER BY last_used DESC, rowid DESC)
+                ) WHERE position > ? OR running_size > ?
+            )
+        ''', (self.max_entries, self.max_bytes))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+class AsyncFeedbackClient:
+    """タイムアウト・指数バックオフでの再試行・同時実行数の上限を持つ非同期クライアント
+
+    1つの asyncio のイベントループの中で使う。cancel() は別スレッドからも呼べ、
+    実行中と待機中のすべての要求を取り消す。
+    """
+    def __init__(self, backend, cache=None, timeout=60.0, attempts=3, base_delay=1.0, max_delay=16.0,
+                 max_concurrency=4):
+        self.backend = backend
+        self.cache = cache
+        self.timeout = timeout
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_concurrency = max_concurrency
+        self.retries = 0
+        self._semaphore = None
+        self._loop = None
+        self._tasks = set()
+
+    def backoff(self, attempt):
+        """attempt 回目 (0始まり) の失敗の後に待つ秒数 (上限付きの指数に 50-100% のジッタを掛ける)"""
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def generate(self, prompt, mode, info=None):
+        """キャッシュを確認し、無ければ再試行付きでバックエンドに問い合わせて保存する
+
+        info に dict を渡すと、キャッシュを使ったか (cache_hit) と試行回数 (attempts) を書き込む。
+        """
+        info = {} if info is None else info
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            key = cache_key(prompt, self.backend.model, mode)
+            cached = self.cache.get(key) if self.cache is not None else None
+            info['cache_hit'] = cached is not None
+            if cached is not None:
+                return cached
+            async with self._semaphore:
+                response = await self._generate_with_retry(prompt, info)
+            if self.cache is not None:
+                self.cache.put(key, self.backend.model, mode, response)
+            return response
+        finally:
+            self._tasks.discard(task)
+
+    async def _generate_with_retry(self, prompt, info):
+        for attempt in range(self.attempts):
+            info['attempts'] = attempt + 1
+            try:
+                return await asyncio.wait_for(self.backend.agenerate(prompt), self.timeout)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise FeedbackError(f"{self.backend.name}: {e}") from e
+                if attempt + 1 == self.attempts:
+                    reason = f"{self.timeout} 秒でタイムアウトしました" if isinstance(e, asyncio.TimeoutError) else e
+                    raise FeedbackError(f"{self.backend.name}: {self.attempts} 回試行しましたが失敗しました ({reason})") from e
+                self.retries += 1
+                await asyncio.sleep(self.backoff(attempt))
+
+    async def generate_many(self, requests):
+        """[(prompt, mode)] を同時に問い合わせ、応答か FeedbackError を同じ順に返す"""
+        return await asyncio.gather(*(self.generate(prompt, mode) for prompt, mode in requests),
+                                    return_exceptions=True)
+
+    def cancel(self):
+        """実行中のすべての要求を取り消す (スレッドセーフ。ループが既に閉じていれば何もしない)"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._cancel_tasks)
+        except RuntimeError:
+            # 確認した直後に別のスレッドでループが閉じられた
+            pass
+
+    def _cancel_tasks(self):
+        for task in self._tasks:
+            task.cancel()
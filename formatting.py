@@ -0,0 +1,7 @@
+"""画面とレポートで共通に使う表示用の書式"""
+
+def format_hms(seconds):
+    """秒数を HH:MM:SS 形式にする"""
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
@@ -0,0 +1,276 @@
+"""Hawk Eye レポートのヘッドレス実行
+
+GUI を起動せずに、任意の期間の週次・月次レポートを生成する。
+データベースは1回だけ読み、期間ごとの統計をまとめて作ってから、Hawk Eye への問い合わせを同時に行い、
+プロセスプールで PDF を並列に生成する。
+
+使い方:
+    python hawk_cli.py report --type weekly --from 2024-01-01 --to 2024-03-31
+    python hawk_cli.py backfill --type all --workers 4
+    python hawk_cli.py --combined reports/all_weekly.pdf backfill --type weekly
+    python hawk_cli.py rebuild-rollups
+    python hawk_cli.py compact --before 2024-01-01
+    python hawk_cli.py import history.csv
+    python hawk_cli.py export history.jsonl --from 2024-01-01
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import analytics
+import database
+import history_io
+import instrument
+import report
+import storage
+from canonical import get_canonical_name
+
+REPORT_TYPES = ('weekly', 'monthly')
+# compact で --before を省略したときにデータベースに残す日数
+DEFAULT_KEEP_DAYS = 90
+
+def parse_date(text):
+    try:
+        return datetime.datetime.strptime(text, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日付は YYYY-MM-DD 形式で指定してください: {text}")
+
+def plan_reports(report_types, first_date, last_date):
+    """[(report_type, report_date)] を first_date から last_date までの範囲で列挙する"""
+    jobs = []
+    for report_type in report_types:
+        jobs.extend((report_type, report_date) for report_date in report.report_dates(report_type, first_date, last_date))
+    return jobs
+
+def collect_job_stats(conn, jobs):
+    """すべてのジョブの ReportStats を、最後の期間の終わりまでの記録の1回の走査で作る
+
+    アーカイブに移した記録は別に集計してから期間ごとに合わせる。
+    """
+    periods = {}
+    for report_type, report_date in jobs:
+        start_date, end_date = report.report_period(report_type, report_date)
+        periods[report_type, report_date] = (storage.to_epoch(start_date), storage.to_epoch(end_date))
+    last_end = max(end_ts for _start_ts, end_ts in periods.values())
+    canonicalize = instrument.accumulate("get_canonical_name", get_canonical_name)
+    with instrument.span("collect_job_stats", periods=len(periods)):
+        rows = storage.iter_session_records(conn, end=storage.from_epoch(last_end).date(), archived=False)
+        job_stats = analytics.collect_periods(analytics.parse_sessions(rows, canonicalize), periods)
+    history = storage.open_archive(conn)
+    if history is not None:
+        with history, instrument.span("collect_archive_stats", periods=len(periods), rows=history.rows):
+            archived = analytics.collect_archive_periods(history, periods, canonicalize)
+        job_stats = {key: analytics.merge_stats(stats, archived[key]) for key, stats in job_stats.items()}
+    return job_stats
+
+def run_task(task, *args):
+    """ワーカーで task を実行し、結果とワーカー内で記録したスパンを返す"""
+    return task(*args), instrument.drain()
+
+def generate_reports(db_path, font_path, jobs, workers, verbose=True, combined=None):
+    """jobs のレポートを生成し、(生成件数, 失敗件数, 経過秒) を返す
+
+    Hawk Eye への問い合わせはこのプロセスからすべて同時に行い (同時実行数は HAWK_FEEDBACK_CONCURRENCY)、
+    PDF はプロセスプールで並列に描画する。combined を指定した場合は、
+    すべてを1つの PDF (combined) にまとめてこのプロセスで描画する。
+    """
+    started = time.perf_counter()
+    db = database.open_database(db_path)
+    db.migrate(get_canonical_name)
+    job_stats = collect_job_stats(db.reader(), jobs)
+    print(f"{len(jobs)} 件の期間を集計しました ({time.perf_counter() - started:.2f} 秒)")
+
+    report.configure(db_path, font_path)
+    with instrument.span("build_reports_data", reports=len(jobs)):
+        contents = report.build_reports_data(jobs, job_stats)
+    generated = failed = 0
+    for job in jobs:
+        if isinstance(contents[job], BaseException):
+            failed += 1
+            print(f"{job[0]} {job[1]} の Hawk Eye の分析に失敗しました: {contents[job]}")
+            del contents[job]
+    print(f"Hawk Eye の分析が完了しました ({time.perf_counter() - started:.2f} 秒)")
+
+    if combined is not None:
+        if contents:
+            report.init_worker(db_path, font_path)
+            report.get_renderer().render_combined([contents[job][0] for job in jobs if job in contents], combined)
+            generated = len(contents)
+            print(f"生成しました: {combined}")
+        return generated, failed, time.perf_counter() - started
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=report.init_worker,
+                             initargs=(db_path, font_path, instrument.enabled())) as executor:
+        futures = {executor.submit(run_task, report.generate_pdf_report_file, report_data, filename): (job, filename)
+                   for job, (report_data, filename) in contents.items()}
+        for future in as_completed(futures):
+            job, filename = futures[future]
+            try:
+                _result, (events, totals) = future.result()
+                instrument.merge(events, totals)
+                generated += 1
+                if verbose:
+                    print(f"生成しました: {filename}")
+            except Exception as e:
+                failed += 1
+                print(f"{job[0]} {job[1]} のレポートの生成に失敗しました: {e}")
+    return generated, failed, time.perf_counter() - started
+
+def run_reports(args, report_types, first_date, last_date):
+    jobs = plan_reports(report_types, first_date, last_date)
+    if not jobs:
+        print("指定された範囲に生成するレポートがありません。")
+        return 0
+    generated, failed, elapsed = generate_reports(args.db, args.font, jobs, args.workers, combined=args.combined)
+    print(f"{generated} 件生成, {failed} 件失敗, {elapsed:.2f} 秒 ({generated / elapsed:.2f} reports/sec)")
+    return 1 if failed else 0
+
+def command_report(args):
+    return run_reports(args, [args.type], args.date_from, args.date_to)
+
+def command_backfill(args):
+    db = database.open_database(args.db)
+    db.migrate(get_canonical_name)
+    first_date = db.first_session_date()
+    if first_date is None:
+        print("記録がありません。")
+        return 0
+    # 今日の分は GUI と同じく当日に生成されるため、昨日までの期間を埋める
+    report_types = REPORT_TYPES if args.type == 'all' else [args.type]
+    return run_reports(args, report_types, first_date, datetime.date.today() - datetime.timedelta(days=1))
+
+def command_rebuild_rollups(args):
+    conn = database.connect(args.db)
+    try:
+        storage.migrate(conn)
+        storage.rebuild_rollups(conn, get_canonical_name)
+    finally:
+        conn.close()
+    print("ロールアップを再構築しました。")
+    return 0
+
+def command_compact(args):
+    before = args.before or datetime.date.today() - datetime.timedelta(days=DEFAULT_KEEP_DAYS)
+    started = time.perf_counter()
+    db_bytes = os.path.getsize(args.db)
+    conn = database.connect(args.db)
+    try:
+        storage.migrate(conn, get_canonical_name)
+        with instrument.span("compact", before=str(before)) as span:
+            moved = storage.archive_sessions(conn, before)
+            span.set(rows=moved)
+        if moved and not args.no_vacuum:
+            with instrument.span("vacuum"):
+                conn.execute("VACUUM")
+        path = storage.archive_path(conn)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - started
+    archive_bytes = os.path.getsize(path) if os.path.exists(path) else 0
+    print(f"{before} より前の {moved:,} 件をアーカイブに移しました ({elapsed:.2f} 秒)")
+    print(f"データベース: {db_bytes:,} → {os.path.getsize(args.db):,} バイト, "
+          f"アーカイブ: {archive_bytes:,} バイト ({path})")
+    return 0
+
+def command_import(args):
+    file_format = args.format or history_io.detect_format(args.path)
+    started = time.perf_counter()
+
+    def progress(imported):
+        print(f"\r{imported:,} 件取り込みました", end='', flush=True)
+
+    conn = database.connect(args.db)
+    try:
+        with instrument.span("import", format=file_format, bytes=os.path.getsize(args.path)) as span:
+            result = history_io.import_sessions(conn, history_io.read_records(args.path, file_format),
+                                                get_canonical_name, args.chunk_size, progress)
+            span.set(rows=result.imported, skipped=result.skipped)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - started
+    print(f"\r{result.imported:,} 件取り込み, {result.skipped:,} 件スキップ, {elapsed:.2f} 秒 "
+          f"({result.imported / elapsed:,.0f} rows/sec)")
+    for line_number, reason in result.errors:
+        print(f"  {line_number} 行目: {reason}")
+    return 1 if result.skipped else 0
+
+def command_export(args):
+    file_format = args.format or history_io.detect_format(args.path)
+    started = time.perf_counter()
+    conn = database.connect(args.db)
+    try:
+        storage.migrate(conn, get_canonical_name)
+        with instrument.span("export", format=file_format) as span:
+            rows = history_io.export_sessions(conn, args.date_from, args.date_to, args.chunk_size)
+            count = history_io.write_records(args.path, file_format, rows)
+            span.set(rows=count, bytes=os.path.getsize(args.path))
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - started
+    print(f"{count:,} 件書き出し, {elapsed:.2f} 秒 ({count / elapsed:,.0f} rows/sec)")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=report.DB_PATH, help="データベースのパス")
+    parser.add_argument('--font', default=report.FONT_PATH, help="PDF に使うフォントのパス")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="レポートを生成するプロセス数")
+    parser.add_argument('--combined', metavar='PDF', help="すべてのレポートを1つの PDF にまとめて書き出す")
+    parser.add_argument('--profile', metavar='TRACE_JSON', help="各段階を計測し、トレースをJSONで書き出す")
+    parser.add_argument('--cprofile', metavar='PSTATS', help="--profile と合わせて cProfile の結果も書き出す")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    report_parser = subparsers.add_parser('report', help="期間内のレポートを生成する")
+    report_parser.add_argument('--type', choices=REPORT_TYPES, required=True)
+    report_parser.add_argument('--from', dest='date_from', type=parse_date, required=True)
+    report_parser.add_argument('--to', dest='date_to', type=parse_date, default=datetime.date.today())
+    report_parser.set_defaults(handler=command_report)
+
+    backfill_parser = subparsers.add_parser('backfill', help="最初の記録以降の過去のレポートをすべて生成する")
+    backfill_parser.add_argument('--type', choices=REPORT_TYPES + ('all',), default='all')
+    backfill_parser.set_defaults(handler=command_backfill)
+
+    rollups_parser = subparsers.add_parser('rebuild-rollups', help="集計テーブルを生の記録から作り直す")
+    rollups_parser.set_defaults(handler=command_rebuild_rollups)
+
+    compact_parser = subparsers.add_parser('compact', help="古い記録を列指向のアーカイブに移してデータベースを小さくする")
+    compact_parser.add_argument('--before', type=parse_date,
+                                help=f"この日より前に始まった記録を移す (省略時は {DEFAULT_KEEP_DAYS} 日前)")
+    compact_parser.add_argument('--no-vacuum', action='store_true', help="移した後に VACUUM しない")
+    compact_parser.set_defaults(handler=command_compact)
+
+    import_parser = subparsers.add_parser('import', help="CSV / JSONL の活動履歴を取り込む")
+    import_parser.add_argument('path')
+    import_parser.add_argument('--format', choices=history_io.FORMATS, help="省略時は拡張子から判別する")
+    import_parser.add_argument('--chunk-size', type=int, default=history_io.DEFAULT_CHUNK_SIZE)
+    import_parser.set_defaults(handler=command_import)
+
+    export_parser = subparsers.add_parser('export', help="活動履歴を CSV / JSONL に書き出す")
+    export_parser.add_argument('path')
+    export_parser.add_argument('--format', choices=history_io.FORMATS, help="省略時は拡張子から判別する")
+    export_parser.add_argument('--chunk-size', type=int, default=history_io.DEFAULT_CHUNK_SIZE)
+    export_parser.add_argument('--from', dest='date_from', type=parse_date)
+    export_parser.add_argument('--to', dest='date_to', type=parse_date)
+    export_parser.set_defaults(handler=command_export)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        instrument.start_profile(args.profile, args.cprofile)
+    try:
+        return args.handler(args)
+    except (OSError, ValueError) as e:
+        print(f"エラー: {e}")
+        return 1
+    finally:
+        database.close_all()
+        instrument.stop_profile()
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""活動履歴の CSV / JSONL での一括取り込みと書き出し
+
+どちらも行をストリームで扱うため、メモリ使用量はファイルの大きさに依存しない。
+列は start_time, end_time, activity_name (書き出しでは canonical_name と duration も付く)。
+時刻は ISO 8601 (例: 2024-01-01 09:00:00) で、タイムゾーンは付いていても無視して壁時計時刻として扱う。
+"""
+import csv
+import datetime
+import heapq
+import json
+from itertools import chain
+from operator import itemgetter
+
+import storage
+
+FORMATS = ('csv', 'jsonl')
+IMPORT_COLUMNS = ('start_time', 'end_time', 'activity_name')
+EXPORT_COLUMNS = ('start_time', 'end_time', 'activity_name', 'canonical_name', 'duration')
+DEFAULT_CHUNK_SIZE = 10_000
+# 取り込めなかった行をこの件数まで表示する
+MAX_REPORTED_ERRORS = 10
+
+def detect_format(path):
+    """拡張子からファイル形式を決める"""
+    lower = path.lower()
+    if lower.endswith('.csv'):
+        return 'csv'
+    if lower.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    raise ValueError(f"ファイル形式を判別できません (--format で指定してください): {path}")
+
+def read_records(path, file_format):
+    """ファイルから (行番号, start_time, end_time, activity_name) を逐次返す"""
+    # Excel などが先頭に付ける BOM は utf-8-sig で読み飛ばす
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if file_format == 'csv':
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            try:
+                indexes = [header.index(column) for column in IMPORT_COLUMNS]
+            except ValueError:
+                raise ValueError(f"CSV のヘッダーに {', '.join(IMPORT_COLUMNS)} が必要です: {path}")
+            for line_number, row in enumerate(reader, start=2):
+                try:
+                    yield (line_number, *(row[index] for index in indexes))
+                except IndexError:
+                    yield line_number, None, None, None
+        elif file_format == 'jsonl':
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    yield (line_number, *(record[column] for column in IMPORT_COLUMNS))
+                except (ValueError, KeyError, TypeError):
+                    yield line_number, None, None, None
+        else:
+            raise ValueError(f"不明なファイル形式です: {file_format}")
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_ONE_SECOND = datetime.timedelta(seconds=1)
+
+def _parse_time(text):
+    """時刻の文字列を (保存用の文字列, エポック秒) にする。storage.to_epoch と同じ値になる"""
+    value = datetime.datetime.fromisoformat(text)
+    if value.tzinfo is not None or value.microsecond:
+        value = value.replace(tzinfo=None, microsecond=0)
+        text = value.isoformat(' ')
+    elif len(text) != 19 or text[10] != ' ':
+        text = value.isoformat(' ')
+    # 既に TIME_FORMAT の文字列はそのまま保存し、strftime を省く
+    return text, (value - _EPOCH) // _ONE_SECOND
+
+class ImportResult:
+    """取り込みの結果 (errors には飛ばした行のうち最初の MAX_REPORTED_ERRORS 件の (行番号, 理由) が入る)"""
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+
+    def skip(self, line_number, reason):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_number, reason))
+
+def _session_rows(records, canonicalize, result):
+    """記録を activities の INSERT の引数に変換する。不正な行は result に記録して飛ばす"""
+    for line_number, start_text, end_text, activity_name in records:
+        try:
+            (start_time, start_ts), (end_time, end_ts) = _parse_time(start_text), _parse_time(end_text)
+            activity_name = activity_name.strip()
+        except (TypeError, ValueError, AttributeError):
+            result.skip(line_number, "列が不足しているか、時刻の形式が正しくありません")
+            continue
+        if end_ts < start_ts or not activity_name:
+            result.skip(line_number, "終了時刻が開始時刻より前か、活動名が空です")
+            continue
+        yield (start_time, end_time, activity_name, start_ts, end_ts, end_ts - start_ts, canonicalize(activity_name))
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def import_sessions(conn, records, canonicalize, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """記録を chunk_size 件ずつ executemany で取り込み、ImportResult を返す
+
+    チャンクごとに1つのトランザクションで、挿入した行をロールアップにも加算してコミットする。
+    取り込みの間は activities のインデックスを外し、最後に作り直す (途中で終了した場合は次の migrate で作り直す)。
+    progress(imported) はチャンクのコミットごとに呼ばれる。
+    """
+    # 既存の行の正規名とロールアップは取り込む前に揃えておく (追加分だけをチャンクごとに加算するため)
+    storage.migrate(conn, canonicalize)
+    result = ImportResult()
+    storage.drop_indexes(conn)
+    try:
+        for chunk in _chunks(_session_rows(records, canonicalize, result), chunk_size):
+            with conn:
+                storage.append_session_rows(conn, chunk)
+            result.imported += len(chunk)
+            if progress is not None:
+                progress(result.imported)
+    finally:
+        storage.create_indexes(conn)
+    return result
+
+def export_sessions(conn, start=None, end=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """EXPORT_COLUMNS の行を、カーソルから chunk_size 件ずつ取り出して逐次返す
+
+    範囲を指定した場合は start_ts が [start, end) の行を開始時刻の昇順で返す。
+    アーカイブに移した記録も含む (範囲を指定しない場合はアーカイブの記録を先に返す)。
+    """
+    clause, params = storage.range_clause(start, end)
+    cursor = conn.execute(f"SELECT start_ts, {', '.join(EXPORT_COLUMNS)} FROM activities" + clause, params)
+    rows = (row for chunk in iter(lambda: cursor.fetchmany(chunk_size), []) for row in chunk)
+    history = storage.open_archive(conn)
+    if history is not None:
+        with history:
+            archived = ((start_ts, _format_time(start_ts), _format_time(end_ts), activity_name, canonical_name, duration)
+                        for start_ts, end_ts, duration, canonical_name, activity_name
+                        in history.records(*storage.epoch_range(start, end)))
+            merged = heapq.merge(archived, rows, key=itemgetter(0)) if clause else chain(archived, rows)
+            for row in merged:
+                yield row[1:]
+        return
+    for row in rows:
+        yield row[1:]
+
+def _format_time(ts):
+    return storage.from_epoch(ts).strftime(storage.TIME_FORMAT)
+
+def write_records(path, file_format, rows):
+    """EXPORT_COLUMNS の行をファイルに書き出し、件数を返す"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_COLUMNS)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        elif file_format == 'jsonl':
+            for row in rows:
+                f.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False))
+                f.write('\n')
+                count += 1
+        else:
+            raise ValueError(f"不明なファイル形式です: {file_format}")
+    return count
@@ -0,0 +1,163 @@
+"""処理段階の計測 (名前付きスパン) と --profile の出力
+
+計測は既定で無効で、その間 span() は共有の何もしないオブジェクトを返すだけなので、
+計測箇所を残したままでもほとんど負荷がかからない。
+start_profile() で有効にすると、スパンを Chrome のトレース形式 (chrome://tracing や
+Perfetto で開ける JSON) で書き出し、必要なら cProfile の結果も保存する。
+"""
+import json
+import os
+import threading
+import time
+
+_enabled = False
+_events = []
+_totals = {}
+_local = threading.local()
+_profiler = None
+_trace_path = None
+_cprofile_path = None
+
+def enabled():
+    return _enabled
+
+class _NullSpan:
+    """計測が無効なときに span() が返すオブジェクト"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    """開始から終了までの時間と、件数やバイト数などの属性を記録するスパン"""
+    __slots__ = ('name', 'attrs', 'start', 'depth')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        self.depth = len(stack)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        end = time.perf_counter()
+        _local.stack.pop()
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        record_span(self.name, self.start, end, depth=self.depth, **self.attrs)
+        return False
+
+    def set(self, **attrs):
+        """rows や bytes など、処理の後で分かる属性を追加する"""
+        self.attrs.update(attrs)
+
+def span(name, **attrs):
+    """with span("name", rows=...) as s: の形で処理段階を計測する"""
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, attrs)
+
+def record_span(name, start, end, /, **attrs):
+    """perf_counter の開始・終了時刻が分かっている区間をスパンとして記録する"""
+    if not _enabled:
+        return
+    _events.append({
+        'name': name,
+        'ph': 'X',
+        # perf_counter はプロセス間で共通の単調時計なので、ワーカーのスパンもそのまま並べられる
+        'ts': round(start * 1e6, 1),
+        'dur': round((end - start) * 1e6, 1),
+        'pid': os.getpid(),
+        'tid': threading.get_ident(),
+        'args': attrs,
+    })
+
+def accumulate(name, func):
+    """func の呼び出し回数と合計時間を name で集計する関数を返す
+
+    1回ごとのスパンにするには細かすぎる処理 (活動名の正規化など) に使う。
+    計測が無効なときは func をそのまま返す。
+    """
+    if not _enabled:
+        return func
+
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            total = _totals.setdefault(name, [0, 0.0])
+            total[0] += 1
+            total[1] += time.perf_counter() - started
+    return wrapper
+
+def enable():
+    """書き出し先を持たずに計測だけを有効にする (ワーカープロセス用。結果は drain で親に渡す)
+
+    fork で親から引き継いだ記録は親が既に持っているため捨てる。
+    """
+    global _enabled
+    _enabled = True
+    drain()
+
+def drain():
+    """このプロセスで記録したスパンと集計を取り出して空にする"""
+    events, totals = list(_events), {name: tuple(total) for name, total in _totals.items()}
+    _events.clear()
+    _totals.clear()
+    return events, totals
+
+def merge(events, totals):
+    """drain で取り出した別プロセスの計測結果を加える"""
+    _events.extend(events)
+    for name, (calls, seconds) in totals.items():
+        total = _totals.setdefault(name, [0, 0.0])
+        total[0] += calls
+        total[1] += seconds
+
+def start_profile(trace_path, cprofile_path=None):
+    """計測を有効にする。cprofile_path を指定した場合は cProfile も開始する"""
+    global _enabled, _trace_path, _cprofile_path, _profiler
+    _enabled = True
+    _trace_path = trace_path
+    _cprofile_path = cprofile_path
+    if cprofile_path is not None:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+def stop_profile():
+    """計測を終了し、トレース (と cProfile の結果) を書き出す"""
+    global _enabled, _profiler
+    if not _enabled:
+        return
+    _enabled = False
+    if _trace_path is None:
+        return
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_cprofile_path)
+        _profiler = None
+        print(f"cProfile の結果を書き出しました: {_cprofile_path}")
+    trace = {
+        'traceEvents': sorted(_events, key=lambda event: event['ts']),
+        'displayTimeUnit': 'ms',
+        'otherData': {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in _totals.items()},
+    }
+    with open(_trace_path, 'w', encoding='utf-8') as f:
+        json.dump(trace, f, ensure_ascii=False, indent=1)
+    print(f"トレースを書き出しました: {_trace_path}")
@@ -0,0 +1,162 @@
+"""セッションの区間 [start_ts, end_ts) の分割と、重なりを扱うスイープライン
+
+HabitHawk では複数のタイマーを同時に動かせるため、記録どうしが重なることがある。
+Timeline は開始・終了をイベントとして時刻順に並べ、1回の走査で
+- 少なくとも1つの活動が記録されていた実時間 (和集合の長さ)
+- 同時に記録されていた時間を活動の間で等分した、活動ごとの時間
+を求める。構築はイベントの整列の O(n log n)、集計は O(n)。
+時刻 t に記録中だった活動の問い合わせは、一定間隔のチェックポイントから再生して答える。
+"""
+import bisect
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+
+def split_by(start_ts, end_ts, step):
+    """[start_ts, end_ts) を step 秒の倍数の境界で分け、(start_ts // step の値, 秒数) を順に返す"""
+    while start_ts < end_ts:
+        piece_end = min((start_ts // step + 1) * step, end_ts)
+        yield start_ts // step, piece_end - start_ts
+        start_ts = piece_end
+
+def add_hour_of_day_seconds(totals, start_ts, end_ts):
+    """[start_ts, end_ts) の秒数を時 (0-23) ごとに totals に加える
+
+    丸1日を超える部分は24時間すべてに同じだけ加えるため、分割の回数は高々25回。
+    終了が開始より前の記録 (時計の巻き戻しをまたいだ記録など) は何も加えない (NumPy 版と同じ)。
+    """
+    end_ts = max(end_ts, start_ts)
+    full_days, rest = divmod(end_ts - start_ts, SECONDS_PER_DAY)
+    if full_days > 0:
+        for hour in range(24):
+            totals[hour] += full_days * SECONDS_PER_HOUR
+    # 記録ごとに呼ばれるため split_by のジェネレータを使わずに分割する
+    end_ts = start_ts + rest
+    hour_end = start_ts - start_ts % SECONDS_PER_HOUR + SECONDS_PER_HOUR
+    while start_ts < end_ts:
+        piece_end = hour_end if hour_end < end_ts else end_ts
+        totals[start_ts % SECONDS_PER_DAY // SECONDS_PER_HOUR] += piece_end - start_ts
+        start_ts = piece_end
+        hour_end += SECONDS_PER_HOUR
+
+# イベントは1つの整数 (時刻 << 33 | 開始なら1 << 32 | セッション番号) に符号化する。
+# 同じ時刻では終了が開始より前に並ぶため、区間は半開区間として扱われる
+_ID_BITS = 32
+_ID_MASK = (1 << _ID_BITS) - 1
+_START_FLAG = 1 << _ID_BITS
+_TIME_SHIFT = _ID_BITS + 1
+
+class Timeline:
+    """(start_ts, end_ts, name) の区間の集合
+
+    長さが0以下の区間は無視する。
+    """
+    CHECKPOINT_INTERVAL = 1024
+
+    def __init__(self, sessions):
+        self.names = []
+        self._name_ids = {}
+        self._session_names = []
+        events = []
+        for session_id, (start_ts, end_ts, name) in enumerate(sessions):
+            name_id = self._name_ids.get(name)
+            if name_id is None:
+                name_id = self._name_ids[name] = len(self.names)
+                self.names.append(name)
+            self._session_names.append(name_id)
+            if end_ts > start_ts:
+                events.append(start_ts << _TIME_SHIFT | _START_FLAG | session_id)
+                events.append(end_ts << _TIME_SHIFT | session_id)
+        if len(self._session_names) > _ID_MASK:
+            raise ValueError(f"区間が多すぎます: {len(self._session_names)}")
+        events.sort()
+        self.events = events
+        self._checkpoints = None
+
+    def __len__(self):
+        return len(self._session_names)
+
+    def bounds(self):
+        """(最初の開始時刻, 最後の終了時刻)。区間が無ければ None"""
+        if not self.events:
+            return None
+        return self.events[0] >> _TIME_SHIFT, self.events[-1] >> _TIME_SHIFT
+
+    def segments(self):
+        """活動の組が変わらない区間ごとに (start_ts, end_ts, {活動番号: 記録中のセッション数}) を返す
+
+        何も記録されていない区間は返さない。返す dict は走査中に書き換わるため、保持する場合はコピーすること。
+        """
+        session_names = self._session_names
+        active = {}
+        previous = None
+        for event in self.events:
+            time = event >> _TIME_SHIFT
+            if active and time > previous:
+                yield previous, time, active
+            previous = time
+            name_id = session_names[event & _ID_MASK]
+            if event & _START_FLAG:
+                active[name_id] = active.get(name_id, 0) + 1
+            elif active[name_id] == 1:
+                del active[name_id]
+            else:
+                active[name_id] -= 1
+
+    def union_seconds(self):
+        """少なくとも1つの活動が記録されていた秒数"""
+        return sum(end_ts - start_ts for start_ts, end_ts, _active in self.segments())
+
+    def attributed_seconds(self):
+        """活動ごとの秒数。同時に記録されていた時間は、その間の活動の間で等分する
+
+        同じ活動の記録どうしの重なりは1回だけ数えるため、合計は union_seconds と一致する。
+        """
+        totals = [0.0] * len(self.names)
+        for start_ts, end_ts, active in self.segments():
+            share = (end_ts - start_ts) / len(active)
+            for name_id in active:
+                totals[name_id] += share
+        return {self.names[name_id]: total for name_id, total in enumerate(totals) if total}
+
+    def union_by(self, step):
+        """少なくとも1つの活動が記録されていた秒数を step 秒の境界で分けた {start_ts // step: 秒数}"""
+        totals = {}
+        for start_ts, end_ts, _active in self.segments():
+            for bucket, seconds in split_by(start_ts, end_ts, step):
+                totals[bucket] = totals.get(bucket, 0) + seconds
+        return totals
+
+    def _build_checkpoints(self):
+        """CHECKPOINT_INTERVAL 個のイベントごとに、その直前で記録中だったセッションを保存する"""
+        checkpoints = []
+        active = set()
+        for index, event in enumerate(self.events):
+            if index % self.CHECKPOINT_INTERVAL == 0:
+                checkpoints.append(tuple(active))
+            if event & _START_FLAG:
+                active.add(event & _ID_MASK)
+            else:
+                active.discard(event & _ID_MASK)
+        self._checkpoints = checkpoints
+
+    def active_sessions(self, t):
+        """時刻 t に記録中だったセッションの番号 (sessions での位置) の昇順のリスト"""
+        if self._checkpoints is None:
+            self._build_checkpoints()
+        # 時刻 t 以下のイベントをすべて反映した時点の状態を求める
+        stop = bisect.bisect_left(self.events, (t + 1) << _TIME_SHIFT)
+        first = stop // self.CHECKPOINT_INTERVAL * self.CHECKPOINT_INTERVAL
+        if first == len(self.events):
+            return []
+        active = set(self._checkpoints[first // self.CHECKPOINT_INTERVAL])
+        for event in self.events[first:stop]:
+            if event & _START_FLAG:
+                active.add(event & _ID_MASK)
+            else:
+                active.discard(event & _ID_MASK)
+        return sorted(active)
+
+    def active_at(self, t):
+        """時刻 t に記録中だった活動の名前の集合"""
+        return {self.names[self._session_names[session_id]] for session_id in self.active_sessions(t)}
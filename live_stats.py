@@ -0,0 +1,103 @@
+"""統計パネルに表示する、今日・今週・今月の活動ごとの合計
+
+起動時に日次ロールアップ (daily_totals) から1回だけ読み込み、以降はタイマーを止めるたびに
+メモリ上のカウンタへ加える。計測中のタイマーの経過時間は表示のたびに足すため、
+表示を更新しても SQLite には問い合わせない。
+今週は週次レポートと同じく日曜日から始まる7日間とする。
+"""
+import datetime
+
+import storage
+from formatting import format_hms
+from intervals import SECONDS_PER_DAY, split_by
+
+PERIODS = (('today', '今日'), ('week', '今週'), ('month', '今月'))
+# 期間ごとに表示する活動の数 (残りは件数だけ表示する)
+DEFAULT_LIMIT = 8
+
+def period_starts(today):
+    """{期間: 開始日} (今日・今週 (日曜日から)・今月)"""
+    return {
+        'today': today,
+        'week': today - datetime.timedelta(days=today.isoweekday() % 7),
+        'month': today.replace(day=1),
+    }
+
+def _day_number(date):
+    return storage.to_epoch(date) // SECONDS_PER_DAY
+
+class LiveStats:
+    """日ごとの活動ごとの秒数と、それを期間ごとにまとめた合計のキャッシュ
+
+    保持するのは今週と今月のうち早い方の開始日以降の日だけなので、履歴の長さに依存しない。
+    """
+    def __init__(self, today):
+        self.daily = {}
+        self._set_today(today)
+
+    def _set_today(self, today):
+        self.today = today
+        self.starts = {period: _day_number(start) for period, start in period_starts(today).items()}
+        self.first_day = min(self.starts.values())
+        self.daily = {day: totals for day, totals in self.daily.items() if day >= self.first_day}
+        self._totals = None
+
+    def seed_range(self):
+        """seed に渡す日次ロールアップの範囲 [start_date, end_date)"""
+        return min(period_starts(self.today).values()), self.today + datetime.timedelta(days=1)
+
+    def seed(self, daily_totals):
+        """database.Database.daily_totals の行で日ごとの秒数を初期化する"""
+        self.daily = {}
+        for row in daily_totals:
+            day = _day_number(row.day)
+            if day >= self.first_day:
+                totals = self.daily.setdefault(day, {})
+                totals[row.activity] = totals.get(row.activity, 0) + row.duration
+        self._totals = None
+
+    def add(self, start_ts, end_ts, activity):
+        """記録 [start_ts, end_ts) を日の境界で分けて加える"""
+        for day, seconds in split_by(max(start_ts, self.first_day * SECONDS_PER_DAY), end_ts, SECONDS_PER_DAY):
+            totals = self.daily.setdefault(day, {})
+            totals[activity] = totals.get(activity, 0) + seconds
+        self._totals = None
+
+    def _period_totals(self):
+        if self._totals is None:
+            self._totals = {period: {} for period, _label in PERIODS}
+            for day, day_totals in self.daily.items():
+                for period, start in self.starts.items():
+                    if day >= start:
+                        totals = self._totals[period]
+                        for activity, seconds in day_totals.items():
+                            totals[activity] = totals.get(activity, 0) + seconds
+        return self._totals
+
+    def totals(self, now_ts, running=()):
+        """{期間: {活動: 秒数}}。running は計測中のタイマーの (活動, 開始時刻のエポック秒)
+
+        日付が変わっていれば期間を進める。計測中のタイマーが無ければキャッシュをそのまま返すため、
+        返した dict は書き換えないこと。
+        """
+        today = storage.from_epoch(now_ts).date()
+        if today != self.today:
+            self._set_today(today)
+        totals = self._period_totals()
+        if not running:
+            return totals
+        totals = {period: dict(activities) for period, activities in totals.items()}
+        for activity, start_ts in running:
+            for day, seconds in split_by(max(start_ts, self.first_day * SECONDS_PER_DAY), now_ts, SECONDS_PER_DAY):
+                for period, start in self.starts.items():
+                    if day >= start:
+                        totals[period][activity] = totals[period].get(activity, 0) + seconds
+        return totals
+
+def format_totals(activities, limit=DEFAULT_LIMIT):
+    """{活動: 秒数} を秒数の多い順の「活動  HH:MM:SS」の行にする (limit を超えた分は件数だけ)"""
+    ranked = sorted(activities.items(), key=lambda item: (-item[1], item[0]))
+    lines = [f"{activity}  {format_hms(seconds)}" for activity, seconds in ranked[:limit]]
+    if len(ranked) > limit:
+        lines.append(f"ほか{len(ranked) - limit}件")
+    return "\n".join(lines) or "記録なし"
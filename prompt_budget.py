@@ -0,0 +1,87 @@
+"""Hawk Eye のプロンプトをトークン数の上限に収めるための整形
+
+活動の一覧は所要時間の長い上位 top_k 件だけをそのまま載せ、残りは登録クラスタと
+その他に分けて合計1行ずつにまとめる。時間は "3h25m" のような短い単位で書き、長期間記録の無い活動の
+一覧も上限件数で打ち切る。上限に収まらない間は top_k と打ち切り件数を半分ずつ減らす。
+"""
+import math
+
+from canonical import SYNONYM_MAPPING
+
+DEFAULT_MAX_TOKENS = 1500
+DEFAULT_TOP_K = 15
+DEFAULT_MAX_NAMES = 10
+CLUSTER_CATEGORY = '登録クラスタ'
+OTHER_CATEGORY = 'その他'
+
+def estimate_tokens(text):
+    """トークン数の概算 (ASCII は4文字で1トークン、それ以外は1文字で1トークンとみなす)
+
+    日本語が多い文では実際より多めに見積もるため、上限を超えることはほとんどない。
+    """
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars))
+
+def format_duration(seconds):
+    """秒数を 3h25m / 45m / 30s の形にする"""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}h{minutes:02}m"
+    if minutes:
+        return f"{minutes}m"
+    return f"{seconds}s"
+
+def default_category(activity):
+    """SYNONYM_MAPPING の正規名は CLUSTER_CATEGORY、それ以外は OTHER_CATEGORY"""
+    return CLUSTER_CATEGORY if activity in SYNONYM_MAPPING else OTHER_CATEGORY
+
+def format_activities(aggregated_data, top_k, category=default_category):
+    """上位 top_k 件の活動と、残りをカテゴリごとにまとめた行"""
+    ranked = sorted(aggregated_data.items(), key=lambda item: (-item[1]['duration'], item[0]))
+    lines = ["### Activities Log"]
+    for activity, data in ranked[:top_k]:
+        lines.append(f"- {activity}: {format_duration(data['duration'])} ({data['count']}回)")
+    buckets = {}
+    for activity, data in ranked[top_k:]:
+        bucket = buckets.setdefault(category(activity), [0, 0, 0])
+        bucket[0] += 1
+        bucket[1] += data['duration']
+        bucket[2] += data['count']
+    for name, (kinds, duration, count) in sorted(buckets.items(), key=lambda item: -item[1][1]):
+        lines.append(f"- {name} ({kinds}種類): {format_duration(duration)} ({count}回)")
+    return '\n'.join(lines) + '\n'
+
+def format_time_of_day(breakdown):
+    lines = ["### 時間帯別活動時間"]
+    lines.extend(f"- {time_range}: {format_duration(duration)}" for time_range, duration in breakdown.items())
+    return '\n'.join(lines) + '\n'
+
+def format_overlap(wall_clock, overlapped):
+    return f"### 同時計測\n- 実時間: {format_duration(wall_clock)} (重複 {format_duration(overlapped)})\n"
+
+def compact_names(names, limit):
+    """名前の一覧を limit 件で打ち切り、残りの件数を付ける"""
+    names = sorted(names)
+    if len(names) <= limit:
+        return ', '.join(names)
+    if limit <= 0:
+        return f"{len(names)}件"
+    return ', '.join(names[:limit]) + f" ほか{len(names) - limit}件"
+
+class PromptBudget:
+    """プロンプトのトークン数の上限と、圧縮の初期設定"""
+    def __init__(self, max_tokens=DEFAULT_MAX_TOKENS, top_k=DEFAULT_TOP_K, max_names=DEFAULT_MAX_NAMES):
+        self.max_tokens = max_tokens
+        self.top_k = top_k
+        self.max_names = max_names
+
+    def levels(self):
+        """(top_k, max_names) を緩い順に返す (最後は両方 0)"""
+        top_k, max_names = self.top_k, self.max_names
+        while True:
+            yield top_k, max_names
+            if top_k == 0 and max_names == 0:
+                return
+            top_k, max_names = top_k // 2, max_names // 2
@@ -0,0 +1,474 @@
+import asyncio
+import datetime
+import os
+import random
+import sys
+import time
+
+import analytics
+import database
+import feedback
+import instrument
+import prompt_budget
+from canonical import SYNONYM_MAPPING, get_canonical_name
+from formatting import format_hms
+
+def get_heavy_libs():
+    """遅延インポート: この関数が呼び出されたときに重いライブラリを読み込む"""
+    try:
+        import google.generativeai as genai
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        from dotenv import load_dotenv
+        return genai, A4, SimpleDocTemplate, Paragraph, Spacer, getSampleStyleSheet, pdfmetrics, TTFont, load_dotenv
+    except ImportError as e:
+        # レポートはワーカースレッドで生成されるため、ダイアログはメインスレッド側で表示する
+        raise ImportError(f"必要なライブラリが見つかりません: {e}\nPyInstallerで正しくバンドルされているか確認してください。") from e
+
+def resource_path(relative_path):
+    """PyInstallerでビルドされた際のリソースパスを取得する"""
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+# レポートが読み書きするデータベースとPDFのフォント (ヘッドレス実行では init_worker で差し替える)
+DB_PATH = resource_path('habit_log.db')
+FONT_PATH = resource_path('ZenAntique-Regular.ttf')
+_registered_fonts = set()
+
+def get_database():
+    """レポートが読み書きするデータベース (接続はスレッドごとに使い回し、レポートのたびに開き直さない)"""
+    return database.open_database(DB_PATH)
+
+# --- Report Generator ---
+def get_activity_data(start_date, end_date):
+    """期間 [start_date, end_date) のレポート用統計 (analytics.ReportStats) を1回の走査で作る"""
+    with instrument.span("get_activity_data", start=str(start_date), end=str(end_date)) as span:
+        stats = analytics.collect_report_stats(
+            get_database(), start_date, end_date,
+            instrument.accumulate("get_canonical_name", get_canonical_name))
+        span.set(rows=stats.rows, activities=len(stats.aggregated_data))
+    return stats
+
+def format_data_for_ai(stats):
+    with instrument.span("format_data_for_ai") as span:
+        aggregated_data = stats.aggregated_data
+        formatted_string = "### Activities Log\n"
+        for activity, data in sorted(aggregated_data.items()):
+            formatted_string += f"- {activity}: {data['duration']:.2f} seconds ({data['count']} times)\n"
+        overlap = overlap_summary(stats)
+        if overlap is not None:
+            wall_clock, overlapped, attributed = overlap
+            formatted_string += "### 同時計測\n"
+            formatted_string += f"- 記録のあった実時間: {wall_clock:.2f} 秒 (複数の活動を同時に記録していた時間: {overlapped:.2f} 秒)\n"
+            for activity, seconds in sorted(attributed.items()):
+                if abs(seconds - aggregated_data[activity]['duration']) >= 0.005:
+                    formatted_string += f"- {activity}: 重なりを等分すると {seconds:.2f} 秒\n"
+        span.set(activities=len(aggregated_data), bytes=len(formatted_string.encode('utf-8')))
+    return formatted_string, aggregated_data
+
+def overlap_summary(stats):
+    """期間内に記録が重なっていれば (実時間, 重なっていた秒数, 活動ごとの等分した秒数)、無ければ None"""
+    wall_clock, attributed = stats.overlap_summary()
+    recorded = sum(max(0, session.end_ts - session.start_ts) for session in stats.sessions)
+    if recorded <= wall_clock:
+        return None
+    return wall_clock, recorded - wall_clock, attributed
+
+def render_prompt(formatted_data, long_absent_text, missing_clusters_text, time_of_day_prompt, is_praise_mode):
+    """整形済みの各部分をテンプレートに埋め込む"""
+    prompt = ""
+    if is_praise_mode:
+        prompt = f"""
+        あなたはAI「Hawk Eye」です。ごくまれに、あなたはユーザーを褒めるモードに入ります。
+        このデータに基づき、ユーザーの努力を客観的に褒めてください。
+        感情的な表現は避け、「Hawkは〜と分析しています」のような三人称の視点で記述してください。
+        データ:
+        {formatted_data}
+        """
+    else:
+        prompt = f"""
+        あなたはAI「Hawk Eye」です。以下のデータはユーザーの活動記録です。
+        データに基づき、Hawkが以下の点を厳格かつ感情を持たない三人称の口調で指摘してください。
+        1. 今期の生産性スコアを100点満点で評価してください。
+        2. 時間が減った、または完全に停止した活動について指摘。
+        3. 活動時間の急増、偏重など、バランスの悪さを指摘。
+        4. もし以下の活動が30日以上記録されていなければ、そのことを指摘してください。: {long_absent_text}
+        5. もし以下のクラスタに記録がなければ、そのことを指摘してください。: {missing_clusters_text}
+        6. 時間帯別の活動時間データから、生活リズムの偏りや改善点を指摘してください。
+
+        データ:
+        {formatted_data}
+        {time_of_day_prompt}
+        """
+    return prompt
+
+def build_prompt(formatted_data, stats, now, is_praise_mode):
+    """Hawk Eye に渡すプロンプトを作る (圧縮なし)"""
+    time_of_day_prompt = ""
+    if not is_praise_mode:
+        time_of_day_prompt = "### 時間帯別活動時間\n"
+        for time_range, duration in stats.time_of_day_breakdown().items():
+            time_of_day_prompt += f"- {time_range}: {duration:.2f} 秒\n"
+    return render_prompt(formatted_data, ', '.join(stats.long_absent_activities(now)),
+                         ', '.join(stats.missing_clusters(SYNONYM_MAPPING)), time_of_day_prompt, is_praise_mode)
+
+def build_compact_prompt(stats, now, is_praise_mode, budget):
+    """推定トークン数が budget.max_tokens 以下になるまで段階的に圧縮したプロンプトを作る
+
+    最も圧縮しても収まらない場合は、その最小のプロンプトを返す。
+    """
+    long_absent = stats.long_absent_activities(now)
+    missing_clusters = ', '.join(stats.missing_clusters(SYNONYM_MAPPING))
+    time_of_day_prompt = "" if is_praise_mode else prompt_budget.format_time_of_day(stats.time_of_day_breakdown())
+    overlap = overlap_summary(stats)
+    overlap_prompt = "" if overlap is None else prompt_budget.format_overlap(*overlap[:2])
+    for top_k, max_names in budget.levels():
+        prompt = render_prompt(prompt_budget.format_activities(stats.aggregated_data, top_k) + overlap_prompt,
+                               prompt_budget.compact_names(long_absent, max_names),
+                               missing_clusters, time_of_day_prompt, is_praise_mode)
+        if prompt_budget.estimate_tokens(prompt) <= budget.max_tokens:
+            break
+    return prompt
+
+def prompt_token_budget():
+    """環境変数 HAWK_PROMPT_TOKEN_BUDGET のトークン数の上限 (0 で圧縮しない)"""
+    value = os.getenv("HAWK_PROMPT_TOKEN_BUDGET", str(prompt_budget.DEFAULT_MAX_TOKENS))
+    try:
+        max_tokens = int(value)
+    except ValueError:
+        raise ValueError(f"HAWK_PROMPT_TOKEN_BUDGET は整数で指定してください: {value}") from None
+    return prompt_budget.PromptBudget(max_tokens) if max_tokens > 0 else None
+
+API_KEY_WARNING = "警告: .envファイルにGEMINI_API_KEYが設定されていません。"
+DEFAULT_FEEDBACK_URL = 'http://127.0.0.1:8765/generate'
+# 実行中のフィードバック要求 (cancel_feedback で取り消す)
+_active_clients = set()
+
+def env_number(name, default, convert=float):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        raise ValueError(f"{name} は数値で指定してください: {value}") from None
+
+def get_feedback_client(db):
+    """環境変数の設定からフィードバックのクライアントを作る (GEMINI_API_KEY が無ければ None)
+
+    HAWK_FEEDBACK_BACKEND=local でネットワークを使わない代替バックエンドに、
+    http で HAWK_FEEDBACK_URL のサーバーに切り替える。
+    """
+    load_dotenv = get_heavy_libs()[8]
+    load_dotenv()
+    backend_name = os.getenv("HAWK_FEEDBACK_BACKEND", "gemini")
+    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    if backend_name == 'gemini' and not GEMINI_API_KEY:
+        return None
+    backend = feedback.get_backend(backend_name, GEMINI_API_KEY,
+                                   url=os.getenv("HAWK_FEEDBACK_URL", DEFAULT_FEEDBACK_URL))
+    return feedback.AsyncFeedbackClient(
+        backend, feedback.FeedbackCache(db.reader(), transaction=db.transaction),
+        timeout=env_number("HAWK_FEEDBACK_TIMEOUT", 60.0),
+        attempts=env_number("HAWK_FEEDBACK_ATTEMPTS", 3, int),
+        max_concurrency=env_number("HAWK_FEEDBACK_CONCURRENCY", 4, int))
+
+def build_feedback_prompt(formatted_data, stats, now=None):
+    """(プロンプト, モード) を返す。now はレポートの基準時刻 (省略時は現在時刻)"""
+    is_praise_mode = random.random() < 0.05
+    now = now or datetime.datetime.now()
+    with instrument.span("build_prompt", praise=is_praise_mode) as span:
+        prompt = build_prompt(formatted_data, stats, now, is_praise_mode)
+        tokens_before = prompt_budget.estimate_tokens(prompt)
+        budget = prompt_token_budget()
+        if budget is not None and tokens_before > budget.max_tokens:
+            prompt = build_compact_prompt(stats, now, is_praise_mode, budget)
+        span.set(bytes=len(prompt.encode('utf-8')), tokens_before=tokens_before,
+                 tokens_after=prompt_budget.estimate_tokens(prompt))
+    return prompt, 'praise' if is_praise_mode else 'strict'
+
+async def fetch_feedback(client, requests):
+    """[(プロンプト, モード)] を同時に問い合わせる
+
+    同時に進む要求はスレッドごとのスパンの入れ子にならないため、1件ずつ record_span で記録する。
+    """
+    async def fetch(prompt, mode):
+        started = time.perf_counter()
+        attrs = {'backend': client.backend.name, 'mode': mode, 'prompt_bytes': len(prompt.encode('utf-8'))}
+        try:
+            response = await client.generate(prompt, mode, info=attrs)
+            attrs['response_bytes'] = len(response.encode('utf-8'))
+            return response
+        except BaseException as e:
+            attrs['error'] = type(e).__name__
+            raise
+        finally:
+            instrument.record_span("get_ai_feedback", started, time.perf_counter(), **attrs)
+    return await asyncio.gather(*(fetch(prompt, mode) for prompt, mode in requests), return_exceptions=True)
+
+def request_feedback(requests):
+    """[(プロンプト, モード)] のフィードバックを同時に取得し、応答か例外を同じ順に返す"""
+    client = get_feedback_client(get_database())
+    if client is None:
+        return [API_KEY_WARNING] * len(requests)
+    async def run():
+        # asyncio.run がループを閉じる前に登録を外す (閉じたループへの cancel を避ける)
+        _active_clients.add(client)
+        try:
+            return await fetch_feedback(client, requests)
+        finally:
+            _active_clients.discard(client)
+    return asyncio.run(run())
+
+def cancel_feedback():
+    """実行中のフィードバック要求をすべて取り消す (どのスレッドからでも呼べる)"""
+    for client in list(_active_clients):
+        client.cancel()
+
+def get_ai_feedback(formatted_data, aggregated_data, stats, report_type, now=None):
+    """now はレポートの基準時刻 (省略時は現在時刻)。過去の期間のレポートではその期間の終わりを渡す
+
+    再試行しても取得できなかった場合は feedback.FeedbackError を送出する。
+    """
+    response = request_feedback([build_feedback_prompt(formatted_data, stats, now)])[0]
+    if isinstance(response, BaseException):
+        raise response
+    return response
+
+def due_report_type(today):
+    """今日生成できるレポートの種類 (月末は 'monthly'、日曜は 'weekly'、それ以外は None)"""
+    last_day_of_month = (today + datetime.timedelta(days=1)).replace(day=1) - datetime.timedelta(days=1)
+    if today == last_day_of_month:
+        return 'monthly'
+    if today.isoweekday() == 7:
+        return 'weekly'
+    return None
+
+def report_period(report_type, report_date):
+    """report_date に生成されるレポートの対象期間 [start_date, end_date)"""
+    if report_type == 'weekly':
+        return report_date - datetime.timedelta(days=7), report_date
+    if report_type == 'monthly':
+        return report_date.replace(day=1), report_date
+    raise ValueError(f"不明なレポートの種類です: {report_type}")
+
+def report_dates(report_type, first_date, last_date):
+    """first_date から last_date までの間でレポートが生成される日 (weekly は日曜、monthly は月末)"""
+    current = first_date
+    while current <= last_date:
+        if report_type == 'weekly' and current.isoweekday() == 7:
+            yield current
+        elif report_type == 'monthly' and (current + datetime.timedelta(days=1)).day == 1:
+            yield current
+        current += datetime.timedelta(days=1)
+
+# generate_report が progress に通知する段階 (番号は1始まり)
+REPORT_STAGES = [
+    "ライブラリを読み込み中...",
+    "活動データを集計中...",
+    "Hawk Eye が分析中...",
+    "PDFを作成中...",
+]
+
+def report_stage_notifier(progress):
+    def report_stage(step):
+        if progress is not None:
+            progress(step, REPORT_STAGES[step - 1])
+    return report_stage
+
+def report_now(report_date, end_date):
+    """プロンプトの基準時刻 (今日のレポートは None で現在時刻、過去のレポートは期間の終わり)"""
+    return None if report_date == datetime.date.today() else datetime.datetime.combine(end_date, datetime.time())
+
+def report_content(report_type, start_date, end_date, ai_feedback, aggregated_data):
+    """PDF に描画する前のレポートの内容と出力先のパス"""
+    report_data = {
+        'title': f"Hawk Eye Report {start_date.strftime('%Y%m%d')}~{end_date.strftime('%Y%m%d')}",
+        'feedback': ai_feedback,
+        'aggregated_data': aggregated_data
+    }
+    filename = f"reports/{report_type}/{report_type}_report_{end_date.strftime('%Y%m%d')}.pdf"
+    return report_data, filename
+
+def build_report_data(report_type, report_date, stats=None, progress=None):
+    """report_date 付けのレポートの内容 (PDF に描画する前のデータ) と出力先のパスを返す
+
+    stats を渡した場合はデータベースを読まずにそれを使う。
+    """
+    report_stage = report_stage_notifier(progress)
+    start_date, end_date = report_period(report_type, report_date)
+    report_stage(1)
+    get_heavy_libs()
+    report_stage(2)
+    if stats is None:
+        stats = get_activity_data(start_date, end_date)
+    formatted_data, aggregated_data = format_data_for_ai(stats)
+    report_stage(3)
+    ai_feedback = get_ai_feedback(formatted_data, aggregated_data, stats, report_type,
+                                  report_now(report_date, end_date))
+    return report_content(report_type, start_date, end_date, ai_feedback, aggregated_data)
+
+def build_reports_data(jobs, job_stats):
+    """複数のレポートの内容を作る。Hawk Eye への問い合わせはすべて同時に行う
+
+    jobs は [(report_type, report_date)]、job_stats はジョブごとの ReportStats。
+    {ジョブ: (report_data, filename) または取得に失敗した例外} を返す。
+    """
+    get_heavy_libs()
+    pending = []
+    for report_type, report_date in jobs:
+        start_date, end_date = report_period(report_type, report_date)
+        stats = job_stats[report_type, report_date]
+        formatted_data, aggregated_data = format_data_for_ai(stats)
+        request = build_feedback_prompt(formatted_data, stats, report_now(report_date, end_date))
+        pending.append(((report_type, start_date, end_date, aggregated_data), request))
+    responses = request_feedback([request for _content, request in pending])
+    results = {}
+    for job, ((report_type, start_date, end_date, aggregated_data), _request), response in zip(jobs, pending, responses):
+        if isinstance(response, BaseException):
+            results[job] = response
+        else:
+            results[job] = report_content(report_type, start_date, end_date, response, aggregated_data)
+    return results
+
+def generate_report(report_type, report_date, stats=None, progress=None):
+    """report_date 付けのレポートを生成し、PDFのパスを返す。Tk には触れない
+
+    progress(step, message) は各段階の開始時に呼ばれる。
+    """
+    with instrument.span("generate_report", report_type=report_type, report_date=str(report_date)):
+        report_data, filename = build_report_data(report_type, report_date, stats, progress)
+        report_stage_notifier(progress)(4)
+        generate_pdf_report_file(report_data, filename)
+    return filename
+
+def run_report_generator(report_type, progress=None):
+    """今日付けのレポートを生成する"""
+    return generate_report(report_type, datetime.date.today(), progress=progress)
+
+def register_report_font():
+    """レポート用フォントをプロセスごとに1回だけ登録する"""
+    pdfmetrics, TTFont = get_heavy_libs()[6:8]
+    if FONT_PATH in _registered_fonts:
+        return
+    try:
+        pdfmetrics.registerFont(TTFont('ZenAntique', FONT_PATH))
+    except Exception as e:
+        raise FileNotFoundError(f"フォントファイルが見つかりません: {e}") from e
+    _registered_fonts.add(FONT_PATH)
+
+def configure(db_path, font_path):
+    """ヘッドレス実行で読み書きするデータベースとフォントを設定する"""
+    global DB_PATH, FONT_PATH
+    DB_PATH = db_path
+    FONT_PATH = font_path
+
+def init_worker(db_path, font_path, profile=False):
+    """ヘッドレス実行のワーカープロセスの初期化 (重いライブラリの読み込みと PdfRenderer の準備を1回だけ行う)"""
+    configure(db_path, font_path)
+    if profile:
+        instrument.enable()
+    get_renderer()
+
+class PdfRenderer:
+    """レポートの PDF を描画する長寿命のオブジェクト
+
+    フォントの登録・スタイルシート・表のスタイルは作成時に1回だけ用意し、
+    以降は render / render_combined を何度呼んでも再利用する。
+    """
+    FONT_NAME = 'ZenAntique'
+
+    def __init__(self):
+        from reportlab.lib import colors
+        from reportlab.platypus import PageBreak, Table, TableStyle
+        (self.A4, self.SimpleDocTemplate, self.Paragraph, self.Spacer,
+         getSampleStyleSheet) = get_heavy_libs()[1:6]
+        self.Table, self.PageBreak = Table, PageBreak
+        register_report_font()
+        self.styles = getSampleStyleSheet()
+        for name in ('Normal', 'Heading1', 'Heading2', 'Title'):
+            self.styles[name].fontName = self.FONT_NAME
+        self.styles['Normal'].leading = 14
+        self.table_style = TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), self.FONT_NAME),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2b2b2b')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f0f0f0')]),
+            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.black),
+        ])
+
+    def time_log_table(self, aggregated_data):
+        """活動ごとの合計時間と回数の表"""
+        rows = [["Activity", "Time", "Count"]]
+        for activity, data in sorted(aggregated_data.items()):
+            rows.append([activity, format_hms(data['duration']), str(data['count'])])
+        table = self.Table(rows, colWidths=[260, 100, 60], repeatRows=1)
+        table.setStyle(self.table_style)
+        return table
+
+    def story(self, report_data, with_title=False):
+        """1件のレポートの flowable のリスト"""
+        story = []
+        if with_title:
+            story.append(self.Paragraph(report_data['title'], self.styles['Title']))
+        story.append(self.Paragraph("Hawk's Time Log", self.styles['Heading2']))
+        story.append(self.time_log_table(report_data['aggregated_data']))
+        story.append(self.Spacer(1, 12))
+        for paragraph in report_data['feedback'].split('\n'):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if paragraph.startswith('### '):
+                story.append(self.Paragraph(paragraph.replace('### ', ''), self.styles['Heading1']))
+            elif paragraph.startswith('## '):
+                story.append(self.Paragraph(paragraph.replace('## ', ''), self.styles['Heading1']))
+            else:
+                story.append(self.Paragraph(paragraph, self.styles['Normal']))
+                story.append(self.Spacer(1, 6))
+        return story
+
+    def build(self, story, filename):
+        directory = os.path.dirname(filename)
+        if directory:
+            # 複数のワーカーが同時に同じディレクトリを作ることがある
+            os.makedirs(directory, exist_ok=True)
+        path = resource_path(filename)
+        with instrument.span("doc.build", flowables=len(story)) as span:
+            self.SimpleDocTemplate(path, pagesize=self.A4).build(story)
+            span.set(bytes=os.path.getsize(path))
+
+    def render(self, report_data, filename):
+        """1件のレポートを filename に書き出す"""
+        self.build(self.story(report_data), filename)
+
+    def render_combined(self, reports, filename):
+        """複数のレポートを、レポートごとに改ページした1つの PDF に書き出す"""
+        story = []
+        for report_data in reports:
+            if story:
+                story.append(self.PageBreak())
+            story.extend(self.story(report_data, with_title=True))
+        self.build(story, filename)
+
+_renderer = None
+
+def get_renderer():
+    """プロセス内で共有する PdfRenderer (初回の呼び出しで作成する)"""
+    global _renderer
+    if _renderer is None:
+        with instrument.span("pdf_renderer_setup"):
+            _renderer = PdfRenderer()
+    return _renderer
+
+def generate_pdf_report_file(report_data, filename):
+    with instrument.span("generate_pdf_report_file", activities=len(report_data['aggregated_data'])):
+        get_renderer().render(report_data, filename)
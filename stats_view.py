@@ -0,0 +1,29 @@
+import customtkinter as ctk
+
+from live_stats import PERIODS, format_totals
+
+# メインウィンドウの右側に表示するときの幅
+STATS_PANEL_WIDTH = 280
+
+class StatsPanel(ctk.CTkFrame):
+    """今日・今週・今月の活動ごとの合計を表示する、メインウィンドウ内のパネル
+
+    show には live_stats.LiveStats.totals の結果を渡す。文字列が変わった期間だけ configure する。
+    """
+    def __init__(self, parent):
+        super().__init__(parent, width=STATS_PANEL_WIDTH)
+        self.labels = {}
+        self._shown = {}
+        for period, title in PERIODS:
+            ctk.CTkLabel(self, text=title, font=("Helvetica", 16)).pack(anchor="w", padx=10, pady=(10, 0))
+            label = ctk.CTkLabel(self, text="", font=("Helvetica", 12), justify="left", anchor="w",
+                                 wraplength=STATS_PANEL_WIDTH - 30)
+            label.pack(anchor="w", padx=20)
+            self.labels[period] = label
+
+    def show(self, totals):
+        for period, label in self.labels.items():
+            text = format_totals(totals[period])
+            if self._shown.get(period) != text:
+                label.configure(text=text)
+                self._shown[period] = text
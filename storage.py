@@ -0,0 +1,541 @@
+import sqlite3
+import datetime
+import heapq
+import os
+import queue
+import threading
+import time
+from operator import itemgetter
+
+import archive
+from intervals import SECONDS_PER_DAY, SECONDS_PER_HOUR, add_hour_of_day_seconds, split_by
+
+# habit_log.db のスキーマバージョン (PRAGMA user_version に保存される)
+SCHEMA_VERSION = 6
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+def to_epoch(value):
+    """ローカル時刻をそのままUTCとみなしたエポック秒に変換する
+
+    記録される時刻はタイムゾーンを持たないため、日付や時間帯の境界が
+    整数演算だけで求まるようにローカルの壁時計時刻をそのまま秒数にする。
+    """
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    return int((value.replace(tzinfo=None, microsecond=0) - _EPOCH).total_seconds())
+
+def from_epoch(seconds):
+    """to_epoch の逆変換"""
+    return _EPOCH + datetime.timedelta(seconds=seconds)
+
+# activities テーブルのインデックス (一括取り込みの間は drop_indexes で外す)
+_INDEXES = {
+    'idx_activities_start_ts': "CREATE INDEX IF NOT EXISTS idx_activities_start_ts ON activities (start_ts)",
+    'idx_activities_uncanonical': (
+        "CREATE INDEX IF NOT EXISTS idx_activities_uncanonical ON activities (activity_name) "
+        "WHERE canonical_name IS NULL"),
+}
+
+def drop_indexes(conn):
+    """activities のインデックスを削除する (大量の INSERT の前に使い、後で create_indexes で作り直す)"""
+    with conn:
+        for name in _INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+def create_indexes(conn):
+    """activities のインデックスを (無ければ) 作成する"""
+    with conn:
+        for statement in _INDEXES.values():
+            conn.execute(statement)
+
+def _migrate_v1(conn):
+    """エポック秒の開始/終了時刻と所要時間の列、開始時刻のインデックスを追加する"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(activities)")}
+    for column in ('start_ts', 'end_ts', 'duration'):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE activities ADD COLUMN {column} INTEGER")
+    # 既存の行はSQLite内で一括変換する ('%s' は入力をUTCとして扱うため to_epoch と一致する)
+    conn.execute('''
+        UPDATE activities SET
+            start_ts = CAST(strftime('%s', start_time) AS INTEGER),
+            end_ts = CAST(strftime('%s', end_time) AS INTEGER),
+            duration = CAST(strftime('%s', end_time) AS INTEGER) - CAST(strftime('%s', start_time) AS INTEGER)
+        WHERE start_ts IS NULL
+    ''')
+    conn.execute(_INDEXES['idx_activities_start_ts'])
+
+def _migrate_v2(conn):
+    """正規化済み活動名ごとの集計テーブル (ロールアップ) を追加する
+
+    day は start_ts // 86400、hour は開始時刻の時 (0-23)。
+    既存の行からの構築は正規化関数が必要なため rebuild_rollups で行う。
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            day INTEGER NOT NULL,
+            activity TEXT NOT NULL,
+            duration INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, activity)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS hourly_totals (
+            hour INTEGER PRIMARY KEY,
+            duration INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS last_seen (
+            activity TEXT PRIMARY KEY,
+            last_end_ts INTEGER NOT NULL
+        )
+    ''')
+
+def _migrate_v3(conn):
+    """正規化済みの活動名を保存する列を追加する
+
+    未解決 (NULL) の行だけを対象にした部分インデックスにより、
+    fill_canonical_names は新しい活動名があるときだけ仕事をする。
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(activities)")}
+    if 'canonical_name' not in columns:
+        conn.execute("ALTER TABLE activities ADD COLUMN canonical_name TEXT")
+    conn.execute(_INDEXES['idx_activities_uncanonical'])
+
+def _migrate_v4(conn):
+    """AIフィードバックの応答キャッシュ (feedback.FeedbackCache が使う) を追加する"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS feedback_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        )
+    ''')
+
+def _migrate_v5(conn):
+    """ロールアップを時・日の境界で分割する集計に切り替えるため、既存の集計を空にする
+
+    以前は記録の所要時間をすべて開始した時・日に計上していた。
+    再構築は正規化関数が必要なため、migrate から rebuild_rollups で行う。
+    """
+    for table in ('daily_totals', 'hourly_totals', 'last_seen'):
+        conn.execute(f"DELETE FROM {table}")
+
+def _migrate_v6(conn):
+    """列指向アーカイブ (archive.py) に移した件数と、コミット済みのファイルの長さを保存する表を追加する"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            rows INTEGER NOT NULL,
+            bytes INTEGER NOT NULL
+        )
+    ''')
+
+# インデックス i の関数がバージョン i から i+1 への移行を行う
+_MIGRATIONS = [
+    _migrate_v1,
+    _migrate_v2,
+    _migrate_v3,
+    _migrate_v4,
+    _migrate_v5,
+    _migrate_v6,
+]
+
+def migrate(conn, canonicalize=None):
+    """activities テーブルを作成し、未適用のマイグレーションを順に適用する
+
+    activities のインデックスが無ければ作成する。canonicalize が与えられた場合は、
+    正規名が未解決の行を埋め、ロールアップが未構築であれば既存の行から構築する。
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS activities (
+            start_time TEXT,
+            end_time TEXT,
+            activity_name TEXT
+        )
+    ''')
+    conn.commit()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, migration in enumerate(_MIGRATIONS[version:], start=version + 1):
+        with conn:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+    # 一括取り込みが途中で終了してインデックスが外れたままの場合に備えて、無ければ作り直す
+    create_indexes(conn)
+    if canonicalize is not None:
+        fill_canonical_names(conn, canonicalize)
+        if rollups_need_rebuild(conn):
+            rebuild_rollups(conn, canonicalize)
+    return conn
+
+def fill_canonical_names(conn, canonicalize, only_missing=True):
+    """canonical_name 列を埋める
+
+    正規化は活動名の種類ごとに1回だけ行い、更新は一時テーブルとの結合で一括適用する。
+    only_missing=False の場合は SYNONYM_MAPPING の変更を反映するため全行を再解決する。
+    """
+    missing = " AND canonical_name IS NULL" if only_missing else ""
+    names = [row[0] for row in conn.execute(f"SELECT DISTINCT activity_name FROM activities WHERE 1{missing}")]
+    if not names:
+        return 0
+    with conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS canonical_names (name TEXT PRIMARY KEY, canonical TEXT NOT NULL)")
+        conn.execute("DELETE FROM temp.canonical_names")
+        conn.executemany("INSERT INTO temp.canonical_names VALUES (?, ?)",
+                         ((name, canonicalize(name.strip())) for name in names))
+        conn.execute(f'''
+            UPDATE activities SET canonical_name = n.canonical
+            FROM temp.canonical_names n WHERE n.name = activities.activity_name{missing}
+        ''')
+        conn.execute("DROP TABLE temp.canonical_names")
+    return len(names)
+
+_INSERT_SESSION = (
+    "INSERT INTO activities (start_time, end_time, activity_name, start_ts, end_ts, duration, canonical_name) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)")
+_UPSERT_DAILY = '''
+    INSERT INTO daily_totals (day, activity, duration, count) VALUES (?, ?, ?, ?)
+    ON CONFLICT (day, activity) DO UPDATE SET
+        duration = duration + excluded.duration, count = count + excluded.count
+'''
+_UPSERT_HOURLY = '''
+    INSERT INTO hourly_totals (hour, duration, count) VALUES (?, ?, ?)
+    ON CONFLICT (hour) DO UPDATE SET
+        duration = duration + excluded.duration, count = count + excluded.count
+'''
+_UPSERT_LAST_SEEN = '''
+    INSERT INTO last_seen (activity, last_end_ts) VALUES (?, ?)
+    ON CONFLICT (activity) DO UPDATE SET
+        last_end_ts = MAX(last_end_ts, excluded.last_end_ts)
+'''
+
+def insert_session_rows(conn, rows):
+    """変換済みの行 (start_time, end_time, activity_name, start_ts, end_ts, duration, canonical_name) を挿入する
+
+    ロールアップは更新しない。コミットは呼び出し側で行う。
+    """
+    conn.executemany(_INSERT_SESSION, rows)
+
+def append_session_rows(conn, rows):
+    """変換済みの行を挿入し、同じトランザクション内でその行だけをロールアップに加算する
+
+    コミットは呼び出し側で行う。
+    """
+    insert_session_rows(conn, rows)
+    _upsert_rollups(conn, ((row[3], row[4], row[6]) for row in rows))
+
+def record_sessions(conn, sessions):
+    """(start_time, end_time, activity_name, canonical_name) の列をまとめて記録する
+
+    ロールアップも同じトランザクション内で executemany により更新する。
+    コミットは呼び出し側で行う。
+    """
+    rows = []
+    for start_time, end_time, activity_name, canonical_name in sessions:
+        start_ts, end_ts = to_epoch(start_time), to_epoch(end_time)
+        rows.append((start_time.strftime(TIME_FORMAT), end_time.strftime(TIME_FORMAT), activity_name,
+                     start_ts, end_ts, end_ts - start_ts, canonical_name))
+    append_session_rows(conn, rows)
+
+class SessionWriter:
+    """セッションの書き込みを専用スレッドでまとめて行うライタ (write-behind)
+
+    UI スレッドは submit でキューに積むだけで、ディスクへの書き込みを待たない。
+    ライタは最初の1件を受け取ってから batch_window 秒以内に届いた分を
+    (最大 batch_size 件まで) database.Database のライタ接続の1つのトランザクションで記録する。
+    """
+    _STOP = object()
+
+    def __init__(self, database, canonicalize, batch_size=256, batch_window=0.5, retries=3):
+        self.database = database
+        self.canonicalize = canonicalize
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.retries = retries
+        self._queue = queue.Queue()
+        # close() を呼ばずに終了した場合にプロセスが止まらないよう daemon にする
+        self._thread = threading.Thread(target=self._run, name="session-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, start_time, end_time, activity_name):
+        self._queue.put((start_time, end_time, activity_name))
+
+    def flush(self):
+        """キューに積まれた記録がすべてコミットされるまで待つ"""
+        self._queue.join()
+
+    def close(self):
+        """残りの記録を書き込んでからスレッドを終了する"""
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while batch[-1] is not self._STOP and len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, sessions):
+        for attempt in range(1, self.retries + 1):
+            try:
+                with self.database.transaction() as conn:
+                    record_sessions(conn, sessions)
+                return
+            except sqlite3.Error as e:
+                print(f"活動記録の書き込みに失敗しました ({attempt}/{self.retries}): {e}")
+                time.sleep(0.5 * attempt)
+        for session in sessions:
+            print(f"書き込めなかった記録: {session}")
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is self._STOP
+            items = [item for item in batch if item is not self._STOP]
+            sessions = [(start, end, name, self.canonicalize(name)) for start, end, name in items]
+            if sessions:
+                self._write(sessions)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                break
+
+def rollups_need_rebuild(conn):
+    """記録はあるのにロールアップが空の場合 (移行直後など) に True を返す"""
+    return conn.execute('''
+        SELECT (EXISTS (SELECT 1 FROM activities) OR EXISTS (SELECT 1 FROM archive_state WHERE rows > 0))
+               AND NOT EXISTS (SELECT 1 FROM last_seen)
+    ''').fetchone()[0] == 1
+
+def rebuild_rollups(conn, canonicalize=None):
+    """activities の全行とアーカイブの記録からロールアップを再生成する
+
+    canonicalize が与えられた場合は canonical_name 列も全行再解決する
+    (アーカイブの正規名は移したときのまま変えない)。
+    """
+    if canonicalize is not None:
+        fill_canonical_names(conn, canonicalize, only_missing=False)
+    with conn:
+        for table in ('daily_totals', 'hourly_totals', 'last_seen'):
+            conn.execute(f"DELETE FROM {table}")
+        _aggregate_rollups(conn)
+        history = open_archive(conn)
+        if history is not None:
+            with history:
+                totals = RollupTotals()
+                for start_ts, end_ts, _duration, canonical_name, _activity_name in history.records():
+                    totals.add(start_ts, end_ts, canonical_name)
+                totals.write(conn)
+
+class RollupTotals:
+    """ロールアップに加える値の集計
+
+    所要時間は時・日の境界で分割して、それぞれの時・日に計上する。
+    件数 (count) は記録を開始した時・日にだけ数える。
+    """
+    def __init__(self):
+        self.daily = {}
+        self.hourly_durations = [0] * 24
+        self.hourly_counts = [0] * 24
+        self.last_seen = {}
+
+    def add(self, start_ts, end_ts, activity):
+        if activity is not None:
+            for day, seconds in split_by(start_ts, end_ts, SECONDS_PER_DAY):
+                self.daily.setdefault((day, activity), [0, 0])[0] += seconds
+            self.daily.setdefault((start_ts // SECONDS_PER_DAY, activity), [0, 0])[1] += 1
+            if end_ts > self.last_seen.get(activity, end_ts - 1):
+                self.last_seen[activity] = end_ts
+        add_hour_of_day_seconds(self.hourly_durations, start_ts, end_ts)
+        self.hourly_counts[start_ts % SECONDS_PER_DAY // SECONDS_PER_HOUR] += 1
+
+    def write(self, conn):
+        conn.executemany(_UPSERT_DAILY, ((day, activity, duration, count)
+                                         for (day, activity), (duration, count) in self.daily.items()))
+        conn.executemany(_UPSERT_HOURLY, ((hour, duration, count) for hour, (duration, count)
+                                          in enumerate(zip(self.hourly_durations, self.hourly_counts))
+                                          if duration or count))
+        conn.executemany(_UPSERT_LAST_SEEN, self.last_seen.items())
+
+def _upsert_rollups(conn, sessions):
+    """(start_ts, end_ts, canonical_name) の記録をロールアップに加える (コミットは呼び出し側で行う)"""
+    totals = RollupTotals()
+    for start_ts, end_ts, activity in sessions:
+        totals.add(start_ts, end_ts, activity)
+    totals.write(conn)
+
+def _aggregate_rollups(conn, chunk_size=100_000):
+    """activities の全行を集計してロールアップに加える
+
+    時・日の境界での分割は SQL では表しにくいため、行をチャンクごとに読み出して Python で集計する。
+    """
+    cursor = conn.execute("SELECT start_ts, end_ts, canonical_name FROM activities")
+    totals = RollupTotals()
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for start_ts, end_ts, activity in rows:
+            totals.add(start_ts, end_ts, activity)
+    totals.write(conn)
+
+def period_totals(conn, start, end):
+    """[start, end) の日の活動ごとの合計 (activity, duration, count) を日次ロールアップから返す
+
+    duration は期間内の日に含まれる秒数、count は期間内に開始した記録の件数。
+    """
+    return conn.execute('''
+        SELECT activity, SUM(duration), SUM(count) FROM daily_totals
+        WHERE day >= ? AND day < ?
+        GROUP BY activity
+    ''', (to_epoch(start) // SECONDS_PER_DAY, to_epoch(end) // SECONDS_PER_DAY))
+
+def daily_totals(conn, start, end):
+    """[start, end) の日ごとの活動ごとの合計 (day, activity, duration, count) を日次ロールアップから返す
+
+    day はエポック秒を1日の秒数で割った日の番号。
+    """
+    return conn.execute('''
+        SELECT day, activity, duration, count FROM daily_totals
+        WHERE day >= ? AND day < ?
+    ''', (to_epoch(start) // SECONDS_PER_DAY, to_epoch(end) // SECONDS_PER_DAY))
+
+def hourly_breakdown(conn):
+    """全履歴の時 (0-23) ごとの記録の秒数を返す (時をまたぐ記録は境界で分割済み)"""
+    return dict(conn.execute("SELECT hour, duration FROM hourly_totals"))
+
+def last_seen(conn):
+    """正規化済み活動名ごとの最終終了時刻 (エポック秒) を返す"""
+    return dict(conn.execute("SELECT activity, last_end_ts FROM last_seen"))
+
+def range_clause(start, end):
+    """start_ts が [start, end) に入る条件。どちらかが None ならその側は制限しない"""
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("start_ts >= ?")
+        params.append(to_epoch(start))
+    if end is not None:
+        conditions.append("start_ts < ?")
+        params.append(to_epoch(end))
+    if not conditions:
+        return "", ()
+    return " WHERE " + " AND ".join(conditions) + " ORDER BY start_ts", tuple(params)
+
+def iter_session_records(conn, start=None, end=None, archived=True):
+    """start_ts が [start, end) に入る記録の集計用の列をインデックス範囲検索でカーソルから逐次返す
+
+    列は (start_ts, end_ts, duration, canonical_name, activity_name)。範囲を指定した場合は start_ts の昇順になる。
+    archived が真でアーカイブがある場合は、アーカイブの記録と開始時刻の昇順で併合して返す。
+    """
+    clause, params = range_clause(start, end)
+    query = "SELECT start_ts, end_ts, duration, canonical_name, activity_name FROM activities" + clause
+    history = open_archive(conn) if archived else None
+    if history is None:
+        yield from conn.execute(query, params)
+        return
+    with history:
+        if not clause:
+            query += " ORDER BY start_ts"
+        yield from heapq.merge(history.records(*epoch_range(start, end)), conn.execute(query, params),
+                               key=itemgetter(0))
+
+def first_session_date(conn):
+    """最も古い記録の開始日 (アーカイブを含む。記録が無ければ None)"""
+    first_ts = conn.execute("SELECT MIN(start_ts) FROM activities").fetchone()[0]
+    history = open_archive(conn)
+    if history is not None:
+        with history:
+            archived_ts = history.first_start_ts()
+        if archived_ts is not None and (first_ts is None or archived_ts < first_ts):
+            first_ts = archived_ts
+    return None if first_ts is None else from_epoch(first_ts).date()
+
+def count_sessions(conn, start, end):
+    """start_ts が [start, end) に入る行数 (インデックスとアーカイブの二分探索だけで数える)"""
+    count = conn.execute("SELECT COUNT(*) FROM activities WHERE start_ts >= ? AND start_ts < ?",
+                         (to_epoch(start), to_epoch(end))).fetchone()[0]
+    history = open_archive(conn)
+    if history is not None:
+        with history:
+            count += history.count(to_epoch(start), to_epoch(end))
+    return count
+
+def epoch_range(start, end):
+    """range_clause と同じ範囲をエポック秒の (start_ts, end_ts) で返す (None はその側を制限しない)"""
+    return (None if start is None else to_epoch(start)), (None if end is None else to_epoch(end))
+
+def archive_path(conn):
+    """conn のデータベースファイルに対応するアーカイブのパス (メモリ上のデータベースでは None)"""
+    for _seq, name, path in conn.execute("PRAGMA database_list"):
+        if name == 'main':
+            return os.path.splitext(path)[0] + '.archive' if path else None
+    return None
+
+def _archive_state(conn):
+    """(アーカイブの件数, コミット済みのバイト数)"""
+    try:
+        row = conn.execute("SELECT rows, bytes FROM archive_state WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        # 移行前のデータベース
+        return 0, 0
+    return row or (0, 0)
+
+def open_archive(conn):
+    """アーカイブを mmap して archive.ColumnArchive を返す (移した記録が無ければ None)"""
+    rows, length = _archive_state(conn)
+    path = archive_path(conn)
+    if not rows or path is None:
+        return None
+    return archive.ColumnArchive(path, length)
+
+def archive_sessions(conn, before, chunk_size=100_000):
+    """start_ts が before より前の記録をアーカイブに移し、移した件数を返す
+
+    書き込みをロックしてから対象の行を開始時刻の順に読み、アーカイブに1ブロックとして追記して
+    fsync したあと、同じトランザクションでコミット済みの長さを記録して行を削除する。
+    途中で失敗した場合、追記した部分は次の追記で切り詰められ、行はデータベースに残る。
+    ロールアップはアーカイブの記録も含んだまま変えない。
+    """
+    path = archive_path(conn)
+    if path is None:
+        raise ValueError("メモリ上のデータベースはアーカイブできません。")
+    cutoff = to_epoch(before)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows, length = _archive_state(conn)
+        names = []
+        if rows:
+            with archive.ColumnArchive(path, length) as history:
+                names = history.names
+        cursor = conn.execute(
+            "SELECT start_ts, end_ts, duration, activity_name, canonical_name FROM activities "
+            "WHERE start_ts < ? ORDER BY start_ts", (cutoff,))
+
+        def records():
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    return
+                yield from chunk
+        length, moved = archive.append_block(path, length, names, records())
+        if moved:
+            conn.execute("INSERT OR REPLACE INTO archive_state (id, rows, bytes) VALUES (1, ?, ?)",
+                         (rows + moved, length))
+            conn.execute("DELETE FROM activities WHERE start_ts < ?", (cutoff,))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return moved
@@ -0,0 +1,184 @@
+import tkinter as tk
+
+import customtkinter as ctk
+
+from timers import visible_rows, max_offset
+
+# タイマー1件分の行の高さ (px)。仮想リストはこの固定の高さで位置を計算する
+TIMER_ROW_HEIGHT = 150
+# マウスホイールのイベント (Windows / macOS は MouseWheel、X11 は Button-4/5)
+WHEEL_EVENTS = ("<MouseWheel>", "<Button-4>", "<Button-5>")
+
+class TimerRow:
+    """仮想リストで使い回す1行分のウィジェット
+
+    表示するタイマーは bind で差し替える。ボタンは押された時点で割り当てられている
+    タイマーの ID を controller に渡す。
+    """
+    def __init__(self, parent, controller):
+        self.controller = controller
+        self.timer_id = None
+        self.frame = ctk.CTkFrame(parent, fg_color="transparent", height=TIMER_ROW_HEIGHT)
+        self.frame.pack_propagate(False)
+        self.entry = ctk.CTkEntry(self.frame, width=280, font=("Helvetica", 12))
+        self.entry.pack(pady=(0, 5))
+        self.entry.bind("<KeyRelease>", self.on_entry_changed)
+        self.timer_label = ctk.CTkLabel(self.frame, text="00:00:00", font=("Helvetica", 24))
+        self.timer_label.pack(pady=5)
+        button_frame = ctk.CTkFrame(self.frame, fg_color="transparent")
+        button_frame.pack(pady=(5, 0))
+        self.start_button = ctk.CTkButton(button_frame, text="START",
+                                          command=lambda: controller.start_tracking(self.timer_id))
+        self.start_button.pack(side=tk.LEFT, expand=True, padx=5, pady=0)
+        self.stop_button = ctk.CTkButton(button_frame, text="STOP", state=tk.DISABLED,
+                                         command=lambda: controller.stop_tracking(self.timer_id))
+        self.stop_button.pack(side=tk.RIGHT, expand=True, padx=5, pady=0)
+        control_frame = ctk.CTkFrame(self.frame, fg_color="transparent")
+        control_frame.pack(pady=(5, 0))
+        add_button = ctk.CTkButton(control_frame, text="+", command=controller.add_timer)
+        add_button.pack(side=tk.LEFT, padx=5)
+        remove_button = ctk.CTkButton(control_frame, text="-",
+                                      command=lambda: controller.remove_timer(self.timer_id))
+        remove_button.pack(side=tk.LEFT, padx=5)
+        # 実際にウィジェットへ反映した値 (変わらない場合は configure を呼ばない)
+        self._shown = (None, None, None)
+
+    def on_entry_changed(self, _event=None):
+        if self.timer_id in self.controller.timers:
+            text = self.entry.get()
+            self.controller.timers[self.timer_id].entry_text = text
+            self._shown = (text, self._shown[1], self._shown[2])
+
+    def bind(self, state):
+        """state の内容を表示する"""
+        self.timer_id = state.timer_id
+        shown = (state.entry_text, state.label_text, state.is_tracking)
+        if shown == self._shown:
+            return
+        entry_text, label_text, is_tracking = shown
+        if self.entry.get() != entry_text:
+            self.entry.delete(0, tk.END)
+            self.entry.insert(0, entry_text)
+        if label_text != self._shown[1]:
+            self.timer_label.configure(text=label_text)
+        if is_tracking != self._shown[2]:
+            self.start_button.configure(state=tk.DISABLED if is_tracking else tk.NORMAL)
+            self.stop_button.configure(state=tk.NORMAL if is_tracking else tk.DISABLED)
+        self._shown = shown
+
+    def show_label(self, text):
+        """tick による経過時間の表示の更新"""
+        if text != self._shown[1]:
+            self.timer_label.configure(text=text)
+            self._shown = (self._shown[0], text, self._shown[2])
+
+class VirtualTimerList(ctk.CTkFrame):
+    """見えている行の分だけウィジェットを持つタイマーの一覧
+
+    タイマーがいくつあっても、行のウィジェットは表示領域に収まる数 + 1 だけ作り、
+    スクロールのたびに表示位置のタイマーへ割り当て直す。
+    """
+    def __init__(self, master, controller):
+        super().__init__(master)
+        self.controller = controller
+        self.offset = 0
+        self.viewport_height = 0
+        self.rows = []
+        self.visible = {}  # timer_id -> TimerRow
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.pack(side=tk.LEFT, fill="both", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill="y")
+        self.body.bind("<Configure>", self.on_resize)
+        self.bind_wheel(self.body)
+
+    def bind_wheel(self, widget):
+        """widget とその子孫のすべてでマウスホイールを一覧のスクロールにする
+
+        CTk のウィジェットはイベントを内部の canvas や tk のウィジェットが受けるため、
+        CTk の bind を通さずに tk の子孫をたどって直接 bind する。
+        """
+        for sequence in WHEEL_EVENTS:
+            tk.Misc.bind(widget, sequence, self.on_mouse_wheel, add='+')
+        for child in widget.winfo_children():
+            self.bind_wheel(child)
+
+    def on_mouse_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_by(-TIMER_ROW_HEIGHT // 3)
+        else:
+            self.scroll_by(TIMER_ROW_HEIGHT // 3)
+
+    def on_resize(self, event):
+        self.viewport_height = event.height
+        needed = event.height // TIMER_ROW_HEIGHT + 2
+        while len(self.rows) < needed:
+            row = TimerRow(self.body, self.controller)
+            self.bind_wheel(row.frame)
+            self.rows.append(row)
+        self.refresh()
+
+    def yview(self, action, *args):
+        """スクロールバーからの操作 ('moveto', 割合) / ('scroll', 量, 'units' または 'pages')"""
+        if action == 'moveto':
+            self.scroll_to(int(float(args[0]) * len(self.controller.timers) * TIMER_ROW_HEIGHT))
+        elif action == 'scroll':
+            amount = int(args[0])
+            step = self.viewport_height if args[1] == 'pages' else TIMER_ROW_HEIGHT // 3
+            self.scroll_by(amount * step)
+
+    def scroll_by(self, delta):
+        self.scroll_to(self.offset + delta)
+
+    def scroll_to(self, offset):
+        limit = max_offset(len(self.controller.timers), TIMER_ROW_HEIGHT, self.viewport_height)
+        offset = min(max(0, offset), limit)
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+
+    def scroll_to_timer(self, timer_id):
+        """timer_id の行が見える位置までスクロールする"""
+        top = self.controller.timers.index(timer_id) * TIMER_ROW_HEIGHT
+        if top < self.offset:
+            self.scroll_to(top)
+        elif top + TIMER_ROW_HEIGHT > self.offset + self.viewport_height:
+            self.scroll_to(top + TIMER_ROW_HEIGHT - self.viewport_height)
+
+    def refresh(self):
+        """スクロール位置に合わせて行を割り当て直し、配置する"""
+        timers = self.controller.timers
+        count = len(timers)
+        self.offset = min(self.offset, max_offset(count, TIMER_ROW_HEIGHT, self.viewport_height))
+        first, last, shift = visible_rows(count, self.offset, TIMER_ROW_HEIGHT, self.viewport_height)
+        self.visible = {}
+        for position, row in enumerate(self.rows):
+            index = first + position
+            if index < last:
+                state = timers.at(index)
+                row.bind(state)
+                self.visible[state.timer_id] = row
+                row.frame.place(x=0, y=position * TIMER_ROW_HEIGHT - shift, relwidth=1)
+            else:
+                row.timer_id = None
+                row.frame.place_forget()
+        total = count * TIMER_ROW_HEIGHT
+        if total <= self.viewport_height or total == 0:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + self.viewport_height) / total)
+
+    def update_timer(self, timer_id):
+        """タイマーの状態が変わったときに、見えていれば行の表示を更新する"""
+        row = self.visible.get(timer_id)
+        if row is not None:
+            row.bind(self.controller.timers[timer_id])
+
+    def sync_entry(self, timer_id):
+        """見えている行の入力欄の内容をタイマーの状態に反映する (キー入力以外での変更に備える)"""
+        row = self.visible.get(timer_id)
+        if row is not None:
+            row.on_entry_changed()
+
+    def row_for(self, timer_id):
+        return self.visible.get(timer_id)
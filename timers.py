@@ -0,0 +1,70 @@
+import itertools
+
+class TimerState:
+    """1つのタイマーの状態。ウィジェットは持たず、表示は仮想リストの行が使い回す"""
+    __slots__ = ('timer_id', 'entry_text', 'is_tracking', 'start_time', 'start_monotonic',
+                 'current_activity', 'tracking_duration', 'label_text')
+
+    def __init__(self, timer_id):
+        self.timer_id = timer_id
+        # 行のウィジェットは使い回されるため、入力中の活動名もここに保持する
+        self.entry_text = ""
+        self.is_tracking = False
+        self.start_time = None
+        self.start_monotonic = None
+        self.current_activity = ""
+        self.tracking_duration = 0
+        self.label_text = "00:00:00"
+
+class TimerStore:
+    """表示順を保ったタイマーの集合
+
+    ID は単調増加の整数で、タイマーを削除しても再利用しない。
+    """
+    def __init__(self):
+        self._next_id = itertools.count()
+        self._timers = {}
+        self._order = None  # 位置での参照用 (追加・削除で作り直す)
+
+    def add(self):
+        state = TimerState(next(self._next_id))
+        self._timers[state.timer_id] = state
+        self._order = None
+        return state
+
+    def remove(self, timer_id):
+        del self._timers[timer_id]
+        self._order = None
+
+    def at(self, index):
+        """表示順で index 番目のタイマー"""
+        if self._order is None:
+            self._order = list(self._timers.values())
+        return self._order[index]
+
+    def index(self, timer_id):
+        if self._order is None:
+            self._order = list(self._timers.values())
+        return self._order.index(self._timers[timer_id])
+
+    def __getitem__(self, timer_id):
+        return self._timers[timer_id]
+
+    def __contains__(self, timer_id):
+        return timer_id in self._timers
+
+    def __len__(self):
+        return len(self._timers)
+
+    def __iter__(self):
+        return iter(list(self._timers.values()))
+
+def visible_rows(count, offset, row_height, viewport_height):
+    """スクロール位置 offset (px) で見えている行の範囲 (first, last) と、先頭の行がはみ出している px"""
+    first, shift = divmod(max(0, offset), row_height)
+    last = min(count, (offset + viewport_height + row_height - 1) // row_height)
+    return min(first, count), max(last, first), shift
+
+def max_offset(count, row_height, viewport_height):
+    """スクロールできる最大の位置 (px)"""
+    return max(0, count * row_height - viewport_height)